@@ -0,0 +1,99 @@
+"""
+Benchmark: the PDF extraction engines (fast, pypdf2, pdfplumber) and the
+configured fallback chain on the sample corpus from news_sources.json.
+
+Each engine runs alone under the same time and memory limits as ingestion,
+so a failure is a document that engine could not read. Run inside the app
+container:
+    python /app/benchmarks/bench_pdf_engines.py --repeat 3
+or against a local directory of PDFs:
+    python /app/benchmarks/bench_pdf_engines.py --dir /tmp/pdfs
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import tempfile
+
+from services.pdf_extraction import ENGINES, PdfExtractionError, PdfExtractor
+from services.s3_processor import S3Processor
+
+
+def download_corpus(target_dir: str) -> list:
+    """Download every article in news_sources.json and return the file paths."""
+    processor = S3Processor()
+    bucket = processor._source_bucket()
+    paths = []
+    for article_config in processor.news_sources.get("articles", []):
+        path, _ = processor._download_pdf_from_s3(bucket, article_config["s3_key"])
+        local_path = os.path.join(target_dir, os.path.basename(article_config["s3_key"]))
+        shutil.move(path, local_path)
+        paths.append(local_path)
+    return paths
+
+
+def run(extractor: PdfExtractor, paths: list, repeat: int) -> dict:
+    """Extract every document repeat times and summarize timings."""
+    seconds, chars, peak_rss, engines_used = [], [], [], {}
+    failures = 0
+    for path in paths:
+        for _ in range(repeat):
+            try:
+                result = extractor.extract(path)
+            except PdfExtractionError:
+                failures += 1
+                continue
+            seconds.append(result["total_seconds"])
+            chars.append(len(result["text"]))
+            peak_rss.append(result["peak_rss_mb"])
+            engines_used[result["engine"]] = engines_used.get(result["engine"], 0) + 1
+
+    ordered = sorted(seconds)
+    return {
+        "ok": len(seconds),
+        "failed": failures,
+        "mean_ms": statistics.mean(seconds) * 1000 if seconds else None,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000 if ordered else None,
+        "mean_chars": statistics.mean(chars) if chars else None,
+        "peak_rss_mb": max(peak_rss) if peak_rss else None,
+        "engines": engines_used
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directory of PDFs to use instead of the S3 sample corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    download_dir = None
+    if args.dir:
+        paths = sorted(glob.glob(os.path.join(args.dir, "*.pdf")))
+    else:
+        download_dir = tempfile.mkdtemp(prefix="bench-pdf-")
+        paths = download_corpus(download_dir)
+
+    try:
+        chain = PdfExtractor()
+        candidates = [(name, PdfExtractor(engines=[name])) for name in ENGINES] + [(" > ".join(chain.engine_names), chain)]
+
+        print(f"documents: {len(paths)}, repeat: {args.repeat}, timeout: {chain.timeout:g}s, memory: {chain.memory_mb} MB")
+        print(f"{'engine':<28} {'ok':>4} {'failed':>6} {'mean ms':>9} {'p95 ms':>9} {'chars':>8} {'rss MB':>7}")
+        for name, extractor in candidates:
+            stats = run(extractor, paths, args.repeat)
+            print(
+                f"{name:<28} {stats['ok']:>4} {stats['failed']:>6} "
+                f"{stats['mean_ms'] or 0:>9.1f} {stats['p95_ms'] or 0:>9.1f} "
+                f"{stats['mean_chars'] or 0:>8.0f} {stats['peak_rss_mb'] or 0:>7.1f}"
+            )
+            if extractor is chain:
+                print(f"chain engines used: {stats['engines']}")
+    finally:
+        if download_dir:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
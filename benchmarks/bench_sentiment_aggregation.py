@@ -0,0 +1,130 @@
+"""
+Benchmark: the previous /api/sentiment/ path (load every analyzed article
+and count in Python) versus the GROUP BY aggregates in
+services.sentiment_stats.
+
+Rows are generated inside Postgres with generate_series, so seeding a
+million articles takes seconds. Run inside the app container against the
+compose database:
+    python /app/benchmarks/bench_sentiment_aggregation.py --rows 1000000
+"""
+
+import argparse
+import time
+
+from sqlalchemy import delete, text
+
+from database import SessionLocal
+from models import NewsArticle
+from services.sentiment_stats import aggregate_sentiment, build_sentiment_summary, mentions_token
+
+BENCHMARK_SOURCE = "benchmark-sentiment-aggregation"
+
+SEED_SQL = text("""
+    INSERT INTO news_articles (title, content, source, dedup_key, sentiment, confidence_score, tokens_mentioned)
+    SELECT
+        'Benchmark article ' || i,
+        repeat('Benchmark content ', 50),
+        :source,
+        :source || '-' || i,
+        (ARRAY['bullish', 'bearish', 'neutral', 'mixed'])[1 + i % 4],
+        (i % 1000) / 1000.0,
+        CASE i % 5
+            WHEN 0 THEN ARRAY['BTC', 'ETH']
+            WHEN 1 THEN ARRAY['BTC', 'SOL']
+            WHEN 2 THEN ARRAY['ETH', 'XRP', 'SOL']
+            WHEN 3 THEN ARRAY['DOGE']
+            ELSE ARRAY[]::varchar[]
+        END
+    FROM generate_series(1, :rows) AS i
+""")
+
+
+def seed_articles(rows: int):
+    """Insert analyzed benchmark rows in one statement."""
+    db = SessionLocal()
+    try:
+        db.execute(SEED_SQL, {"source": BENCHMARK_SOURCE, "rows": rows})
+        db.commit()
+        db.execute(text("ANALYZE news_articles"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def python_aggregation(token=None) -> dict:
+    """The previous endpoint body: every analyzed row loaded as an ORM object."""
+    db = SessionLocal()
+    try:
+        query = db.query(NewsArticle).filter(NewsArticle.sentiment.isnot(None))
+        if token:
+            query = query.filter(mentions_token(token))
+
+        distribution = {}
+        token_mentions = {}
+        for article in query.all():
+            count, confidence = distribution.get(article.sentiment, (0, 0.0))
+            distribution[article.sentiment] = (count + 1, confidence + (article.confidence_score or 0.0))
+            for token_mentioned in (article.tokens_mentioned or []):
+                token_mentions[token_mentioned] = token_mentions.get(token_mentioned, 0) + 1
+
+        return build_sentiment_summary(
+            [(sentiment, count, confidence) for sentiment, (count, confidence) in distribution.items()],
+            sorted(token_mentions.items(), key=lambda item: (-item[1], item[0])),
+            token
+        )
+    finally:
+        db.close()
+
+
+def sql_aggregation(token=None) -> dict:
+    db = SessionLocal()
+    try:
+        return aggregate_sentiment(db, token)
+    finally:
+        db.close()
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def cleanup():
+    """Remove all benchmark rows."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(NewsArticle).where(NewsArticle.source == BENCHMARK_SOURCE))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--token", default="SOL")
+    args = parser.parse_args()
+
+    cleanup()
+    try:
+        _, seed_seconds = timed(seed_articles, args.rows)
+        print(f"rows:          {args.rows:,} (seeded in {seed_seconds:.1f}s)")
+
+        for token in (None, args.token):
+            loop_result, loop_seconds = timed(python_aggregation, token)
+            sql_result, sql_seconds = timed(sql_aggregation, token)
+            assert loop_result == sql_result, "SQL aggregation differs from the Python loop"
+
+            label = f"token={token}" if token else "all tokens"
+            print(f"{label}:")
+            print(f"  python loop: {loop_seconds:.2f}s ({loop_result['total_articles']:,} articles)")
+            print(f"  group by:    {sql_seconds:.3f}s")
+            print(f"  speedup:     {loop_seconds / sql_seconds:.1f}x")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: a sentiment time series built from raw news_articles rows on
+every request versus one served from the hourly sentiment rollups.
+
+Rows are generated inside Postgres with generate_series and spread over
+the last 30 days, then the rollups are rebuilt (and timed). Run inside the
+app container against the compose database:
+    python /app/benchmarks/bench_sentiment_timeseries.py --rows 1000000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, literal_column, select, text
+
+from database import SessionLocal
+from models import NewsArticle
+from services.sentiment_rollups import build_timeseries, rebuild_rollups, sentiment_timeseries
+from services.sentiment_stats import SENTIMENT_LABELS
+
+BENCHMARK_SOURCE = "benchmark-sentiment-timeseries"
+
+SEED_SQL = text("""
+    INSERT INTO news_articles (title, content, source, dedup_key, published_at, sentiment, confidence_score, tokens_mentioned)
+    SELECT
+        'Benchmark article ' || i,
+        'Benchmark content',
+        :source,
+        :source || '-' || i,
+        (now() AT TIME ZONE 'utc') - (i % 720) * interval '1 hour' - (i % 60) * interval '1 minute',
+        (ARRAY['bullish', 'bearish', 'neutral'])[1 + i % 3],
+        (i % 1000) / 1000.0,
+        CASE i % 4
+            WHEN 0 THEN ARRAY['BTC', 'ETH']
+            WHEN 1 THEN ARRAY['BTC']
+            WHEN 2 THEN ARRAY['SOL']
+            ELSE ARRAY[]::varchar[]
+        END
+    FROM generate_series(1, :rows) AS i
+""")
+
+
+def seed_articles(rows: int):
+    """Insert analyzed benchmark rows in one statement."""
+    db = SessionLocal()
+    try:
+        db.execute(SEED_SQL, {"source": BENCHMARK_SOURCE, "rows": rows})
+        db.commit()
+    finally:
+        db.close()
+
+
+def raw_timeseries(start: datetime, end: datetime, granularity: str) -> dict:
+    """The same series for all articles, grouped from news_articles on every call."""
+    occurred = func.coalesce(NewsArticle.published_at, NewsArticle.created_at)
+    period = func.date_trunc(literal_column(f"'{granularity}'"), func.date_trunc("hour", occurred)).label("period")
+    query = select(
+        period,
+        *[func.count().filter(NewsArticle.sentiment == label) for label in SENTIMENT_LABELS],
+        func.count(),
+        func.coalesce(func.sum(NewsArticle.confidence_score), 0.0)
+    ).where(
+        NewsArticle.sentiment.isnot(None),
+        func.date_trunc("hour", occurred) >= start,
+        func.date_trunc("hour", occurred) < end
+    ).group_by(literal_column("period")).order_by(literal_column("period"))
+
+    db = SessionLocal()
+    try:
+        return build_timeseries(db.execute(query).all(), None, start, end, granularity)
+    finally:
+        db.close()
+
+
+def rollup_timeseries(start: datetime, end: datetime, granularity: str) -> dict:
+    db = SessionLocal()
+    try:
+        return sentiment_timeseries(db, None, start, end, granularity)
+    finally:
+        db.close()
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def cleanup():
+    """Remove all benchmark rows."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(NewsArticle).where(NewsArticle.source == BENCHMARK_SOURCE))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(days=30)
+
+    cleanup()
+    try:
+        _, seed_seconds = timed(seed_articles, args.rows)
+        buckets, rebuild_seconds = timed(rebuild_rollups)
+        print(f"rows:           {args.rows:,} (seeded in {seed_seconds:.1f}s)")
+        print(f"rollup rebuild: {buckets:,} buckets in {rebuild_seconds:.1f}s")
+
+        for granularity in ("hour", "day"):
+            raw, raw_seconds = timed(raw_timeseries, start, end, granularity)
+            rollup, rollup_seconds = timed(rollup_timeseries, start, end, granularity)
+            assert raw["points"] == rollup["points"], "rollup series differs from news_articles"
+
+            print(f"30 days by {granularity} ({len(rollup['points'])} points):")
+            print(f"  news_articles: {raw_seconds * 1000:.0f}ms")
+            print(f"  rollups:       {rollup_seconds * 1000:.1f}ms")
+            print(f"  speedup:       {raw_seconds / rollup_seconds:.0f}x")
+    finally:
+        cleanup()
+        rebuild_rollups()
+
+
+if __name__ == "__main__":
+    main()
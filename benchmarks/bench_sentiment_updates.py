@@ -0,0 +1,101 @@
+"""
+Benchmark: per-row db.merge() versus the bulk UPDATE ... FROM (VALUES ...)
+path used by SentimentAnalyzer.update_articles_in_db.
+
+Run inside the app container against the compose database:
+    python /app/benchmarks/bench_sentiment_updates.py --rows 10000
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import delete
+
+from database import SessionLocal
+from models import NewsArticle
+from services.sentiment_analyzer import SentimentAnalyzer
+
+BENCHMARK_SOURCE = "benchmark-sentiment-updates"
+
+
+def seed_articles(rows: int) -> list:
+    """Insert unanalyzed benchmark rows and return their ids."""
+    db = SessionLocal()
+    try:
+        articles = [
+            NewsArticle(title=f"Benchmark article {i}", content="Benchmark content", source=BENCHMARK_SOURCE)
+            for i in range(rows)
+        ]
+        db.add_all(articles)
+        db.commit()
+        return [article.id for article in articles]
+    finally:
+        db.close()
+
+
+def analyzed_copies(ids: list) -> list:
+    """Build detached articles carrying fresh sentiment results."""
+    return [
+        NewsArticle(
+            id=article_id,
+            title=f"Benchmark article {article_id}",
+            source=BENCHMARK_SOURCE,
+            sentiment=random.choice(["bullish", "bearish", "neutral"]),
+            confidence_score=round(random.random(), 3),
+            tokens_mentioned=["BTC", "ETH"]
+        )
+        for article_id in ids
+    ]
+
+
+def merge_loop(articles: list) -> int:
+    """The previous update path: one merge (SELECT + UPDATE) per row."""
+    db = SessionLocal()
+    try:
+        for article in articles:
+            db.merge(article)
+        db.commit()
+        return len(articles)
+    finally:
+        db.close()
+
+
+def cleanup():
+    """Remove all benchmark rows."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(NewsArticle).where(NewsArticle.source == BENCHMARK_SOURCE))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    analyzer = SentimentAnalyzer()
+    cleanup()
+    try:
+        ids = seed_articles(args.rows)
+
+        started = time.perf_counter()
+        merged = merge_loop(analyzed_copies(ids))
+        merge_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        bulk = analyzer.update_articles_in_db(analyzed_copies(ids))
+        bulk_seconds = time.perf_counter() - started
+
+        print(f"rows:        {args.rows}")
+        print(f"merge loop:  {merged} rows in {merge_seconds:.2f}s ({merged / merge_seconds:,.0f} rows/s)")
+        print(f"bulk update: {bulk} rows in {bulk_seconds:.2f}s ({bulk / bulk_seconds:,.0f} rows/s)")
+        print(f"speedup:     {merge_seconds / bulk_seconds:.1f}x")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: token extraction throughput against the coin registry snapshot.
+
+Builds the extractor from the cached CoinGecko registry (or a synthetic
+registry of --coins coins when there is no snapshot) and scans a corpus
+made of stored article text, reporting build time and MB/s. Run inside
+the app container:
+    python /app/benchmarks/bench_token_extractor.py
+"""
+
+import argparse
+import random
+import string
+import time
+
+from services.token_extractor import SEED_COINS, TokenExtractor, load_registry
+
+
+def synthetic_registry(count: int) -> list:
+    """Random coins with one to three word names, the first 1000 ranked."""
+    rng = random.Random(7)
+    coins = list(SEED_COINS)
+    for index in range(count):
+        symbol = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 6)))
+        name = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))).title() for _ in range(rng.randint(1, 3)))
+        coins.append({"id": f"coin-{index}", "symbol": symbol, "name": name, "rank": index + 20 if index < 1000 else None})
+    return coins
+
+
+def load_corpus(limit: int) -> str:
+    """Title and content of stored articles, falling back to generated text."""
+    try:
+        from database import SessionLocal
+        from models import NewsArticle
+
+        db = SessionLocal()
+        try:
+            rows = db.query(NewsArticle.title, NewsArticle.content).limit(limit).all()
+        finally:
+            db.close()
+        text = "\n".join(f"{title} {content or ''}" for title, content in rows)
+        if text.strip():
+            return text
+    except Exception as e:
+        print(f"no stored articles ({e}); using generated text")
+
+    words = ["Bitcoin", "ETH", "rallied", "as", "the", "SEC", "weighed", "an", "ETF", "Solana", "$pepe", "UNITED", "market"]
+    return " ".join(random.Random(3).choices(words, k=200000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coins", type=int, default=15000, help="Synthetic registry size when there is no snapshot")
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    coins = load_registry() or synthetic_registry(args.coins)
+    started = time.perf_counter()
+    extractor = TokenExtractor(coins)
+    build_seconds = time.perf_counter() - started
+
+    corpus = load_corpus(args.articles)
+    size_mb = len(corpus.encode("utf-8")) / (1024 * 1024)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        found = extractor.extract(corpus)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(f"registry: {extractor.stats()}")
+    print(f"build: {build_seconds * 1000:.0f} ms")
+    print(f"corpus: {size_mb:.2f} MB, {len(found)} distinct tokens")
+    print(f"scan: best {best * 1000:.1f} ms, {size_mb / best:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
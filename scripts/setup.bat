@@ -1,7 +1,7 @@
 @echo off
 echo Setting up project...
-echo Initializing database...
-docker compose exec crypto-agent bash -c "cd /app/src && python -c 'from database import init_db; init_db()'"
 echo Setting up pgvector...
 docker compose exec crypto-agent bash -c "cd /app/src && python -c 'from database import setup_pgvector; setup_pgvector()'"
+echo Initializing database...
+docker compose exec crypto-agent bash -c "cd /app/src && python -c 'from database import init_db; init_db()'"
 echo Project setup complete!
@@ -19,6 +19,9 @@ DB_NAME = config("DB_NAME", default="crypto_news")
 DB_USER = config("DB_USER", default="postgres")
 DB_PASS = config("DB_PASS", default="postgres")
 
+# Vector size of the article embedding column (amazon.titan-embed-text-v1)
+EMBEDDING_DIMENSIONS = config("EMBEDDING_DIMENSIONS", default=1536, cast=int)
+
 # Create SQLAlchemy engine
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -26,6 +29,27 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create base class for models
 Base = declarative_base()
 
+# Idempotent DDL for tables that already exist; create_all only creates
+# missing tables, so new columns and indexes on old tables are added here.
+SCHEMA_UPGRADES = [
+    "CREATE INDEX IF NOT EXISTS ix_news_articles_pending_sentiment "
+    "ON news_articles (id) WHERE sentiment IS NULL",
+    f"ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS embedding vector({EMBEDDING_DIMENSIONS})",
+    "CREATE INDEX IF NOT EXISTS ix_news_articles_pending_embedding "
+    "ON news_articles (id) WHERE embedding IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_news_articles_embedding_hnsw "
+    "ON news_articles USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    "ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS duplicate_of_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_news_articles_duplicate_of_id ON news_articles (duplicate_of_id)",
+    "ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS dedup_key VARCHAR(80)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_news_articles_dedup_key ON news_articles (dedup_key)",
+    "ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS extraction_engine VARCHAR(32)",
+    "ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS extraction_seconds DOUBLE PRECISION",
+    "ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS token_prices JSON",
+    "CREATE INDEX IF NOT EXISTS ix_news_articles_tokens_mentioned "
+    "ON news_articles USING gin (tokens_mentioned)",
+]
+
 def get_db():
     """Get database session."""
     db = SessionLocal()
@@ -35,21 +59,46 @@ def get_db():
         db.close()
 
 def init_db():
-    """Initialize database with required tables."""
+    """Initialize database with required tables.
+
+    Run setup_pgvector() first; the embedding column needs the vector type.
+    """
     try:
         # Import models to ensure they are registered with Base
-        from models import NewsArticle
+        from models import NewsArticle, SentimentCacheEntry, ArticleSignature, S3IngestionState, TokenPriceSnapshot, SentimentRollup
 
         # Create all tables
         Base.metadata.create_all(bind=engine)
         logger.info("Database tables created successfully")
 
+        apply_schema_upgrades()
+
+        # Rows stored before dedup keys existed need one before ON CONFLICT can see them
+        from services.article_store import backfill_dedup_keys
+        backfill_dedup_keys()
+
+        # Articles analyzed before the rollup table existed
+        from services.sentiment_rollups import backfill_rollups
+        backfill_rollups()
+
+        # Articles saved before near-duplicate detection existed
+        from services.near_duplicates import backfill_signatures
+        backfill_signatures()
+
         logger.info("Database initialization completed")
 
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         raise
 
+def apply_schema_upgrades():
+    """Apply idempotent schema changes to existing tables."""
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
+
+    logger.info(f"Applied {len(SCHEMA_UPGRADES)} schema upgrade statements")
+
 def setup_pgvector():
     """Setup pgvector extension for vector operations."""
     try:
@@ -7,6 +7,7 @@ from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 import uvicorn
 from decouple import config
 import logging
@@ -14,8 +15,16 @@ import logging
 from database import get_db, init_db, setup_pgvector
 from models import NewsArticle
 from services.s3_processor import process_s3_pdfs
-from services.coingecko_service import fetch_latest_news
+from services.coingecko_service import fetch_latest_news, parse_watchlist
 from services.sentiment_analyzer import analyze_all_articles
+from services.job_manager import JobManager
+from services.pipeline import StreamingPipeline
+from services.http_pool import close_http_clients, http_pool_report, open_http_clients
+from services.response_cache import response_cache_report
+from services.sentiment_rollups import sentiment_timeseries
+from services.sentiment_stats import aggregate_sentiment, mentions_token
+from services.token_prices import get_price_cache
+from services.embeddings import embed_all_articles, find_similar_articles, get_embedding_backend, article_embedding_text
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +37,15 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# Background jobs for the long-running POST endpoints
+job_manager = JobManager(
+    max_workers=config("JOB_WORKERS", default=2, cast=int),
+    history_limit=config("JOB_HISTORY_LIMIT", default=100, cast=int)
+)
+
+# Continuous ingest -> analyze pipeline, started when PIPELINE_ENABLED is set
+pipeline = StreamingPipeline()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -41,12 +59,26 @@ app.add_middleware(
 async def startup_event():
     """Initialize database on startup."""
     try:
-        init_db()
+        # The vector extension must exist before the embedding column is created
         setup_pgvector()
+        init_db()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
 
+    # One keep-alive connection pool per outbound API for the app's lifetime
+    await open_http_clients("coingecko")
+
+    if config("PIPELINE_ENABLED", default=False, cast=bool):
+        pipeline.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain the pipeline, cancel running background jobs, stop the worker pool and close HTTP clients."""
+    pipeline.stop()
+    job_manager.shutdown()
+    await close_http_clients()
+
 @app.get("/")
 async def root():
     """Root endpoint with basic information."""
@@ -57,9 +89,15 @@ async def root():
         "endpoints": {
             "news": "/api/news/",
             "sentiment": "/api/sentiment/",
+            "sentiment_timeseries": "/api/sentiment/timeseries/",
             "process_s3": "/api/process/s3/",
             "fetch_live": "/api/fetch/live/",
-            "analyze": "/api/analyze/sentiment/"
+            "analyze": "/api/analyze/sentiment/",
+            "similar": "/api/news/similar/",
+            "embed": "/api/embed/articles/",
+            "jobs": "/api/jobs/",
+            "http_pools": "/api/http/pools/",
+            "pipeline": "/api/pipeline/"
         }
     }
 
@@ -88,7 +126,7 @@ async def get_news(
             query = query.filter(NewsArticle.sentiment == sentiment)
 
         if token:
-            query = query.filter(NewsArticle.tokens_mentioned.contains([token.upper()]))
+            query = query.filter(mentions_token(token))
 
         # Get total count
         total_count = query.count()
@@ -107,93 +145,180 @@ async def get_news(
         logger.error(f"Error fetching news: {e}")
         raise HTTPException(status_code=500, detail="Error fetching news articles")
 
-@app.get("/api/sentiment/")
-async def get_sentiment(
-    token: Optional[str] = Query(None),
+@app.get("/api/news/similar/")
+def get_similar_news(
+    article_id: Optional[int] = Query(None, ge=1),
+    q: Optional[str] = Query(None, min_length=1, max_length=2000),
+    k: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    """Get sentiment analysis results aggregated by token."""
-    try:
-        query = db.query(NewsArticle).filter(NewsArticle.sentiment.isnot(None))
-
-        if token:
-            query = query.filter(NewsArticle.tokens_mentioned.contains([token.upper()]))
+    """Get the k articles nearest to an article or a free-text query.
+
+    Declared without async so a Bedrock call for the query text runs on the
+    threadpool instead of the event loop.
+    """
+    if (article_id is None) == (q is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of article_id or q")
+
+    if article_id is not None:
+        article = db.get(NewsArticle, article_id)
+        if not article:
+            raise HTTPException(status_code=404, detail="Article not found")
+        if article.embedding is None:
+            raise HTTPException(status_code=409, detail="Article has not been embedded yet")
+        embedding = article.embedding
+    else:
+        try:
+            embedding = get_embedding_backend().embed([article_embedding_text(q, "")])[0]
+        except Exception as e:
+            logger.error(f"Error embedding similarity query: {e}")
+            raise HTTPException(status_code=502, detail="Error embedding query text")
 
-        articles = query.all()
-
-        # Aggregate sentiment data
-        sentiment_counts = {"bullish": 0, "bearish": 0, "neutral": 0}
-        total_confidence = 0
-        token_mentions = {}
+    try:
+        neighbours = find_similar_articles(db, embedding, k=k, exclude_id=article_id)
+        return {
+            "articles": [
+                {**neighbour.to_dict(), "similarity": round(1.0 - distance, 4)}
+                for neighbour, distance in neighbours
+            ],
+            "article_id": article_id,
+            "query": q,
+            "k": k
+        }
 
-        for article in articles:
-            if article.sentiment in sentiment_counts:
-                sentiment_counts[article.sentiment] += 1
+    except Exception as e:
+        logger.error(f"Error fetching similar news: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching similar articles")
 
-            if article.confidence_score:
-                total_confidence += article.confidence_score
+@app.get("/api/sentiment/")
+async def get_sentiment(
+    token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Get sentiment analysis results aggregated by token.
 
-            # Count token mentions
-            for token_mentioned in (article.tokens_mentioned or []):
-                token_mentions[token_mentioned] = token_mentions.get(token_mentioned, 0) + 1
+    Counts, confidence and token mentions are aggregated by the database;
+    no article rows are loaded.
+    """
+    try:
+        return aggregate_sentiment(db, token)
 
-        total_articles = len(articles)
-        avg_confidence = total_confidence / total_articles if total_articles > 0 else 0
+    except Exception as e:
+        logger.error(f"Error fetching sentiment: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching sentiment analysis")
 
-        # Determine overall sentiment
-        overall_sentiment = max(sentiment_counts, key=sentiment_counts.get) if total_articles > 0 else "neutral"
+@app.get("/api/sentiment/timeseries/")
+async def get_sentiment_timeseries(
+    token: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None, description="Defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Exclusive; defaults to now"),
+    granularity: str = Query("hour", regex="^(hour|day|week|month)$"),
+    db: Session = Depends(get_db)
+):
+    """Get sentiment counts and average confidence per period.
 
-        return {
-            "overall_sentiment": overall_sentiment,
-            "sentiment_distribution": sentiment_counts,
-            "total_articles": total_articles,
-            "average_confidence": round(avg_confidence, 3),
-            "token_mentions": token_mentions,
-            "filtered_by_token": token
-        }
+    Served from the hourly sentiment rollups, so the cost depends on the
+    number of hours in range rather than the number of articles.
+    """
+    try:
+        return sentiment_timeseries(db, token, start, end, granularity)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching sentiment: {e}")
-        raise HTTPException(status_code=500, detail="Error fetching sentiment analysis")
+        logger.error(f"Error fetching sentiment time series: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching sentiment time series")
 
-@app.post("/api/process/s3/")
+@app.post("/api/process/s3/", status_code=202)
 async def process_s3_endpoint():
-    """Process S3 PDFs and store in database."""
+    """Queue a background job that processes S3 PDFs into the database."""
     try:
-        process_s3_pdfs()
+        job, created = job_manager.submit("process_s3", lambda job: process_s3_pdfs(job=job))
         return {
-            "message": "S3 PDFs processed successfully",
-            "status": "completed"
+            "message": "S3 processing job queued" if created else "S3 processing job already in progress",
+            "job_id": job.id,
+            "status": job.status
         }
     except Exception as e:
-        logger.error(f"Error processing S3 PDFs: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing S3 PDFs: {str(e)}")
+        logger.error(f"Error queuing S3 processing job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error queuing S3 processing job: {str(e)}")
 
 @app.post("/api/fetch/live/")
-async def fetch_live_news():
+async def fetch_live_news(
+    coins: Optional[str] = Query(None, description="Comma-separated CoinGecko coin ids; defaults to COINGECKO_WATCHLIST")
+):
     """Fetch latest crypto news from CoinGecko API."""
     try:
-        await fetch_latest_news()
+        report = await fetch_latest_news(watchlist=parse_watchlist(coins) if coins else None)
         return {
             "message": "Live news fetched successfully",
-            "status": "completed"
+            "status": "completed",
+            "report": report
         }
     except Exception as e:
         logger.error(f"Error fetching live news: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching live news: {str(e)}")
 
-@app.post("/api/analyze/sentiment/")
+@app.post("/api/analyze/sentiment/", status_code=202)
 async def analyze_sentiment_endpoint():
-    """Analyze sentiment for all articles without sentiment data."""
+    """Queue a background job that analyzes articles without sentiment data."""
+    try:
+        job, created = job_manager.submit("analyze_sentiment", lambda job: analyze_all_articles(job=job))
+        return {
+            "message": "Sentiment analysis job queued" if created else "Sentiment analysis job already in progress",
+            "job_id": job.id,
+            "status": job.status
+        }
+    except Exception as e:
+        logger.error(f"Error queuing sentiment analysis job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error queuing sentiment analysis job: {str(e)}")
+
+@app.post("/api/embed/articles/", status_code=202)
+async def embed_articles_endpoint():
+    """Queue a background job that embeds articles without an embedding."""
     try:
-        analyze_all_articles()
+        job, created = job_manager.submit("embed_articles", lambda job: embed_all_articles(job=job))
         return {
-            "message": "Sentiment analysis completed successfully",
-            "status": "completed"
+            "message": "Embedding job queued" if created else "Embedding job already in progress",
+            "job_id": job.id,
+            "status": job.status
         }
     except Exception as e:
-        logger.error(f"Error analyzing sentiment: {e}")
-        raise HTTPException(status_code=500, detail=f"Error analyzing sentiment: {str(e)}")
+        logger.error(f"Error queuing embedding job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error queuing embedding job: {str(e)}")
+
+@app.get("/api/jobs/")
+async def list_jobs():
+    """List recent background jobs, newest first."""
+    return {"jobs": [job.to_dict() for job in job_manager.list_jobs()]}
+
+@app.get("/api/jobs/{job_id}/")
+async def get_job(job_id: str):
+    """Get progress, throughput and errors for a background job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/api/jobs/{job_id}/cancel/")
+async def cancel_job(job_id: str):
+    """Request cancellation of a queued or running background job."""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.cancel_requested:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
+
+@app.get("/api/http/pools/")
+async def get_http_pools():
+    """Connection reuse, response cache and price cache statistics for outbound APIs."""
+    return {"pools": http_pool_report(), "response_caches": response_cache_report(), "price_cache": get_price_cache().stats()}
+
+@app.get("/api/pipeline/")
+async def get_pipeline():
+    """Queue depth, sentiment lag and poller status of the streaming pipeline."""
+    return pipeline.stats()
 
 @app.get("/api/stats/")
 async def get_stats(db: Session = Depends(get_db)):
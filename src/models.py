@@ -2,9 +2,10 @@
 SQLAlchemy models for the crypto sentiment agent.
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ARRAY
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Float, ARRAY, JSON, Index, LargeBinary
 from sqlalchemy.sql import func
-from database import Base
+from pgvector.sqlalchemy import Vector
+from database import Base, EMBEDDING_DIMENSIONS
 
 
 class NewsArticle(Base):
@@ -24,6 +25,30 @@ class NewsArticle(Base):
     s3_bucket_source = Column(String(255))  # S3 bucket where article was sourced from
     s3_key_source = Column(String(500))  # S3 key/path of the source file
     created_at = Column(DateTime, default=func.now())
+    embedding = Column(Vector(EMBEDDING_DIMENSIONS))  # Title + content embedding for similarity search
+    duplicate_of_id = Column(Integer, index=True)  # Canonical article this one near-duplicates, if any
+    dedup_key = Column(String(80))  # SHA-256 of normalized URL, S3 object or title + source
+    extraction_engine = Column(String(32))  # PDF engine that produced content (fast, pypdf2, pdfplumber)
+    extraction_seconds = Column(Float)  # Time that engine took on the document
+    token_prices = Column(JSON)  # USD price of each mentioned token when the article was ingested
+
+    __table_args__ = (
+        # Keyset pagination over the sentiment backlog only touches unanalyzed rows
+        Index("ix_news_articles_pending_sentiment", "id", postgresql_where=sentiment.is_(None)),
+        Index("ix_news_articles_pending_embedding", "id", postgresql_where=embedding.is_(None)),
+        # Token filters (tokens_mentioned @> ARRAY[...]) on the news and sentiment endpoints
+        Index("ix_news_articles_tokens_mentioned", "tokens_mentioned", postgresql_using="gin"),
+        # Enforces one row per article; target of INSERT ... ON CONFLICT
+        Index("ix_news_articles_dedup_key", "dedup_key", unique=True),
+        # Approximate nearest-neighbour index for cosine distance (<=>) queries
+        Index(
+            "ix_news_articles_embedding_hnsw",
+            embedding,
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+    )
 
     def __repr__(self):
         return f"<NewsArticle(id={self.id}, title='{self.title[:50]}...', sentiment='{self.sentiment}')>"
@@ -42,5 +67,91 @@ class NewsArticle(Base):
             "confidence_score": self.confidence_score,
             "s3_bucket_source": self.s3_bucket_source,
             "s3_key_source": self.s3_key_source,
+            "duplicate_of_id": self.duplicate_of_id,
+            "extraction_engine": self.extraction_engine,
+            "extraction_seconds": self.extraction_seconds,
+            "token_prices": self.token_prices or {},
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+
+
+class SentimentCacheEntry(Base):
+    """Model for caching Bedrock sentiment results by prompt content hash."""
+
+    __tablename__ = "sentiment_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 of model, prompt version and prompt inputs
+    model_id = Column(String(255), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    result = Column(JSON, nullable=False)  # Parsed sentiment result as returned by the analyzer
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    last_accessed_at = Column(DateTime, default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<SentimentCacheEntry(cache_key='{self.cache_key[:12]}...', model_id='{self.model_id}', hits={self.hit_count})>"
+
+
+class ArticleSignature(Base):
+    """Model for persisting MinHash signatures used for near-duplicate detection."""
+
+    __tablename__ = "article_minhash"
+
+    article_id = Column(Integer, primary_key=True)  # news_articles.id
+    signature = Column(LargeBinary, nullable=False)  # NUM_PERM little-endian uint32 values
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<ArticleSignature(article_id={self.article_id})>"
+
+
+class S3IngestionState(Base):
+    """Model for tracking which version of each S3 object has been ingested."""
+
+    __tablename__ = "s3_ingestion_state"
+
+    bucket = Column(String(255), primary_key=True)
+    key = Column(String(1024), primary_key=True)
+    etag = Column(String(255), nullable=False)  # Unquoted ETag of the ingested object version
+    last_modified = Column(DateTime(timezone=True))
+    size = Column(BigInteger)
+    ingested_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<S3IngestionState(bucket='{self.bucket}', key='{self.key}', etag='{self.etag}')>"
+
+
+class TokenPriceSnapshot(Base):
+    """Model for the USD price time series of tokens mentioned in articles."""
+
+    __tablename__ = "token_price_snapshots"
+
+    coin_id = Column(String(128), primary_key=True)  # CoinGecko coin id
+    captured_at = Column(DateTime(timezone=True), primary_key=True)  # CoinGecko last_updated_at of the price
+    symbol = Column(String(32), nullable=False)
+    price_usd = Column(Float, nullable=False)
+    change_24h_pct = Column(Float)
+
+    __table_args__ = (
+        Index("ix_token_price_snapshots_symbol_captured_at", "symbol", "captured_at"),
+    )
+
+    def __repr__(self):
+        return f"<TokenPriceSnapshot(coin_id='{self.coin_id}', captured_at={self.captured_at}, price_usd={self.price_usd})>"
+
+
+class SentimentRollup(Base):
+    """Model for hourly sentiment counts per token, maintained as articles are analyzed."""
+
+    __tablename__ = "sentiment_rollups"
+
+    token = Column(String, primary_key=True)  # Token symbol, or "*" for all articles
+    bucket = Column(DateTime, primary_key=True)  # Hour of published_at, else created_at
+    bullish = Column(Integer, nullable=False, default=0)
+    bearish = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    articles = Column(Integer, nullable=False, default=0)  # All analyzed articles, any label
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<SentimentRollup(token='{self.token}', bucket={self.bucket}, articles={self.articles})>"
@@ -0,0 +1,206 @@
+"""
+Shared article persistence for the ingestion services.
+
+Every article gets a dedup key enforced by a unique index, and batches are
+written with one INSERT ... ON CONFLICT ... RETURNING per batch instead of
+a SELECT and INSERT per article.
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from decouple import config
+from sqlalchemy import Integer, String, column, literal_column, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import NewsArticle
+from services.near_duplicates import get_near_duplicate_index
+from services.sentiment_rollups import apply_rollup_deltas, lock_rollup_rows
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns written on insert; every row in a multi-row VALUES needs the same keys
+INSERT_COLUMNS = (
+    "title", "content", "source", "url", "published_at", "tokens_mentioned",
+    "sentiment", "confidence_score", "s3_bucket_source", "s3_key_source", "dedup_key",
+    "extraction_engine", "extraction_seconds", "token_prices",
+)
+
+# Query parameters that vary between shares of the same article
+TRACKING_PARAMS_PREFIXES = ("utm_", "ref", "fbclid", "gclid", "mc_")
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host, drop fragments, tracking parameters and trailing slashes."""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS_PREFIXES)
+    ))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def make_dedup_key(
+    url: Optional[str] = None,
+    s3_bucket: Optional[str] = None,
+    s3_key: Optional[str] = None,
+    title: Optional[str] = None,
+    source: Optional[str] = None
+) -> str:
+    """SHA-256 of the article's URL, else its S3 object, else its title and source."""
+    if url:
+        identity = f"url:{normalize_url(url)}"
+    elif s3_key:
+        identity = f"s3:{s3_bucket or ''}/{s3_key}"
+    else:
+        identity = f"title:{_normalize_text(title)}\x1f{_normalize_text(source)}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def article_dedup_key(article: NewsArticle) -> str:
+    """Dedup key for an article object."""
+    return make_dedup_key(article.url, article.s3_bucket_source, article.s3_key_source, article.title, article.source)
+
+
+def _build_insert(articles: List[NewsArticle], refresh_changed: bool):
+    """Build one INSERT ... ON CONFLICT ... RETURNING for a batch."""
+    statement = insert(NewsArticle).values([
+        {name: getattr(article, name) for name in INSERT_COLUMNS} for article in articles
+    ])
+
+    if refresh_changed:
+        # Re-ingested sources with new content replace the stored text and
+        # clear results derived from it, so later stages redo the article
+        statement = statement.on_conflict_do_update(
+            index_elements=[NewsArticle.dedup_key],
+            set_={
+                "content": statement.excluded.content,
+                "extraction_engine": statement.excluded.extraction_engine,
+                "extraction_seconds": statement.excluded.extraction_seconds,
+                "sentiment": None,
+                "confidence_score": None,
+                "embedding": None,
+                "duplicate_of_id": None,
+            },
+            where=NewsArticle.content.is_distinct_from(statement.excluded.content)
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[NewsArticle.dedup_key])
+
+    # xmax is 0 only for freshly inserted rows, which tells inserts from updates
+    return statement.returning(NewsArticle.id, NewsArticle.dedup_key, literal_column("(xmax = 0)").label("inserted"))
+
+
+def bulk_insert_articles(
+    db: Session,
+    articles: List[NewsArticle],
+    refresh_changed: bool = False,
+    batch_size: int = None
+) -> Dict[str, Any]:
+    """Insert articles that are not stored yet and flag near-duplicates.
+
+    Runs in the caller's transaction. Each batch is one round trip that
+    reports which rows were inserted (or refreshed, with refresh_changed);
+    conflicting rows are skipped by the database, so overlapping runs
+    cannot insert the same article twice. Inserted and refreshed article
+    objects get their id and duplicate_of_id, refreshed ones judged on
+    their new text, and "article_ids" lists both so callers can hand them
+    to later stages.
+    Refreshing an analyzed article takes its result out of the sentiment
+    rollups.
+    """
+    batch_size = batch_size or config("ARTICLE_INSERT_BATCH_SIZE", default=500, cast=int)
+
+    # One row per key; ON CONFLICT DO UPDATE cannot touch a row twice in one statement
+    unique: Dict[str, NewsArticle] = {}
+    for article in articles:
+        article.dedup_key = article.dedup_key or article_dedup_key(article)
+        unique.setdefault(article.dedup_key, article)
+    batch_articles = list(unique.values())
+
+    inserted: List[NewsArticle] = []
+    refreshed: List[NewsArticle] = []
+    article_ids: List[int] = []
+    for start in range(0, len(batch_articles), batch_size):
+        batch = batch_articles[start:start + batch_size]
+        # Locked so a refresh clears exactly the results read here
+        stored = lock_rollup_rows(db, NewsArticle.__table__.c.dedup_key, [article.dedup_key for article in batch]) if refresh_changed else {}
+        cleared = []
+        for article_id, dedup_key, was_inserted in db.execute(_build_insert(batch, refresh_changed)):
+            unique[dedup_key].id = article_id
+            article_ids.append(article_id)
+            if was_inserted:
+                inserted.append(unique[dedup_key])
+            else:
+                refreshed.append(unique[dedup_key])
+                if dedup_key in stored:
+                    cleared.append(stored[dedup_key])
+        # A refresh clears the stored sentiment, which leaves the rollups
+        apply_rollup_deltas(db, removed=cleared)
+
+    flagged = get_near_duplicate_index().flag_articles(db, inserted + refreshed)
+
+    return {
+        "inserted": len(inserted),
+        "updated": len(refreshed),
+        "skipped": len(articles) - len(inserted) - len(refreshed),
+        "near_duplicates": flagged,
+        "article_ids": article_ids
+    }
+
+
+def backfill_dedup_keys(batch_size: int = 1000) -> int:
+    """Set dedup_key on rows stored before the column existed.
+
+    Rows whose key is already taken are older copies of the same article;
+    they get the key suffixed with their id so the unique index holds.
+    """
+    table = NewsArticle.__table__
+    total = 0
+    last_id = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                NewsArticle.id, NewsArticle.url, NewsArticle.s3_bucket_source,
+                NewsArticle.s3_key_source, NewsArticle.title, NewsArticle.source
+            ).filter(
+                NewsArticle.dedup_key.is_(None),
+                NewsArticle.id > last_id
+            ).order_by(NewsArticle.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            keys = {row.id: make_dedup_key(row.url, row.s3_bucket_source, row.s3_key_source, row.title, row.source) for row in rows}
+            taken = set(db.scalars(select(NewsArticle.dedup_key).where(NewsArticle.dedup_key.in_(set(keys.values())))))
+
+            assignments = []
+            for article_id, key in keys.items():
+                if key in taken:
+                    key = f"{key}#{article_id}"
+                taken.add(key)
+                assignments.append((article_id, key))
+
+            updates = values(column("id", Integer), column("dedup_key", String), name="updates").data(assignments)
+            db.execute(update(table).where(table.c.id == updates.c.id).values(dedup_key=updates.c.dedup_key))
+            db.commit()
+            total += len(assignments)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    if total:
+        logger.info(f"Backfilled dedup keys for {total} articles")
+    return total
@@ -2,14 +2,23 @@
 CoinGecko API service for fetching live crypto news.
 """
 
+import asyncio
 import httpx
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from decouple import config
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import NewsArticle
+from services.article_store import article_dedup_key, bulk_insert_articles
+from services.near_duplicates import get_near_duplicate_index
+from services.http_pool import close_http_clients, get_http_client, trace_extension
+from services.rate_limiter import async_retry_with_backoff, get_rate_limiter
+from services.response_cache import FetchResult, get_response_cache
+from services.token_extractor import extract_tokens, get_token_extractor, refresh_coin_registry
+from services.token_prices import get_price_cache, parse_simple_price, save_price_snapshots
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,8 +27,13 @@ logger = logging.getLogger(__name__)
 class CoinGeckoService:
     """Service for fetching crypto news from CoinGecko API."""
 
-    def __init__(self):
-        """Initialize CoinGecko API client."""
+    def __init__(self, client: httpx.AsyncClient = None):
+        """Initialize CoinGecko API client.
+
+        Requests go through the process's pooled client for the running
+        event loop unless a client is passed in.
+        """
+        self.client = client
         self.api_key = config("COINGECKO_API_KEY")
         self.base_url = "https://api.coingecko.com/api/v3"
         self.headers = {
@@ -27,23 +41,68 @@ class CoinGeckoService:
             "Content-Type": "application/json"
         }
 
-        # Rate limiting
-        self.rate_limit_delay = 1.0  # 1 second between requests
+        # Rate limiting shared by every CoinGecko caller in the process
+        self.rate_limiter = get_rate_limiter("coingecko")
+        self.max_retries = config("COINGECKO_MAX_RETRIES", default=4, cast=int)
+        self.retry_base_delay = config("COINGECKO_RETRY_BASE_DELAY", default=1.0, cast=float)
+
+        # Responses cached per endpoint TTL, shared by every CoinGecko caller in the process
+        self.response_cache = get_response_cache("coingecko")
+
+        # Watchlist mode: coin ids fetched concurrently on each live refresh
+        self.watchlist = parse_watchlist(config("COINGECKO_WATCHLIST", default=""))
+        self.watchlist_concurrency = config("COINGECKO_WATCHLIST_CONCURRENCY", default=16, cast=int)
+
+        # Price enrichment: distinct mentioned coins priced in batched /simple/price calls
+        self.price_enrichment = config("PRICE_ENRICHMENT_ENABLED", default=True, cast=bool)
+        self.price_batch_size = config("COINGECKO_PRICE_BATCH_SIZE", default=250, cast=int)
+        self.price_cache = get_price_cache()
+        self.price_requests = 0
+
+        # Ids of the articles inserted by the last save, for the streaming pipeline
+        self.last_saved_ids: List[int] = []
 
     async def _make_request(self, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Make HTTP request to CoinGecko API with rate limiting."""
+        """Make HTTP request to CoinGecko API, served from the response cache when fresh."""
+        return await self.response_cache.get(
+            endpoint,
+            params or {},
+            lambda validators: self._fetch(endpoint, params, validators)
+        )
+
+    async def _fetch(self, endpoint: str, params: Dict[str, Any] = None, validators: Dict[str, str] = None) -> FetchResult:
+        """Make HTTP request to CoinGecko API with rate limiting.
+
+        validators are If-None-Match / If-Modified-Since headers; a 304
+        reply means the cached response is still current.
+        """
         url = f"{self.base_url}{endpoint}"
 
+        async def call():
+            await self.rate_limiter.acquire_async()
+            client = self.client or get_http_client("coingecko")
+            response = await client.get(
+                url,
+                headers={**self.headers, **(validators or {})},
+                params=params or {},
+                extensions=trace_extension("coingecko")
+            )
+            if response.status_code == 304:
+                return FetchResult(not_modified=True)
+            response.raise_for_status()
+            return FetchResult(
+                data=response.json(),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers=self.headers,
-                    params=params or {},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await async_retry_with_backoff(
+                call,
+                max_attempts=self.max_retries + 1,
+                base_delay=self.retry_base_delay,
+                max_delay=60.0
+            )
 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error {e.response.status_code}: {e.response.text}")
@@ -56,23 +115,35 @@ class CoinGeckoService:
             raise
 
     def _extract_tokens_from_text(self, text: str) -> List[str]:
-        """Extract crypto token symbols from text."""
-        # Common crypto tokens to look for
-        crypto_tokens = [
-            "BTC", "BITCOIN", "ETH", "ETHEREUM", "SOL", "SOLANA",
-            "USDT", "USDC", "BNB", "ADA", "XRP", "DOGE", "DOT",
-            "AVAX", "MATIC", "LINK", "UNI", "LTC", "BCH", "ATOM"
+        """Extract canonical crypto token symbols from text using the coin registry."""
+        return extract_tokens(text)
+
+    async def fetch_coin_registry(self, ranked_pages: int = None) -> List[Dict[str, Any]]:
+        """Fetch every listed coin, with the market-cap rank of the top coins.
+
+        One /coins/list call returns id, symbol and name of every coin;
+        /coins/markets pages (250 coins each) add the ranks that decide
+        which coins are matched by name and bare symbol.
+        """
+        pages = ranked_pages if ranked_pages is not None else config("COINGECKO_COIN_REGISTRY_RANKED_PAGES", default=4, cast=int)
+        coins = await self._make_request("/coins/list")
+
+        ranks = {}
+        for page in range(1, pages + 1):
+            markets = await self._make_request(
+                "/coins/markets",
+                {"vs_currency": "usd", "order": "market_cap_desc", "per_page": 250, "page": page}
+            )
+            for coin in markets:
+                ranks[coin["id"]] = coin.get("market_cap_rank")
+            if len(markets) < 250:
+                break
+
+        return [
+            {"id": coin["id"], "symbol": coin.get("symbol", ""), "name": coin.get("name", ""), "rank": ranks.get(coin["id"])}
+            for coin in coins
         ]
 
-        text_upper = text.upper()
-        found_tokens = []
-
-        for token in crypto_tokens:
-            if token in text_upper:
-                found_tokens.append(token)
-
-        return list(set(found_tokens))  # Remove duplicates
-
     def _parse_coingecko_article(self, article_data: Dict[str, Any]) -> NewsArticle:
         """Parse CoinGecko article data into NewsArticle model."""
         try:
@@ -147,17 +218,16 @@ class CoinGeckoService:
             logger.error(f"Error fetching trending news: {e}")
             return []
 
+    async def _request_coin_news(self, coin_id: str) -> List[NewsArticle]:
+        """Fetch and parse news for one coin, raising on failure."""
+        # This endpoint might require a paid plan
+        news_data = await self._make_request(f"/coins/{coin_id}/news")
+        return [self._parse_coingecko_article(article_data) for article_data in news_data]
+
     async def fetch_coin_news(self, coin_id: str = "bitcoin") -> List[NewsArticle]:
         """Fetch news for a specific coin (Note: This endpoint may not be available in free tier)."""
         try:
-            # This endpoint might require a paid plan
-            news_data = await self._make_request(f"/coins/{coin_id}/news")
-
-            articles = []
-            for article_data in news_data:
-                article = self._parse_coingecko_article(article_data)
-                articles.append(article)
-
+            articles = await self._request_coin_news(coin_id)
             logger.info(f"Fetched {len(articles)} news articles for {coin_id}")
             return articles
 
@@ -165,58 +235,235 @@ class CoinGeckoService:
             logger.warning(f"Could not fetch coin news (may require paid plan): {e}")
             return []
 
+    async def fetch_watchlist_news(
+        self,
+        coin_ids: List[str],
+        concurrency: int = None
+    ) -> Tuple[List[NewsArticle], Dict[str, Any]]:
+        """Fetch news for every coin in a watchlist, plus trending, concurrently.
+
+        At most `concurrency` requests are in flight and all of them share
+        the CoinGecko rate budget, so the pass runs as fast as the API key
+        allows. Articles are merged and deduplicated before returning, and
+        the report has the latency and outcome of every coin.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.watchlist_concurrency))
+        started = time.perf_counter()
+
+        async def fetch_one(coin_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                coin_started = time.perf_counter()
+                try:
+                    articles = await self._request_coin_news(coin_id)
+                    error = None
+                except Exception as e:
+                    articles = []
+                    error = str(e) or type(e).__name__
+                return {
+                    "coin_id": coin_id,
+                    "seconds": round(time.perf_counter() - coin_started, 3),
+                    "articles": articles,
+                    "error": error
+                }
+
+        trending, *coin_results = await asyncio.gather(
+            self.fetch_trending_news(),
+            *(fetch_one(coin_id) for coin_id in dict.fromkeys(coin_ids))
+        )
+
+        fetched = list(trending)
+        for result in coin_results:
+            fetched.extend(result["articles"])
+        articles = merge_duplicate_articles(fetched)
+
+        latencies = sorted(result["seconds"] for result in coin_results)
+        failed = [result for result in coin_results if result["error"]]
+        report = {
+            "coins": len(coin_results),
+            "failed_coins": len(failed),
+            "trending_items": len(trending),
+            "articles_fetched": len(fetched),
+            "articles_unique": len(articles),
+            "wall_seconds": round(time.perf_counter() - started, 3),
+            "latency_p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+            "latency_max_seconds": latencies[-1] if latencies else None,
+            "per_coin": [
+                {"coin_id": result["coin_id"], "seconds": result["seconds"], "articles": len(result["articles"]), "error": result["error"]}
+                for result in coin_results
+            ]
+        }
+        logger.info(
+            f"Watchlist pass: {report['coins']} coins ({report['failed_coins']} failed), "
+            f"{report['articles_unique']} unique of {report['articles_fetched']} articles in {report['wall_seconds']}s"
+        )
+        return articles, report
+
+    async def fetch_prices(self, coin_ids: List[str], symbols: Dict[str, str] = None) -> Dict[str, Dict[str, Any]]:
+        """USD prices of coins, in as few /simple/price calls as the batch size allows.
+
+        Coins priced within the cache TTL, or being priced by a concurrent
+        batch, are not requested again. Newly fetched prices are appended
+        to the price time series; symbols maps coin id to symbol for it.
+        """
+        async def fetch(missing: List[str]) -> Dict[str, Dict[str, Any]]:
+            chunks = [missing[start:start + self.price_batch_size] for start in range(0, len(missing), self.price_batch_size)]
+            self.price_requests += len(chunks)
+            results = await asyncio.gather(*(
+                self._fetch("/simple/price", {
+                    "ids": ",".join(chunk),
+                    "vs_currencies": "usd",
+                    "include_24hr_change": "true",
+                    "include_last_updated_at": "true"
+                })
+                for chunk in chunks
+            ))
+
+            prices = {}
+            for result in results:
+                prices.update(parse_simple_price(result.data))
+            try:
+                await asyncio.to_thread(save_price_snapshots, prices, symbols or {})
+            except Exception as e:
+                logger.warning(f"Could not store price snapshots: {e}")
+            return prices
+
+        return await self.price_cache.get_many(coin_ids, fetch)
+
+    async def enrich_with_prices(self, articles: List[NewsArticle]) -> Dict[str, Any]:
+        """Set token_prices on a batch of articles from one batched price lookup.
+
+        The distinct tokens_mentioned symbols of the whole batch are
+        resolved to coin ids through the coin registry and priced together.
+        """
+        extractor = get_token_extractor()
+        symbols = list(dict.fromkeys(token for article in articles for token in (article.tokens_mentioned or [])))
+        coin_ids = {symbol: extractor.coin_id(symbol) for symbol in symbols}
+        resolved = {symbol: coin_id for symbol, coin_id in coin_ids.items() if coin_id}
+
+        requests_before = self.price_requests
+        prices = await self.fetch_prices(
+            list(dict.fromkeys(resolved.values())),
+            symbols={coin_id: symbol for symbol, coin_id in resolved.items()}
+        ) if resolved else {}
+
+        for article in articles:
+            article.token_prices = {
+                symbol: prices[resolved[symbol]]["price_usd"]
+                for symbol in (article.tokens_mentioned or [])
+                if resolved.get(symbol) in prices
+            } or None
+
+        report = {
+            "symbols": len(symbols),
+            "unresolved": [symbol for symbol in symbols if symbol not in resolved],
+            "priced": sum(1 for symbol in resolved if resolved[symbol] in prices),
+            "requests": self.price_requests - requests_before,
+            "cache": self.price_cache.stats()
+        }
+        logger.info(
+            f"Priced {report['priced']} of {report['symbols']} tokens for {len(articles)} articles "
+            f"in {report['requests']} /simple/price requests"
+        )
+        return report
+
     def save_articles_to_db(self, articles: List[NewsArticle]) -> int:
-        """Save fetched articles to database."""
+        """Save fetched articles to database with one bulk insert per batch."""
         db = SessionLocal()
-        saved_count = 0
 
         try:
-            for article in articles:
-                # Check if article already exists (by title and source)
-                existing = db.query(NewsArticle).filter(
-                    NewsArticle.title == article.title,
-                    NewsArticle.source == article.source
-                ).first()
-
-                if not existing:
-                    db.add(article)
-                    saved_count += 1
-                else:
-                    logger.info(f"Article already exists: {article.title}")
-
+            counts = bulk_insert_articles(db, articles)
             db.commit()
-            logger.info(f"Saved {saved_count} new articles to database")
+            self.last_saved_ids = counts["article_ids"]
+            logger.info(
+                f"Saved {counts['inserted']} new articles to database "
+                f"({counts['skipped']} already stored, {counts['near_duplicates']} near-duplicates)"
+            )
 
         except Exception as e:
             logger.error(f"Error saving articles to database: {e}")
             db.rollback()
+            get_near_duplicate_index().invalidate()
             raise
         finally:
             db.close()
 
-        return saved_count
+        return counts["inserted"]
+
+
+def parse_watchlist(value: str) -> List[str]:
+    """Split a comma- or whitespace-separated list of coin ids, keeping order."""
+    return list(dict.fromkeys(coin_id.strip().lower() for coin_id in value.replace(",", " ").split() if coin_id.strip()))
+
+
+def merge_duplicate_articles(articles: List[NewsArticle]) -> List[NewsArticle]:
+    """Keep one article per dedup key, with the tokens of every copy.
+
+    The same story is often returned for several coins of a watchlist.
+    """
+    merged: Dict[str, NewsArticle] = {}
+    for article in articles:
+        article.dedup_key = article.dedup_key or article_dedup_key(article)
+        kept = merged.setdefault(article.dedup_key, article)
+        if kept is not article:
+            kept.tokens_mentioned = list(dict.fromkeys((kept.tokens_mentioned or []) + (article.tokens_mentioned or [])))
+    return list(merged.values())
+
 
+async def fetch_latest_news(watchlist: List[str] = None, service: CoinGeckoService = None) -> Dict[str, Any]:
+    """Main function to fetch latest news from CoinGecko.
 
-async def fetch_latest_news():
-    """Main function to fetch latest news from CoinGecko."""
+    With a watchlist (argument or COINGECKO_WATCHLIST), news for every
+    coin is fetched concurrently alongside trending; otherwise only
+    trending is fetched. Returns a summary of the pass; the ids of the
+    saved articles are left in service.last_saved_ids.
+    """
     try:
-        service = CoinGeckoService()
+        service = service or CoinGeckoService()
+        service.last_saved_ids = []
+        coin_ids = watchlist if watchlist is not None else service.watchlist
 
-        # Fetch trending news
-        articles = await service.fetch_trending_news()
+        # Keep the coin registry behind token extraction fresh; a failure keeps the last snapshot
+        try:
+            await refresh_coin_registry(service)
+        except Exception as e:
+            logger.warning(f"Could not refresh coin registry: {e}")
+
+        if coin_ids:
+            articles, report = await service.fetch_watchlist_news(coin_ids)
+        else:
+            # Fetch trending news
+            articles = await service.fetch_trending_news()
+            report = {"coins": 0, "trending_items": len(articles), "articles_unique": len(articles)}
+
+        if articles and service.price_enrichment:
+            # Prices at ingestion time; a failed lookup saves the articles without them
+            try:
+                report["prices"] = await service.enrich_with_prices(articles)
+            except Exception as e:
+                logger.warning(f"Price enrichment skipped: {e}")
 
         if articles:
-            # Save to database
-            saved_count = service.save_articles_to_db(articles)
+            # Save to database; the first save loads the near-duplicate index, so keep it off the event loop
+            saved_count = await asyncio.to_thread(service.save_articles_to_db, articles)
             logger.info(f"Successfully fetched and saved {saved_count} articles from CoinGecko")
         else:
+            saved_count = 0
             logger.warning("No articles were fetched from CoinGecko")
 
+        report["saved"] = saved_count
+        return report
+
     except Exception as e:
         logger.error(f"Error in fetch_latest_news: {e}")
         raise
 
 
+async def _main():
+    try:
+        await fetch_latest_news()
+    finally:
+        await close_http_clients()
+
+
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(fetch_latest_news())
+    asyncio.run(_main())
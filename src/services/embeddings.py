@@ -0,0 +1,277 @@
+"""
+Article embeddings for pgvector similarity search.
+
+Backends are pluggable: Amazon Titan on Bedrock in production and a
+deterministic feature-hashing embedder for offline development and tests.
+"""
+
+import boto3
+import hashlib
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from botocore.config import Config
+from decouple import config
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Integer, cast, column, text, update, values
+from sqlalchemy.orm import Session
+from database import SessionLocal, EMBEDDING_DIMENSIONS
+from models import NewsArticle
+from services.job_manager import Job, JobCancelled
+from services.rate_limiter import get_rate_limiter, retry_with_backoff
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Title plus the start of the body; enough to place an article topically
+EMBEDDING_CONTENT_CHARS = 2000
+
+WORD_PATTERN = re.compile(r"[a-z0-9$]+")
+
+
+def article_embedding_text(title: str, content: Optional[str]) -> str:
+    """Text that is embedded for an article."""
+    return f"{title}\n\n{(content or '')[:EMBEDDING_CONTENT_CHARS]}"
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder that needs no network access.
+
+    Words and word bigrams are hashed into signed buckets and the result is
+    L2-normalized, so texts sharing vocabulary get a high cosine similarity.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        """Initialize the output vector size."""
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        """Lowercased words and adjacent word pairs."""
+        words = WORD_PATTERN.findall(text.lower())
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts."""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text_value in enumerate(texts):
+            for feature in self._features(text_value):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dimensions
+                matrix[row, index] += 1.0 if digest[4] & 1 else -1.0
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+
+class BedrockTitanEmbedder:
+    """Amazon Titan text embeddings via Bedrock.
+
+    Titan embeds one text per request, so batches are spread over a small
+    thread pool that shares the process-wide Bedrock rate limiter.
+    """
+
+    name = "bedrock"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        """Initialize Bedrock client and configuration."""
+        self.dimensions = dimensions
+        self.model_id = config("BEDROCK_EMBEDDING_MODEL_ID", default="amazon.titan-embed-text-v1")
+        self.max_concurrency = config("EMBEDDING_MAX_CONCURRENCY", default=4, cast=int)
+        self.max_retries = config("BEDROCK_MAX_RETRIES", default=4, cast=int)
+        self.retry_base_delay = config("BEDROCK_RETRY_BASE_DELAY", default=0.5, cast=float)
+        self.retry_max_delay = config("BEDROCK_RETRY_MAX_DELAY", default=20.0, cast=float)
+        self.rate_limiter = get_rate_limiter("bedrock")
+
+        self.bedrock_client = boto3.client(
+            'bedrock-runtime',
+            aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
+            region_name=config("AWS_BEDROCK_REGION", default="us-east-1"),
+            config=Config(
+                max_pool_connections=max(self.max_concurrency, 10),
+                retries={"mode": "standard", "total_max_attempts": 1}
+            )
+        )
+
+    def _request_body(self, text_value: str) -> Dict:
+        """Titan v2 takes an output size; v1 is fixed at 1536 dimensions."""
+        body = {"inputText": text_value}
+        if "embed-text-v2" in self.model_id:
+            body["dimensions"] = self.dimensions
+            body["normalize"] = True
+        return body
+
+    def _embed_one(self, text_value: str) -> List[float]:
+        """Embed a single text."""
+        estimated_tokens = len(text_value) // 4 + 1
+
+        def call():
+            # Every attempt, retries included, takes its own slot in the budget
+            self.rate_limiter.acquire(tokens=estimated_tokens)
+            return self.bedrock_client.invoke_model(
+                modelId=self.model_id,
+                body=json.dumps(self._request_body(text_value)),
+                contentType="application/json",
+                accept="application/json"
+            )
+
+        response = retry_with_backoff(
+            call,
+            max_attempts=self.max_retries + 1,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay
+        )
+        payload = json.loads(response["body"].read())
+        self.rate_limiter.record_tokens(estimated_tokens, payload.get("inputTextTokenCount", estimated_tokens))
+
+        embedding = payload["embedding"]
+        if len(embedding) != self.dimensions:
+            raise ValueError(f"{self.model_id} returned {len(embedding)} dimensions, expected {self.dimensions}")
+        return embedding
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts concurrently, preserving order."""
+        if len(texts) <= 1:
+            return [self._embed_one(text_value) for text_value in texts]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts))) as executor:
+            return list(executor.map(self._embed_one, texts))
+
+
+EMBEDDING_BACKENDS = {
+    HashingEmbedder.name: HashingEmbedder,
+    BedrockTitanEmbedder.name: BedrockTitanEmbedder,
+}
+
+_backends: Dict[str, object] = {}
+_backends_lock = threading.Lock()
+
+
+def get_embedding_backend(name: str = None):
+    """Return the process-wide embedder for EMBEDDING_BACKEND (bedrock or hashing)."""
+    name = name or config("EMBEDDING_BACKEND", default="bedrock")
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {sorted(EMBEDDING_BACKENDS)}")
+
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = EMBEDDING_BACKENDS[name]()
+        return _backends[name]
+
+
+def build_embedding_update(rows: List[Tuple[int, List[float]]]):
+    """Build one UPDATE ... FROM (VALUES ...) statement writing (id, embedding) rows."""
+    updates = values(
+        column("id", Integer),
+        column("embedding", Vector(EMBEDDING_DIMENSIONS)),
+        name="updates"
+    ).data(rows)
+
+    table = NewsArticle.__table__
+    return update(table).where(table.c.id == updates.c.id).values(
+        embedding=cast(updates.c.embedding, Vector(EMBEDDING_DIMENSIONS))
+    )
+
+
+def iter_unembedded_chunks(chunk_size: int) -> Iterator[List[Tuple[int, str, Optional[str]]]]:
+    """Yield (id, title, content) chunks of articles without an embedding, in id order."""
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(NewsArticle.id, NewsArticle.title, NewsArticle.content).filter(
+                NewsArticle.embedding.is_(None),
+                NewsArticle.id > last_id
+            ).order_by(NewsArticle.id).limit(chunk_size).all()
+        finally:
+            db.close()
+
+        if not rows:
+            return
+
+        last_id = rows[-1].id
+        yield [tuple(row) for row in rows]
+
+
+def embed_all_articles(batch_size: int = None, job: Job = None, backend=None) -> int:
+    """Embed every article that has no embedding yet, committing per batch.
+
+    Like analyze_all_articles, an interrupted run resumes with the articles
+    that are still missing an embedding.
+    """
+    batch_size = batch_size or config("EMBEDDING_BATCH_SIZE", default=64, cast=int)
+    backend = backend or get_embedding_backend()
+    total_embedded = 0
+
+    try:
+        if job:
+            db = SessionLocal()
+            try:
+                job.add_total(db.query(NewsArticle).filter(NewsArticle.embedding.is_(None)).count())
+            finally:
+                db.close()
+
+        for rows in iter_unembedded_chunks(batch_size):
+            if job:
+                job.raise_if_cancelled()
+
+            vectors = backend.embed([article_embedding_text(title, content) for _, title, content in rows])
+
+            db = SessionLocal()
+            try:
+                result = db.execute(build_embedding_update([(row[0], vector) for row, vector in zip(rows, vectors)]))
+                db.commit()
+                total_embedded += result.rowcount
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            if job:
+                job.advance(len(rows))
+            logger.info(f"Embedded articles {rows[0][0]}-{rows[-1][0]} ({total_embedded} so far)")
+
+        logger.info(f"Embedded {total_embedded} articles with the {backend.name} backend")
+        return total_embedded
+
+    except JobCancelled:
+        logger.info(f"Embedding cancelled after {total_embedded} articles")
+        raise
+    except Exception as e:
+        logger.error(f"Error in embed_all_articles after {total_embedded} articles: {e}")
+        raise
+
+
+def find_similar_articles(
+    db: Session,
+    embedding: List[float],
+    k: int = 10,
+    exclude_id: int = None
+) -> List[Tuple[NewsArticle, float]]:
+    """Return the k articles nearest to embedding as (article, cosine distance).
+
+    ORDER BY embedding <=> :vector LIMIT k is answered from the HNSW index.
+    ef_search is raised above k so the index can return k candidates even
+    after the query article itself is filtered out.
+    """
+    ef_search = max(k + 1, config("EMBEDDING_EF_SEARCH", default=40, cast=int))
+    db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+
+    distance = NewsArticle.embedding.cosine_distance(embedding)
+    query = db.query(NewsArticle, distance.label("distance")).filter(NewsArticle.embedding.isnot(None))
+    if exclude_id is not None:
+        query = query.filter(NewsArticle.id != exclude_id)
+
+    return [(article, float(article_distance)) for article, article_distance in query.order_by(distance).limit(k).all()]
+
+
+if __name__ == "__main__":
+    embed_all_articles()
@@ -0,0 +1,186 @@
+"""
+Long-lived, pooled HTTP clients for outbound APIs.
+
+Opening an httpx.AsyncClient per request pays for DNS, TCP and TLS on
+every call. Instead each service gets one client per event loop, with
+HTTP/2 and keep-alive, so requests reuse warm connections. The API
+process opens its clients at startup and closes them at shutdown;
+scripts and worker threads with their own event loop get a client on
+first use and close it with close_http_clients().
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Tuple
+
+import httpx
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Defaults per service; each can be overridden with <SERVICE>_HTTP2,
+# <SERVICE>_HTTP_MAX_CONNECTIONS, <SERVICE>_HTTP_MAX_KEEPALIVE,
+# <SERVICE>_HTTP_KEEPALIVE_EXPIRY, <SERVICE>_HTTP_CONNECT_TIMEOUT and <SERVICE>_HTTP_READ_TIMEOUT
+DEFAULTS = {
+    "max_connections": 20,
+    "max_keepalive": 10,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 5.0,
+    "read_timeout": 30.0,
+}
+SERVICE_DEFAULTS = {
+    "coingecko": DEFAULTS,
+}
+
+
+class PoolStats:
+    """Requests sent and connections opened for one service, across all its clients.
+
+    Counted from httpcore trace events, so every request that did not
+    open a new connection reused a pooled one (or shared an HTTP/2 one).
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+        self.clients_opened = 0
+        self._lock = threading.Lock()
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        """httpx "trace" extension callback."""
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif event_name in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+                self.requests += 1
+                if event_name.startswith("http2"):
+                    self.http2_requests += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(0, self.requests - self.connections_opened),
+                "tls_handshakes": self.tls_handshakes,
+                "http2_requests": self.http2_requests,
+                "clients_opened": self.clients_opened,
+                "reuse_rate": round(1 - self.connections_opened / self.requests, 3) if self.requests else 0.0
+            }
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def build_client(service: str, transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    """Create a pooled AsyncClient configured for a service."""
+    defaults = SERVICE_DEFAULTS.get(service, DEFAULTS)
+    prefix = service.upper()
+
+    http2 = config(f"{prefix}_HTTP2", default=True, cast=bool)
+    if http2 and not _http2_available():
+        logger.warning(f"HTTP/2 requested for {service} but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    read_timeout = config(f"{prefix}_HTTP_READ_TIMEOUT", default=defaults["read_timeout"], cast=float)
+    return httpx.AsyncClient(
+        http2=http2,
+        transport=transport,
+        limits=httpx.Limits(
+            max_connections=config(f"{prefix}_HTTP_MAX_CONNECTIONS", default=defaults["max_connections"], cast=int),
+            max_keepalive_connections=config(f"{prefix}_HTTP_MAX_KEEPALIVE", default=defaults["max_keepalive"], cast=int),
+            keepalive_expiry=config(f"{prefix}_HTTP_KEEPALIVE_EXPIRY", default=defaults["keepalive_expiry"], cast=float)
+        ),
+        timeout=httpx.Timeout(
+            read_timeout,
+            connect=config(f"{prefix}_HTTP_CONNECT_TIMEOUT", default=defaults["connect_timeout"], cast=float),
+            pool=read_timeout
+        )
+    )
+
+
+_clients: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_stats: Dict[str, PoolStats] = {}
+_clients_lock = threading.Lock()
+
+
+def get_pool_stats(service: str) -> PoolStats:
+    """Return the process-wide statistics for a service."""
+    with _clients_lock:
+        return _stats.setdefault(service, PoolStats())
+
+
+def get_http_client(service: str) -> httpx.AsyncClient:
+    """Return the running event loop's client for a service, creating it on first use.
+
+    Connections belong to the loop they were opened on, so each loop gets
+    its own client; the API process only ever has one.
+    """
+    loop = asyncio.get_running_loop()
+    key = (service, id(loop))
+    stats = get_pool_stats(service)
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+
+        client = build_client(service)
+        _clients[key] = (loop, client)
+        stats.clients_opened += 1
+        # Forget clients whose loop has ended; their sockets went with it
+        for stale in [k for k, (other_loop, _) in _clients.items() if other_loop.is_closed()]:
+            del _clients[stale]
+
+    logger.info(f"Opened pooled HTTP client for {service}")
+    return client
+
+
+def trace_extension(service: str) -> Dict[str, Any]:
+    """Request extensions that feed a service's pool statistics."""
+    return {"trace": get_pool_stats(service).trace}
+
+
+async def open_http_clients(*services: str):
+    """Open clients for services on the running loop (API startup)."""
+    for service in services:
+        get_http_client(service)
+
+
+async def close_http_clients():
+    """Close every client that belongs to the running loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        closing = [key for key, (client_loop, _) in _clients.items() if client_loop is loop]
+        clients = [_clients.pop(key)[1] for key in closing]
+
+    for client in clients:
+        await client.aclose()
+    if clients:
+        logger.info(f"Closed {len(clients)} pooled HTTP clients")
+
+
+def http_pool_report() -> Dict[str, Any]:
+    """Statistics for every service with a pooled client, for the API."""
+    with _clients_lock:
+        services = dict(_stats)
+        open_clients: Dict[str, int] = {}
+        for (service, _), (_, client) in _clients.items():
+            if not client.is_closed:
+                open_clients[service] = open_clients.get(service, 0) + 1
+
+    return {
+        service: {**stats.report(), "open_clients": open_clients.get(service, 0)}
+        for service, stats in services.items()
+    }
@@ -0,0 +1,203 @@
+"""
+Background job manager for long-running processing tasks.
+
+Jobs run on a thread pool so blocking work (S3 downloads, Bedrock calls,
+database writes) never runs on the FastAPI event loop.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = {"queued", "running"}
+
+# Only the most recent error messages are kept per job
+MAX_ERROR_MESSAGES = 20
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested."""
+
+
+class Job:
+    """State and progress of one background job.
+
+    The job object is handed to the task function, which reports progress
+    with add_total/advance and calls raise_if_cancelled between units of work.
+    """
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.items_total = 0
+        self.items_done = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+        self.result: Any = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started_monotonic: Optional[float] = None
+        self._finished_monotonic: Optional[float] = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        """True while the job is queued or running."""
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def cancel_requested(self) -> bool:
+        """True once cancel() has been called."""
+        return self._cancel_event.is_set()
+
+    def add_total(self, count: int):
+        """Increase the number of items the job expects to process."""
+        with self._lock:
+            self.items_total += count
+
+    def advance(self, count: int = 1, errors: int = 0):
+        """Record processed items and how many of them failed."""
+        with self._lock:
+            self.items_done += count
+            self.error_count += errors
+
+    def record_error(self, message: str):
+        """Record a failed item with its error message."""
+        with self._lock:
+            self.error_count += 1
+            self.errors = (self.errors + [message])[-MAX_ERROR_MESSAGES:]
+
+    def cancel(self):
+        """Request cancellation; the task stops at its next checkpoint."""
+        self._cancel_event.set()
+
+    def raise_if_cancelled(self):
+        """Stop the task if cancellation has been requested."""
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def _mark_started(self):
+        self.status = "running"
+        self.started_at = datetime.now()
+        self._started_monotonic = time.monotonic()
+
+    def _mark_finished(self, status: str):
+        self.status = status
+        self.finished_at = datetime.now()
+        self._finished_monotonic = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job state to a dictionary for API responses."""
+        with self._lock:
+            elapsed = None
+            if self._started_monotonic is not None:
+                end = self._finished_monotonic or time.monotonic()
+                elapsed = end - self._started_monotonic
+
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "items_done": self.items_done,
+                "items_total": self.items_total,
+                "error_count": self.error_count,
+                "errors": list(self.errors),
+                "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+                "items_per_second": round(self.items_done / elapsed, 3) if elapsed else None,
+                "cancel_requested": self.cancel_requested,
+                "result": self.result,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None
+            }
+
+
+class JobManager:
+    """Runs jobs on a worker pool, deduplicating concurrent jobs of one kind."""
+
+    def __init__(self, max_workers: int = 2, history_limit: int = 100):
+        """Initialize the worker pool and job registry."""
+        self.history_limit = history_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, task: Callable[[Job], Any]) -> Tuple[Job, bool]:
+        """Queue task(job) unless a job of the same kind is already active.
+
+        Returns (job, created); created is False when an existing queued or
+        running job of this kind was returned instead.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.is_active:
+                    return job, False
+
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._prune_history()
+
+        self._executor.submit(self._run, job, task)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job, True
+
+    def _run(self, job: Job, task: Callable[[Job], Any]):
+        """Execute a job and record its outcome."""
+        if job.cancel_requested:
+            job._mark_finished("cancelled")
+            return
+
+        job._mark_started()
+        try:
+            job.result = task(job)
+            job._mark_finished("completed")
+            logger.info(f"{job.kind} job {job.id} completed")
+        except JobCancelled:
+            job._mark_finished("cancelled")
+            logger.info(f"{job.kind} job {job.id} cancelled after {job.items_done} items")
+        except Exception as e:
+            job.record_error(str(e))
+            job._mark_finished("failed")
+            logger.error(f"{job.kind} job {job.id} failed: {e}")
+
+    def _prune_history(self):
+        """Drop the oldest finished jobs above history_limit."""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_limit)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        """Return all known jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation of a job; returns None if it does not exist."""
+        job = self.get(job_id)
+        if job and job.is_active:
+            job.cancel()
+        return job
+
+    def shutdown(self):
+        """Cancel active jobs and wait for the workers to stop."""
+        for job in self.list_jobs():
+            if job.is_active:
+                job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,273 @@
+"""
+Fast in-process lexicon/regex sentiment pre-classifier for crypto news.
+
+Articles it can label with high confidence skip the Bedrock call entirely.
+"""
+
+import logging
+import re
+import string
+import threading
+from itertools import compress
+from typing import Dict, Any, Optional
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Synthetic rows created by CoinGeckoService.fetch_trending_news
+TRENDING_TITLE_PATTERN = re.compile(r"^Trending: .+ \(([A-Z0-9]+)\)$")
+
+# Clause punctuation becomes a break token and other punctuation (hyphens
+# included) whitespace, so str.split tokenizes; apostrophes are kept for
+# contractions like "isn't"
+CLAUSE_BREAK = "|"
+PUNCTUATION_TABLE = str.maketrans(
+    {char: " " for char in string.punctuation.replace("'", "")}
+    | {char: CLAUSE_BREAK for char in ",;:.!?"}
+    | {"\u2019": "'"}
+)
+
+# Multi-word expressions; the words they consume are not scored again
+PHRASE_WEIGHTS = {
+    "all time high": 2.0,
+    "record high": 2.0,
+    "etf approval": 2.0,
+    "rate cut": 1.0,
+    "short squeeze": 1.5,
+    "golden cross": 1.5,
+    "buy the dip": 1.0,
+    "sell off": -2.0,
+    "death cross": -1.5,
+    "bear market": -1.5,
+    "bull market": 1.5,
+    "rug pull": -2.5,
+    "ponzi scheme": -2.5,
+    "rate hike": -1.0,
+    "fails to hold": -0.5,
+    "under pressure": -1.0,
+}
+
+WORD_WEIGHTS = {
+    # Bullish
+    "surge": 1.5, "surges": 1.5, "surged": 1.5, "surging": 1.5,
+    "soar": 1.5, "soars": 1.5, "soared": 1.5, "soaring": 1.5,
+    "rally": 1.5, "rallies": 1.5, "rallied": 1.5, "rallying": 1.5,
+    "skyrocket": 2.0, "skyrockets": 2.0, "skyrocketed": 2.0,
+    "moon": 1.0, "mooning": 1.5,
+    "bullish": 2.0, "bulls": 1.0,
+    "gain": 1.0, "gains": 1.0, "gained": 1.0,
+    "jump": 1.0, "jumps": 1.0, "jumped": 1.0,
+    "climb": 1.0, "climbs": 1.0, "climbed": 1.0,
+    "rebound": 1.0, "rebounds": 1.0, "rebounded": 1.0,
+    "recover": 1.0, "recovers": 1.0, "recovered": 1.0, "recovery": 1.0,
+    "breakout": 1.5, "outperform": 1.0, "outperforms": 1.0,
+    "inflow": 1.0, "inflows": 1.0,
+    "approval": 1.0, "approved": 1.0, "approves": 1.0,
+    "adoption": 1.0, "upgrade": 0.5, "partnership": 0.5,
+    "optimism": 1.0, "optimistic": 1.0, "boost": 1.0, "boosts": 1.0,
+    "accumulation": 0.5, "accumulate": 0.5, "upside": 1.0,
+    # Bearish
+    "plunge": -1.5, "plunges": -1.5, "plunged": -1.5, "plunging": -1.5,
+    "crash": -2.0, "crashes": -2.0, "crashed": -2.0, "crashing": -2.0,
+    "tumble": -1.5, "tumbles": -1.5, "tumbled": -1.5,
+    "slump": -1.5, "slumps": -1.5, "slumped": -1.5,
+    "sink": -1.0, "sinks": -1.0, "sank": -1.0,
+    "bearish": -2.0, "bears": -1.0,
+    "drop": -1.0, "drops": -1.0, "dropped": -1.0,
+    "fall": -1.0, "falls": -1.0, "fell": -1.0,
+    "decline": -1.0, "declines": -1.0, "declined": -1.0,
+    "loss": -1.0, "losses": -1.0, "dump": -1.5, "dumps": -1.5,
+    "selloff": -2.0, "liquidation": -1.0, "liquidations": -1.0,
+    "outflow": -1.0, "outflows": -1.0,
+    "hack": -2.0, "hacked": -2.0, "exploit": -2.0, "exploited": -2.0,
+    "lawsuit": -1.5, "sued": -1.5, "fraud": -2.0, "scam": -2.0,
+    "ban": -1.5, "bans": -1.5, "banned": -1.5, "crackdown": -1.5,
+    "collapse": -2.0, "collapses": -2.0, "collapsed": -2.0,
+    "bankruptcy": -2.5, "bankrupt": -2.5, "insolvent": -2.5,
+    "delist": -1.5, "delisted": -1.5, "delisting": -1.5,
+    "fear": -1.0, "fears": -1.0, "panic": -1.5, "fud": -1.0,
+    "rejected": -1.0, "rejects": -1.0, "rejection": -1.0,
+    "downside": -1.0, "warning": -0.5, "warns": -0.5,
+    "fails": -1.0, "failed": -1.0,
+}
+
+# Flip the polarity of the next few scored words within the same clause
+NEGATORS = {
+    "not", "no", "never", "without", "hardly", "barely", "isn't", "wasn't",
+    "aren't", "won't", "can't", "cannot", "doesn't", "didn't", "don't", "nor",
+}
+NEGATION_WINDOW = 3
+
+# Contrast words start a new clause, which a negation does not reach
+CONTRASTS = {"but", "despite", "although", "though", "however", "yet", "while", "whereas"}
+
+# Denials and rumors report a claim without asserting it; leave them to Bedrock
+HEDGES = {
+    "deny", "denies", "denied", "denying", "refute", "refutes", "refuted",
+    "dismiss", "dismisses", "dismissed", "rumor", "rumors", "rumour", "rumours",
+    "unconfirmed", "alleged", "allegedly",
+}
+
+# Phrases grouped by first word, so only plausible ones are searched for
+PHRASES_BY_FIRST_WORD = {}
+for _phrase, _weight in PHRASE_WEIGHTS.items():
+    PHRASES_BY_FIRST_WORD.setdefault(_phrase.split(" ")[0], []).append((_phrase, _phrase.split(" "), _weight))
+
+# Single lookup table for the word pass; markers map to truthy sentinels
+NEGATE = "negate"
+BREAK = "break"
+HEDGE = "hedge"
+TERM_WEIGHTS = {
+    **WORD_WEIGHTS,
+    **{word: NEGATE for word in NEGATORS},
+    **{word: BREAK for word in CONTRASTS | {CLAUSE_BREAK}},
+    **{word: HEDGE for word in HEDGES},
+}
+
+# Title words count more than body words; only the prompt-sized body is read
+TITLE_WEIGHT = 2.0
+CONTENT_WEIGHT = 1.0
+CONTENT_CHARS = 1000
+
+# Total absolute weight at which evidence is considered saturated
+SATURATION = 4.0
+MAX_CONFIDENCE = 0.95
+
+# A single scored term, a question or a hedge is never enough to skip Bedrock
+MIN_TERMS = 2
+UNCERTAIN_CONFIDENCE = 0.5
+
+
+class LexiconClassifier:
+    """Lexicon and pattern based sentiment classifier with confidence scores."""
+
+    def __init__(self, threshold: float = None):
+        """Initialize confidence threshold and counters."""
+        self.threshold = threshold if threshold is not None else config("PRECLASSIFIER_CONFIDENCE_THRESHOLD", default=0.85, cast=float)
+
+        self.evaluated = 0
+        self.calls_saved = 0
+        self._lock = threading.Lock()
+
+    def _score_text(self, text: str) -> tuple:
+        """Return (positive, negative, scored terms, hedged) for lowercased text."""
+        positive = 0.0
+        negative = 0.0
+        terms = set()
+        hedged = False
+
+        # One-character mappings keep translate on its fast path; spacing the breaks is one replace
+        words = text.translate(PUNCTUATION_TABLE).replace(CLAUSE_BREAK, f" {CLAUSE_BREAK} ").split()
+        # Look every word up in C and only walk the hits in Python
+        weights = list(map(TERM_WEIGHTS.get, words))
+
+        # Phrases match whole words only and take their words out of the word pass
+        for first_word in PHRASES_BY_FIRST_WORD.keys() & set(words):
+            for phrase, phrase_words, weight in PHRASES_BY_FIRST_WORD[first_word]:
+                index = words.index(first_word)
+                while True:
+                    end = index + len(phrase_words)
+                    if words[index:end] == phrase_words:
+                        terms.add(phrase)
+                        if weight > 0:
+                            positive += weight
+                        else:
+                            negative -= weight
+                        weights[index:end] = [None] * len(phrase_words)
+                    try:
+                        index = words.index(first_word, index + 1)
+                    except ValueError:
+                        break
+
+        negated_until = -1
+        for index in compress(range(len(weights)), weights):
+            weight = weights[index]
+            if weight is NEGATE:
+                negated_until = index + NEGATION_WINDOW
+                continue
+            if weight is BREAK:
+                negated_until = -1
+                continue
+            if weight is HEDGE:
+                hedged = True
+                continue
+            terms.add(words[index])
+            if index <= negated_until:
+                # Negated sentiment is weaker evidence than direct sentiment
+                weight = -weight * 0.5
+            if weight > 0:
+                positive += weight
+            else:
+                negative -= weight
+
+        return positive, negative, terms, hedged
+
+    def classify(self, title: str, content: str) -> Dict[str, Any]:
+        """Classify an article, returning sentiment, confidence and reasoning."""
+        trending = TRENDING_TITLE_PATTERN.match(title)
+        if trending:
+            return {
+                "sentiment": "neutral",
+                "confidence_score": MAX_CONFIDENCE,
+                "reasoning": "Lexicon pre-classifier: synthetic trending entry",
+                "tokens_mentioned": [trending.group(1)]
+            }
+
+        title_pos, title_neg, title_terms, title_hedged = self._score_text(title.lower())
+        body_pos, body_neg, body_terms, body_hedged = self._score_text(content[:CONTENT_CHARS].lower())
+        positive = TITLE_WEIGHT * title_pos + CONTENT_WEIGHT * body_pos
+        negative = TITLE_WEIGHT * title_neg + CONTENT_WEIGHT * body_neg
+        total = positive + negative
+
+        if total == 0:
+            return {
+                "sentiment": "neutral",
+                "confidence_score": 0.0,
+                "reasoning": "Lexicon pre-classifier: no sentiment terms found",
+                "tokens_mentioned": []
+            }
+
+        # Confidence grows with how one-sided and how strong the evidence is
+        polarity = (positive - negative) / total
+        strength = min(1.0, total / SATURATION)
+        confidence = min(MAX_CONFIDENCE, 0.5 + 0.5 * abs(polarity) * strength)
+        # Questions ("Will Bitcoin crash?") speculate rather than report
+        if len(title_terms | body_terms) < MIN_TERMS or title_hedged or body_hedged or title.rstrip().endswith("?"):
+            confidence = min(confidence, UNCERTAIN_CONFIDENCE)
+
+        if abs(polarity) < 0.2:
+            sentiment = "neutral"
+        elif polarity > 0:
+            sentiment = "bullish"
+        else:
+            sentiment = "bearish"
+
+        return {
+            "sentiment": sentiment,
+            "confidence_score": round(confidence, 3),
+            "reasoning": f"Lexicon pre-classifier: +{positive:.1f}/-{negative:.1f}",
+            "tokens_mentioned": []
+        }
+
+    def preclassify(self, title: str, content: str) -> Optional[Dict[str, Any]]:
+        """Return a result if confident enough to skip Bedrock, else None."""
+        result = self.classify(title, content)
+        confident = result["confidence_score"] >= self.threshold
+
+        with self._lock:
+            self.evaluated += 1
+            if confident:
+                self.calls_saved += 1
+
+        return result if confident else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many articles were evaluated and Bedrock calls saved."""
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "calls_saved": self.calls_saved,
+                "save_rate": round(self.calls_saved / self.evaluated, 3) if self.evaluated else 0.0
+            }
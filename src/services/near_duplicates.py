@@ -0,0 +1,310 @@
+"""
+MinHash/LSH near-duplicate detection for syndicated crypto news.
+
+Each article gets a MinHash signature over word shingles of its title and
+content. Signatures are persisted in the article_minhash table and indexed
+in memory with LSH banding, so a new article is compared only against the
+few articles that share a band bucket with it.
+"""
+
+import logging
+import string
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from decouple import config
+from sqlalchemy import Integer, column, delete, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import ArticleSignature, NewsArticle
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 16 bands of 4 rows catch pairs above roughly 0.5 Jaccard similarity as
+# candidates; candidates are then checked against the configured threshold
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+SHINGLE_SIZE = 3
+# Texts this short (e.g. synthetic trending rows) are too templated to judge
+MIN_SHINGLES = 16
+# Syndicated copies diverge at the end (bylines, footers), not the start
+MAX_TEXT_CHARS = 8000
+
+# Fixed hash parameters; changing the seed invalidates persisted signatures
+MINHASH_SEED = 1
+_random = np.random.RandomState(MINHASH_SEED)
+PERM_A = (_random.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1))[:, None]
+PERM_B = _random.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)[:, None]
+SHIFT = np.uint64(32)
+
+# Odd 64-bit multipliers that combine per-word hashes into shingle hashes
+WORD_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+# Punctuation becomes whitespace so str.split tokenizes
+PUNCTUATION_TABLE = str.maketrans({char: " " for char in string.punctuation})
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Unique 64-bit hashes of the three-word shingles of text.
+
+    Words are hashed once with CRC32 (stable across processes) and combined
+    with numpy, so no shingle strings are built.
+    """
+    words = text[:MAX_TEXT_CHARS].lower().translate(PUNCTUATION_TABLE).split()
+    if len(words) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+
+    word_hashes = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint64, count=len(words))
+    first, second = WORD_MULTIPLIERS
+    return np.unique(word_hashes[:-2] * first ^ word_hashes[1:-1] * second ^ word_hashes[2:])
+
+
+def minhash_signature(hashes: np.ndarray) -> np.ndarray:
+    """MinHash signature of a set of shingle hashes as NUM_PERM uint32 values.
+
+    Each permutation is a multiply-shift hash (a * x + b) >> 32 with
+    wrapping uint64 arithmetic, computed in place for all shingles at once.
+    """
+    permuted = np.multiply(PERM_A, hashes)
+    permuted += PERM_B
+    permuted >>= SHIFT
+    return permuted.min(axis=1).astype("<u4")
+
+
+def article_signature(title: str, content: Optional[str]) -> Optional[np.ndarray]:
+    """Signature for an article, or None if it is too short to compare."""
+    hashes = shingle_hashes(f"{title}\n{content or ''}")
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    return minhash_signature(hashes)
+
+
+class NearDuplicateIndex:
+    """In-memory LSH index over persisted MinHash signatures.
+
+    Loaded from the database on first use; articles are added as they are
+    saved, and every duplicate points at the first article of its cluster.
+    """
+
+    def __init__(self, threshold: float = None, session_factory=SessionLocal):
+        """Initialize similarity threshold and empty index."""
+        self.threshold = threshold if threshold is not None else config("NEAR_DUPLICATE_THRESHOLD", default=0.8, cast=float)
+        self.session_factory = session_factory
+
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(LSH_BANDS)]
+        self._canonical: Dict[int, int] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+        self.queries = 0
+        self.duplicates_found = 0
+        self.query_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[bytes]:
+        """One bucket key per band."""
+        return [signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes() for band in range(LSH_BANDS)]
+
+    def add(self, article_id: int, signature: np.ndarray, duplicate_of_id: int = None):
+        """Index an article's signature, replacing any it was indexed with before."""
+        with self._lock:
+            self.discard(article_id)
+            self._signatures[article_id] = signature
+            if duplicate_of_id is not None:
+                self._canonical[article_id] = duplicate_of_id
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(article_id)
+
+    def discard(self, article_id: int) -> bool:
+        """Drop an article from the index; returns whether it was indexed."""
+        with self._lock:
+            signature = self._signatures.pop(article_id, None)
+            if signature is None:
+                return False
+            self._canonical.pop(article_id, None)
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band][key]
+                bucket.remove(article_id)
+                if not bucket:
+                    del self._buckets[band][key]
+            return True
+
+    def find_duplicate(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Return (canonical article id, estimated Jaccard) of the closest match, if any."""
+        started = time.perf_counter()
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+
+            best_id, best_similarity = None, 0.0
+            # Sorted so ties go to the oldest article
+            for candidate in sorted(candidates):
+                similarity = float(np.count_nonzero(self._signatures[candidate] == signature)) / NUM_PERM
+                if similarity > best_similarity:
+                    best_id, best_similarity = candidate, similarity
+
+            match = None
+            if best_id is not None and best_similarity >= self.threshold:
+                match = (self._canonical.get(best_id, best_id), best_similarity)
+                self.duplicates_found += 1
+
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+            return match
+
+    def ensure_loaded(self):
+        """Load persisted signatures the first time the index is used."""
+        with self._lock:
+            if self._loaded:
+                return
+
+            db = self.session_factory()
+            try:
+                rows = db.query(
+                    ArticleSignature.article_id, ArticleSignature.signature, NewsArticle.duplicate_of_id
+                ).join(NewsArticle, NewsArticle.id == ArticleSignature.article_id).yield_per(10000)
+                for article_id, signature, duplicate_of_id in rows:
+                    self.add(article_id, np.frombuffer(signature, dtype="<u4"), duplicate_of_id)
+            finally:
+                db.close()
+
+            self._loaded = True
+            logger.info(f"Loaded {len(self._signatures)} MinHash signatures into the near-duplicate index")
+
+    def invalidate(self):
+        """Drop in-memory state, e.g. after a failed transaction; reloads on next use."""
+        with self._lock:
+            self._signatures.clear()
+            self._buckets = [{} for _ in range(LSH_BANDS)]
+            self._canonical.clear()
+            self._loaded = False
+
+    def flag_articles(self, db: Session, articles: List[NewsArticle]) -> int:
+        """Flag near-duplicates among inserted or refreshed articles and index them.
+
+        Call with articles that already have ids, inside the transaction that
+        wrote them, so duplicate_of_id and the signatures are committed
+        together with the articles. A refreshed article is re-signed from its
+        new text and replaces its old signature. Returns the number of
+        articles flagged.
+        """
+        self.ensure_loaded()
+        signature_rows = []
+        duplicates = []
+        unsigned = []
+
+        with self._lock:
+            for article in articles:
+                # A refreshed article must not match the signature of its old text
+                was_indexed = self.discard(article.id)
+                signature = article_signature(article.title, article.content)
+                if signature is None:
+                    if was_indexed:
+                        unsigned.append(article.id)
+                    continue
+
+                match = self.find_duplicate(signature)
+                if match:
+                    article.duplicate_of_id = match[0]
+                    duplicates.append((article.id, match[0]))
+                    logger.info(f"Article {article.id} is a near-duplicate of {match[0]} (similarity {match[1]:.2f})")
+
+                self.add(article.id, signature, article.duplicate_of_id)
+                signature_rows.append({"article_id": article.id, "signature": signature.tobytes()})
+
+        if signature_rows:
+            statement = insert(ArticleSignature)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[ArticleSignature.article_id],
+                set_={"signature": statement.excluded.signature}
+            ), signature_rows)
+        if unsigned:
+            db.execute(delete(ArticleSignature).where(ArticleSignature.article_id.in_(unsigned)))
+        if duplicates:
+            db.execute(self._build_duplicate_update(duplicates))
+        return len(duplicates)
+
+    @staticmethod
+    def _build_duplicate_update(duplicates: List[Tuple[int, int]]):
+        """Build one UPDATE ... FROM (VALUES ...) setting duplicate_of_id."""
+        updates = values(
+            column("id", Integer),
+            column("duplicate_of_id", Integer),
+            name="updates"
+        ).data(duplicates)
+
+        table = NewsArticle.__table__
+        return update(table).where(table.c.id == updates.c.id).values(duplicate_of_id=updates.c.duplicate_of_id)
+
+    def stats(self) -> Dict[str, float]:
+        """Return index size, duplicates found and mean lookup time."""
+        with self._lock:
+            return {
+                "indexed_articles": len(self._signatures),
+                "queries": self.queries,
+                "duplicates_found": self.duplicates_found,
+                "avg_query_ms": round(1000 * self.query_seconds / self.queries, 4) if self.queries else 0.0
+            }
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Return the process-wide near-duplicate index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+        return _index
+
+
+def backfill_signatures(chunk_size: int = 1000) -> int:
+    """Index (and flag) articles saved before near-duplicate detection existed."""
+    index = get_near_duplicate_index()
+    total_flagged = 0
+    last_id = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            articles = db.query(NewsArticle).outerjoin(
+                ArticleSignature, ArticleSignature.article_id == NewsArticle.id
+            ).filter(
+                ArticleSignature.article_id.is_(None),
+                NewsArticle.id > last_id
+            ).order_by(NewsArticle.id).limit(chunk_size).all()
+            if not articles:
+                break
+
+            # flag_articles writes with bulk statements; detached objects keep the ORM from repeating them
+            db.expunge_all()
+            last_id = articles[-1].id
+            total_flagged += index.flag_articles(db, articles)
+            db.commit()
+        except Exception:
+            db.rollback()
+            index.invalidate()
+            raise
+        finally:
+            db.close()
+
+    logger.info(f"Backfilled near-duplicate index; {total_flagged} near-duplicates flagged")
+    return total_flagged
+
+
+if __name__ == "__main__":
+    backfill_signatures()
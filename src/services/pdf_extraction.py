@@ -0,0 +1,358 @@
+"""
+Pluggable PDF text extraction engines with per-document limits and fallback.
+
+Engines are tried in PDF_EXTRACTION_ENGINES order. An attempt that raises,
+runs past PDF_EXTRACTION_TIMEOUT_SECONDS, exceeds PDF_EXTRACTION_MEMORY_MB
+or finds no text falls through to the next engine, and a document no
+engine can read raises PdfExtractionError instead of yielding empty text.
+"""
+
+import io
+import logging
+import multiprocessing
+import re
+import resource
+import time
+import zlib
+from typing import Any, BinaryIO, Dict, Iterator, List, Union
+import PyPDF2
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[bytes, str, BinaryIO]
+
+# Share of printable characters below which fast-path output is treated as garbage
+MIN_PRINTABLE_RATIO = 0.9
+
+
+class PdfExtractionError(Exception):
+    """Raised when no engine could extract text from a document."""
+
+
+class EngineDeclined(Exception):
+    """Raised by an engine that cannot handle a document, so the next one is tried."""
+
+
+def _open_pdf_source(source: PdfSource) -> BinaryIO:
+    """Open bytes, a file path or a seekable file object for reading."""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, str):
+        return open(source, "rb")
+    return source
+
+
+def _join_capped(page_texts: Iterator[str], max_chars: int = None) -> str:
+    """Join page texts once at the end, stopping once max_chars have been collected."""
+    parts = []
+    collected = 0
+    for page_text in page_texts:
+        parts.append(page_text)
+        collected += len(page_text) + 1
+        if max_chars is not None and collected >= max_chars:
+            break
+
+    text = "\n".join(parts).strip()
+    return text[:max_chars] if max_chars is not None else text
+
+
+def iter_pdf_page_texts(source: PdfSource, max_pages: int = None) -> Iterator[str]:
+    """Yield the text of each page in turn, reading the file lazily.
+
+    PyPDF2 seeks to each page object on demand, so a spooled file never
+    has to be loaded into memory as a whole.
+    """
+    stream = _open_pdf_source(source)
+    try:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        for page_number, page in enumerate(pdf_reader.pages):
+            if max_pages is not None and page_number >= max_pages:
+                return
+            yield page.extract_text() or ""
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ExtractionEngine:
+    """Base class for engines; extract() returns the capped text or raises."""
+
+    name = "base"
+
+    def extract(self, source: PdfSource, max_pages: int = None, max_chars: int = None) -> str:
+        raise NotImplementedError
+
+
+class PyPDF2Engine(ExtractionEngine):
+    """Page-by-page extraction with PyPDF2."""
+
+    name = "pypdf2"
+
+    def extract(self, source: PdfSource, max_pages: int = None, max_chars: int = None) -> str:
+        return _join_capped(iter_pdf_page_texts(source, max_pages=max_pages), max_chars)
+
+
+class PdfPlumberEngine(ExtractionEngine):
+    """Layout-aware extraction with pdfplumber; slower, but reads PDFs PyPDF2 cannot."""
+
+    name = "pdfplumber"
+
+    def extract(self, source: PdfSource, max_pages: int = None, max_chars: int = None) -> str:
+        import pdfplumber
+
+        def page_texts(pdf) -> Iterator[str]:
+            for page in pdf.pages[:max_pages]:
+                yield page.extract_text() or ""
+                page.close()  # drop the page's parsed objects before the next one
+
+        with pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source) as pdf:
+            return _join_capped(page_texts(pdf), max_chars)
+
+
+class FastPathEngine(ExtractionEngine):
+    """Scans content streams for text-showing operators without building a document model.
+
+    Handles the common case of simple fonts in the standard or WinAnsi
+    encoding with uncompressed or Flate compressed content. It declines
+    anything that needs font decoding so a full parser reads it: composite
+    fonts, ToUnicode maps, custom encodings and /Differences, and fonts
+    hidden in compressed object streams. The scan needs the whole file in
+    memory, so documents over PDF_FAST_PATH_MAX_MB are declined too and
+    stream through PyPDF2 instead. Each content stream with text counts as
+    one page for max_pages.
+    """
+
+    name = "fast"
+
+    # Font encodings whose byte values cp1252 decodes correctly enough
+    SIMPLE_ENCODINGS = {b"/WinAnsiEncoding", b"/StandardEncoding"}
+    ENCODING = re.compile(rb"/Encoding\s*(/[A-Za-z]+|<<|\d+\s+\d+\s+R)")
+
+    STREAM = re.compile(rb"(?<!end)stream\r?\n")
+    TEXT_BLOCK = re.compile(rb"BT\b(.*?)\bET\b", re.DOTALL)
+    # Literal strings, hex strings, and the positioning operators that start a new line
+    TEXT_TOKEN = re.compile(rb"\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|T\*|\bT[dD]\b")
+    ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else config("PDF_FAST_PATH_MAX_MB", default=16, cast=int) * 1024 * 1024
+
+    def extract(self, source: PdfSource, max_pages: int = None, max_chars: int = None) -> str:
+        stream = _open_pdf_source(source)
+        try:
+            data = stream.read(self.max_bytes + 1)
+        finally:
+            if stream is not source:
+                stream.close()
+
+        if len(data) > self.max_bytes:
+            raise EngineDeclined(f"document larger than {self.max_bytes} bytes")
+        if b"/ToUnicode" in data or b"/Type0" in data or b"/Differences" in data:
+            raise EngineDeclined("fonts need decoding")
+        if b"/ObjStm" in data:
+            raise EngineDeclined("font dictionaries are in compressed object streams")
+        if any(encoding not in self.SIMPLE_ENCODINGS for encoding in self.ENCODING.findall(data)):
+            raise EngineDeclined("fonts use a custom encoding")
+
+        return _join_capped(self._iter_stream_texts(data, max_pages), max_chars)
+
+    def _iter_stream_texts(self, data: bytes, max_pages: int = None) -> Iterator[str]:
+        pages = 0
+        for match in self.STREAM.finditer(data):
+            if max_pages is not None and pages >= max_pages:
+                return
+            end = data.find(b"endstream", match.end())
+            if end < 0:
+                break
+            content = data[match.end():end]
+            header = data[max(0, match.start() - 256):match.start()]
+            if b"/FlateDecode" in header:
+                try:
+                    content = zlib.decompressobj().decompress(content)
+                except zlib.error:
+                    continue  # images and fonts with other encodings are irrelevant; skip
+            elif b"/Filter" in header:
+                continue
+
+            text = self._stream_text(content)
+            if text:
+                pages += 1
+                yield text
+
+    def _stream_text(self, content: bytes) -> str:
+        lines = []
+        for block in self.TEXT_BLOCK.finditer(content):
+            line = []
+            for token in self.TEXT_TOKEN.findall(block.group(1)):
+                if token.startswith(b"("):
+                    line.append(self._unescape(token[1:-1]))
+                elif token.startswith(b"<"):
+                    line.append(self._unhex(token[1:-1]))
+                elif line:
+                    lines.append(b"".join(line))
+                    line = []
+            if line:
+                lines.append(b"".join(line))
+
+        text = b"\n".join(lines).decode("cp1252", errors="replace")
+        if text and sum(char.isprintable() or char.isspace() for char in text) / len(text) < MIN_PRINTABLE_RATIO:
+            raise EngineDeclined("content does not decode as text")
+        return text.strip()
+
+    @staticmethod
+    def _unhex(digits: bytes) -> bytes:
+        """Decode a PDF hex string; an odd final digit is padded with 0."""
+        digits = b"".join(digits.split())
+        if len(digits) % 2:
+            digits += b"0"
+        return bytes.fromhex(digits.decode("ascii"))
+
+    def _unescape(self, literal: bytes) -> bytes:
+        """Resolve backslash escapes in a PDF literal string."""
+        def replace(match):
+            escaped = match.group(1)
+            if escaped[:1].isdigit():
+                return bytes([int(escaped, 8) & 0xFF])
+            if escaped in (b"\n", b"\r", b"\r\n"):
+                return b""  # line continuation
+            return self.ESCAPES.get(escaped, escaped)
+
+        return re.sub(rb"\\([0-7]{1,3}|\r\n|.)", replace, literal, flags=re.DOTALL)
+
+
+ENGINES: Dict[str, ExtractionEngine] = {
+    engine.name: engine for engine in (FastPathEngine(), PyPDF2Engine(), PdfPlumberEngine())
+}
+
+
+def _run_attempt(engine: ExtractionEngine, path: str, max_pages: int, max_chars: int) -> Dict[str, Any]:
+    """Run one engine and report its text, seconds and peak RSS."""
+    started = time.perf_counter()
+    text = engine.extract(path, max_pages=max_pages, max_chars=max_chars)
+    return {"text": text, "seconds": time.perf_counter() - started, "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def _run_attempt_in_child(connection, engine: ExtractionEngine, path: str, max_pages: int, max_chars: int, memory_bytes: int):
+    """Child process entry point: cap address space, extract, send the result back."""
+    if memory_bytes:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        except (ValueError, OSError):
+            pass  # not enforceable on this platform
+    try:
+        result = _run_attempt(engine, path, max_pages, max_chars)
+    except MemoryError:
+        result = {"error": "memory limit exceeded"}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(result)
+    connection.close()
+
+
+class PdfExtractor:
+    """Extracts a document with the configured engines, falling back in order.
+
+    With isolation on, every attempt runs in a child forked from a
+    forkserver that has this module preloaded, so starting one costs a
+    fork rather than an interpreter start. The child's address space is
+    capped with RLIMIT_AS and it is killed once the timeout passes, so a
+    pathological PDF cannot hold a worker for minutes.
+    """
+
+    def __init__(
+        self,
+        engines: List[str] = None,
+        timeout: float = None,
+        memory_mb: int = None,
+        isolated: bool = None,
+        max_pages: int = None,
+        max_chars: int = None
+    ):
+        """Initialize engine order and limits from configuration."""
+        names = engines or [name.strip() for name in config("PDF_EXTRACTION_ENGINES", default="fast,pypdf2,pdfplumber").split(",") if name.strip()]
+        unknown = [name for name in names if name not in ENGINES]
+        if unknown:
+            raise ValueError(f"Unknown PDF extraction engines: {', '.join(unknown)}")
+        self.engines = [ENGINES[name] for name in names]
+        self.timeout = timeout if timeout is not None else config("PDF_EXTRACTION_TIMEOUT_SECONDS", default=30.0, cast=float)
+        self.memory_mb = memory_mb if memory_mb is not None else config("PDF_EXTRACTION_MEMORY_MB", default=1024, cast=int)
+        self.isolated = isolated if isolated is not None else config("PDF_EXTRACTION_ISOLATED", default=True, cast=bool)
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+
+    @property
+    def engine_names(self) -> List[str]:
+        return [engine.name for engine in self.engines]
+
+    def _attempt_isolated(self, engine: ExtractionEngine, path: str) -> Dict[str, Any]:
+        """Run one attempt in a child process under the time and memory limits."""
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_run_attempt_in_child,
+            args=(sender, engine, path, self.max_pages, self.max_chars, self.memory_mb * 1024 * 1024),
+            daemon=True
+        )
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(self.timeout):
+                raise TimeoutError(f"timed out after {self.timeout:g}s")
+            try:
+                result = receiver.recv()
+            except EOFError:
+                process.join(1.0)
+                raise RuntimeError(f"extractor exited with code {process.exitcode}")
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def extract(self, path: str) -> Dict[str, Any]:
+        """Extract a document's text, recording every attempt.
+
+        Returns the text with the engine that produced it, the seconds and
+        peak RSS of that attempt, and the total seconds across attempts.
+        """
+        attempts = []
+        for engine in self.engines:
+            started = time.perf_counter()
+            try:
+                if self.isolated:
+                    result = self._attempt_isolated(engine, path)
+                else:
+                    result = _run_attempt(engine, path, self.max_pages, self.max_chars)
+                if not result["text"]:
+                    raise EngineDeclined("no text found")
+            except Exception as e:
+                attempts.append({"engine": engine.name, "seconds": round(time.perf_counter() - started, 4), "error": str(e)})
+                logger.info(f"PDF engine {engine.name} failed on {path}: {e}")
+                continue
+
+            attempts.append({"engine": engine.name, "seconds": round(result["seconds"], 4), "error": None})
+            return {
+                "text": result["text"],
+                "engine": engine.name,
+                "seconds": result["seconds"],
+                "total_seconds": round(sum(attempt["seconds"] for attempt in attempts), 4),
+                "peak_rss_mb": result["peak_rss_mb"],
+                "attempts": attempts
+            }
+
+        raise PdfExtractionError(
+            "no engine could extract text: " + "; ".join(f"{attempt['engine']}: {attempt['error']}" for attempt in attempts)
+        )
@@ -0,0 +1,499 @@
+"""
+Continuous ingest -> analyze pipeline.
+
+Pollers for CoinGecko and S3 run on their own threads at a jittered
+interval and push the ids of newly saved articles into a bounded queue.
+A sentiment stage takes ids off the queue in small batches, analyzes and
+stores them, so an article gets its sentiment seconds after it is saved
+instead of at the next manual run. A full queue blocks the pollers
+(backpressure) until the stage catches up, and a backlog sweep
+re-enqueues articles still without sentiment, e.g. after a restart or a
+failed batch. Stopping lets the stage drain the queue within a timeout.
+
+Runs inside the API when PIPELINE_ENABLED is set, or on its own from src/:
+    python -m services.pipeline
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import random
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from decouple import config
+from models import NewsArticle
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (article id, time.monotonic() when it was enqueued)
+QueueItem = Tuple[int, float]
+
+
+def _seconds_since(moment: datetime) -> float:
+    """Seconds from a stored timestamp (naive or aware) to now."""
+    return max(0.0, (datetime.now(moment.tzinfo) - moment).total_seconds())
+
+
+class LatencyWindow:
+    """Most recent latency samples with percentile summaries."""
+
+    def __init__(self, size: int = 1000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return {"samples": 0, "p50_seconds": None, "p95_seconds": None, "max_seconds": None}
+        return {
+            "samples": len(ordered),
+            "p50_seconds": round(ordered[len(ordered) // 2], 3),
+            "p95_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max_seconds": round(ordered[-1], 3)
+        }
+
+
+class SourcePoller:
+    """Calls poll() every interval seconds, +/- jitter, on its own thread.
+
+    poll returns the ids of the articles it saved. The first poll happens
+    within jitter of starting, so pollers started together do not fire in
+    lockstep.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        poll: Callable[[], List[int]],
+        jitter: float = 0.2,
+        close: Callable[[], None] = None
+    ):
+        self.name = name
+        self.interval = interval
+        self.poll = poll
+        self.jitter = jitter
+        self.close = close
+
+        self.runs = 0
+        self.failures = 0
+        self.articles = 0
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds: Optional[float] = None
+        self._next_run: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def next_delay(self, first: bool) -> float:
+        if first:
+            return random.uniform(0, self.interval * self.jitter)
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run(self, stop: threading.Event, enqueue: Callable[[str, List[int]], int]):
+        """Poll until stop is set, handing saved ids to enqueue."""
+        first = True
+        try:
+            while True:
+                delay = self.next_delay(first)
+                self._next_run = time.monotonic() + delay
+                if stop.wait(delay):
+                    return
+                first = False
+
+                started = time.perf_counter()
+                try:
+                    article_ids = self.poll() or []
+                    error = None
+                except Exception as e:
+                    article_ids = []
+                    error = str(e) or type(e).__name__
+                    logger.error(f"Pipeline {self.name} poll failed: {error}")
+
+                with self._lock:
+                    self.runs += 1
+                    self.last_run_at = datetime.now()
+                    self.last_run_seconds = round(time.perf_counter() - started, 3)
+                    if error:
+                        self.failures += 1
+                        self.last_error = error
+                    self.articles += len(article_ids)
+
+                if article_ids:
+                    enqueue(self.name, article_ids)
+        finally:
+            if self.close:
+                try:
+                    self.close()
+                except Exception as e:
+                    logger.warning(f"Pipeline {self.name} cleanup failed: {e}")
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "runs": self.runs,
+                "failures": self.failures,
+                "articles": self.articles,
+                "last_error": self.last_error,
+                "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+                "last_run_seconds": self.last_run_seconds,
+                "next_run_in_seconds": round(max(0.0, self._next_run - time.monotonic()), 1) if self._next_run else None
+            }
+
+
+def coingecko_poller(interval: float, jitter: float) -> SourcePoller:
+    """Poll CoinGecko on a private event loop, so pooled connections and cached responses survive between polls."""
+    from services.coingecko_service import CoinGeckoService, fetch_latest_news
+    from services.http_pool import close_http_clients
+
+    loop = asyncio.new_event_loop()
+    services: List[CoinGeckoService] = []
+
+    def poll() -> List[int]:
+        if not services:
+            services.append(CoinGeckoService())
+        loop.run_until_complete(fetch_latest_news(service=services[0]))
+        return services[0].last_saved_ids
+
+    def close():
+        # Background revalidations still pending belong to this loop
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(close_http_clients())
+        loop.close()
+
+    return SourcePoller("coingecko", interval, poll, jitter, close=close)
+
+
+def s3_poller(interval: float, jitter: float) -> SourcePoller:
+    """Poll the S3 bucket; incremental ingestion makes an unchanged bucket one listing."""
+    from services.s3_processor import S3Processor, process_s3_pdfs
+
+    def poll() -> List[int]:
+        processor = S3Processor()
+        process_s3_pdfs(processor=processor)
+        return processor.last_saved_ids
+
+    return SourcePoller("s3", interval, poll, jitter)
+
+
+def backlog_poller(interval: float, jitter: float, limit: int) -> SourcePoller:
+    """Re-enqueue articles still without sentiment, whoever saved them."""
+    from services.sentiment_analyzer import unanalyzed_article_ids
+
+    return SourcePoller("backlog", interval, lambda: unanalyzed_article_ids(limit), jitter)
+
+
+def default_sources() -> List[SourcePoller]:
+    """Pollers enabled by configuration; an interval of 0 disables a source."""
+    jitter = config("PIPELINE_JITTER", default=0.2, cast=float)
+    sources = []
+
+    interval = config("PIPELINE_COINGECKO_INTERVAL_SECONDS", default=60.0, cast=float)
+    if interval > 0:
+        sources.append(coingecko_poller(interval, jitter))
+
+    interval = config("PIPELINE_S3_INTERVAL_SECONDS", default=300.0, cast=float)
+    if interval > 0:
+        sources.append(s3_poller(interval, jitter))
+
+    interval = config("PIPELINE_BACKLOG_INTERVAL_SECONDS", default=600.0, cast=float)
+    if interval > 0:
+        sources.append(backlog_poller(interval, jitter, config("PIPELINE_BACKLOG_LIMIT", default=5000, cast=int)))
+
+    return sources
+
+
+class StreamingPipeline:
+    """Pollers feeding a bounded queue of article ids into a sentiment stage."""
+
+    def __init__(
+        self,
+        sources: List[SourcePoller] = None,
+        analyze: Callable[[List[int]], List[NewsArticle]] = None,
+        queue_size: int = None,
+        batch_size: int = None,
+        batch_wait: float = None,
+        drain_timeout: float = None
+    ):
+        """Initialize queue and stage settings from configuration.
+
+        analyze(ids) analyzes and stores the articles among ids that still
+        need it and returns them; sources default to default_sources()
+        when the pipeline starts.
+        """
+        self.sources = sources
+        self.analyze = analyze or self._analyze_and_store
+        self.queue_size = queue_size or config("PIPELINE_QUEUE_SIZE", default=1000, cast=int)
+        self.batch_size = batch_size or config("PIPELINE_BATCH_SIZE", default=32, cast=int)
+        self.batch_wait = batch_wait if batch_wait is not None else config("PIPELINE_BATCH_WAIT_SECONDS", default=1.0, cast=float)
+        self.drain_timeout = drain_timeout if drain_timeout is not None else config("PIPELINE_DRAIN_TIMEOUT_SECONDS", default=60.0, cast=float)
+
+        self.queue: "queue.Queue[QueueItem]" = queue.Queue(maxsize=self.queue_size)
+        self._pending: set = set()
+        self._stop_polling = threading.Event()
+        self._draining = threading.Event()
+        self._abort = threading.Event()
+        self._poller_threads: List[threading.Thread] = []
+        self._stage_thread: Optional[threading.Thread] = None
+        self._analyzer = None
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+
+        self.enqueued = 0
+        self.duplicates = 0
+        self.producer_blocks = 0
+        self.producer_blocked_seconds = 0.0
+        self.batches = 0
+        self.analyzed = 0
+        self.skipped = 0
+        self.stage_errors = 0
+        self.analysis_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_batch_seconds: Optional[float] = None
+
+        self.queue_wait = LatencyWindow()
+        self.publication_lag = LatencyWindow()
+        self.ingest_lag = LatencyWindow()
+
+    @property
+    def running(self) -> bool:
+        return self._stage_thread is not None and self._stage_thread.is_alive()
+
+    def start(self):
+        """Start the sentiment stage and one thread per source."""
+        if self.running:
+            return
+        if self.sources is None:
+            self.sources = default_sources()
+
+        self._stop_polling.clear()
+        self._draining.clear()
+        self._abort.clear()
+        self.started_at = time.monotonic()
+
+        self._stage_thread = threading.Thread(target=self._run_stage, name="pipeline-sentiment", daemon=True)
+        self._stage_thread.start()
+        self._poller_threads = [
+            threading.Thread(target=source.run, args=(self._stop_polling, self.enqueue), name=f"pipeline-{source.name}", daemon=True)
+            for source in self.sources
+        ]
+        for thread in self._poller_threads:
+            thread.start()
+        logger.info(f"Pipeline started with sources: {', '.join(source.name for source in self.sources) or 'none'}")
+
+    def stop(self, drain: bool = True) -> bool:
+        """Stop polling, then let the stage finish the queued articles.
+
+        Waits up to drain_timeout in total; returns True when the queue was
+        drained. Ids left behind keep their NULL sentiment, so the backlog
+        sweep or the analyze endpoint picks them up later.
+        """
+        if not self.running:
+            return self.queue.empty()
+
+        deadline = time.monotonic() + self.drain_timeout
+        self._stop_polling.set()
+        for thread in self._poller_threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        if not drain:
+            self._abort.set()
+        self._draining.set()
+        self._stage_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        if self._stage_thread.is_alive():
+            self._abort.set()
+            self._stage_thread.join(timeout=5.0)
+
+        drained = self.queue.empty()
+        if drained:
+            logger.info("Pipeline stopped with an empty queue")
+        else:
+            logger.warning(f"Pipeline stopped with {self.queue.qsize()} articles queued; they stay pending for the backlog sweep")
+        return drained
+
+    def enqueue(self, source: str, article_ids: List[int]) -> int:
+        """Queue article ids, blocking while the queue is full.
+
+        Ids already waiting are skipped. Returns how many were queued; when
+        the pipeline stops while blocked, the rest are left for the sweep.
+        """
+        added = 0
+        for article_id in article_ids:
+            with self._lock:
+                if article_id in self._pending:
+                    self.duplicates += 1
+                    continue
+                self._pending.add(article_id)
+
+            item = (article_id, time.monotonic())
+            blocked_since = None
+            while True:
+                try:
+                    self.queue.put(item, timeout=0.25)
+                    break
+                except queue.Full:
+                    if blocked_since is None:
+                        blocked_since = time.monotonic()
+                        with self._lock:
+                            self.producer_blocks += 1
+                    if self._stop_polling.is_set():
+                        with self._lock:
+                            self._pending.discard(article_id)
+                            self.enqueued += added
+                        return added
+
+            if blocked_since is not None:
+                with self._lock:
+                    self.producer_blocked_seconds += time.monotonic() - blocked_since
+            added += 1
+
+        with self._lock:
+            self.enqueued += added
+        if added:
+            logger.info(f"Pipeline queued {added} articles from {source} (depth {self.queue.qsize()})")
+        return added
+
+    def _next_batch(self) -> List[QueueItem]:
+        """Block briefly for one id, then gather up to batch_size within batch_wait."""
+        try:
+            batch = [self.queue.get(timeout=0.25)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + (0.0 if self._draining.is_set() else self.batch_wait)
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_stage(self):
+        while not self._abort.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+            elif self._draining.is_set():
+                return
+
+    def _process(self, batch: List[QueueItem]):
+        """Analyze one batch and record its lag."""
+        enqueued_at = dict(batch)
+        started = time.perf_counter()
+        try:
+            articles = self.analyze(list(enqueued_at))
+            error = None
+        except Exception as e:
+            articles = []
+            error = str(e) or type(e).__name__
+            logger.error(f"Pipeline sentiment batch of {len(batch)} failed: {error}")
+        finally:
+            with self._lock:
+                self._pending.difference_update(enqueued_at)
+
+        finished = time.monotonic()
+        for article in articles:
+            self.queue_wait.add(finished - enqueued_at.get(article.id, finished))
+            if article.published_at:
+                self.publication_lag.add(_seconds_since(article.published_at))
+            if article.created_at:
+                self.ingest_lag.add(_seconds_since(article.created_at))
+
+        with self._lock:
+            self.batches += 1
+            self.last_batch_seconds = round(time.perf_counter() - started, 3)
+            if error:
+                self.stage_errors += 1
+                self.last_error = error
+            else:
+                self.analyzed += len(articles)
+                self.skipped += len(batch) - len(articles)
+
+    def _analyze_and_store(self, article_ids: List[int]) -> List[NewsArticle]:
+        """Default stage: analyze the ids that still have no sentiment and store the results."""
+        from services.sentiment_analyzer import SentimentAnalyzer, load_unanalyzed_articles
+
+        articles = load_unanalyzed_articles(article_ids)
+        if not articles:
+            return []
+        if self._analyzer is None:
+            self._analyzer = SentimentAnalyzer()
+
+        failed_before = self._analyzer.failed_count
+        self._analyzer.analyze_and_store(articles)
+        with self._lock:
+            self.analysis_failures += self._analyzer.failed_count - failed_before
+        return articles
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, stage throughput, lag percentiles and per-source poll results."""
+        with self.queue.mutex:
+            head = self.queue.queue[0] if self.queue.queue else None
+        with self._lock:
+            counters = {
+                "queue": {
+                    "depth": self.queue.qsize(),
+                    "capacity": self.queue_size,
+                    "oldest_wait_seconds": round(time.monotonic() - head[1], 3) if head else 0.0,
+                    "enqueued": self.enqueued,
+                    "duplicates": self.duplicates,
+                    "producer_blocks": self.producer_blocks,
+                    "producer_blocked_seconds": round(self.producer_blocked_seconds, 3)
+                },
+                "sentiment": {
+                    "batches": self.batches,
+                    "analyzed": self.analyzed,
+                    "skipped": self.skipped,
+                    "errors": self.stage_errors,
+                    "analysis_failures": self.analysis_failures,
+                    "last_error": self.last_error,
+                    "last_batch_seconds": self.last_batch_seconds
+                }
+            }
+
+        return {
+            "running": self.running,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1) if self.started_at and self.running else None,
+            **counters,
+            "lag": {
+                "queue_wait": self.queue_wait.report(),
+                "ingest": self.ingest_lag.report(),
+                "publication": self.publication_lag.report()
+            },
+            "sources": {source.name: source.report() for source in self.sources or []}
+        }
+
+
+def main():
+    """Run the pipeline until SIGINT/SIGTERM, then drain and exit."""
+    pipeline = StreamingPipeline()
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    pipeline.start()
+    report_every = config("PIPELINE_REPORT_SECONDS", default=60.0, cast=float)
+    while not stopping.wait(report_every):
+        stats = pipeline.stats()
+        logger.info(f"Pipeline: {json.dumps({'queue': stats['queue'], 'lag': stats['lag']})}")
+    pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
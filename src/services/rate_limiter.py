@@ -0,0 +1,231 @@
+"""
+Shared rate limiting and retry/backoff for outbound API calls.
+
+Every caller in the process that talks to the same service shares one
+ServiceLimiter, so concurrent threads and coroutines together stay inside
+the configured budget instead of each guessing on its own.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from botocore.exceptions import ClientError
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# botocore's standard-mode throttling codes plus Bedrock's overload errors
+BOTOCORE_THROTTLING_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "TransactionInProgressException",
+    "RequestLimitExceeded",
+    "BandwidthLimitExceeded",
+    "LimitExceededException",
+    "RequestThrottled",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "EC2ThrottledException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+RETRYABLE_HTTP_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket using reservations.
+
+    reserve() always succeeds immediately and returns how long the caller
+    must wait before using the tokens, letting the balance go negative.
+    This keeps waiting outside the lock and makes queued callers fair.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take amount tokens and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, delta: float):
+        """Give back (negative delta) or charge extra tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class ServiceLimiter:
+    """Request-rate and optional token-rate budget for one outbound service."""
+
+    def __init__(self, name: str, requests_per_second: float, burst: float = None, tokens_per_minute: float = None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second, burst or max(1.0, requests_per_second))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self.waited_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        delay = self.requests.reserve(1)
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if delay:
+            with self._stats_lock:
+                self.waited_seconds += delay
+        return delay
+
+    def acquire(self, tokens: float = 0):
+        """Block the calling thread until one request (and tokens) fit the budget."""
+        delay = self._reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 0):
+        """Wait without blocking the event loop until the request fits the budget."""
+        delay = self._reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def record_tokens(self, estimated: float, actual: float):
+        """Correct a token reservation once the real usage is known."""
+        if self.tokens:
+            self.tokens.adjust(actual - estimated)
+
+
+_limiters: Dict[str, ServiceLimiter] = {}
+_limiters_lock = threading.Lock()
+
+# Defaults per service; each can be overridden with <SERVICE>_RATE_LIMIT_RPS,
+# <SERVICE>_RATE_LIMIT_BURST and <SERVICE>_TOKENS_PER_MINUTE
+SERVICE_DEFAULTS = {
+    "coingecko": {"rps": 0.5, "burst": 1.0, "tokens_per_minute": 0},  # demo tier: 30 calls/min
+    "bedrock": {"rps": 10.0, "burst": 10.0, "tokens_per_minute": 200000},
+}
+
+
+def get_rate_limiter(service: str) -> ServiceLimiter:
+    """Return the process-wide limiter for a service, creating it on first use."""
+    with _limiters_lock:
+        if service not in _limiters:
+            defaults = SERVICE_DEFAULTS.get(service, {"rps": 1.0, "burst": 1.0, "tokens_per_minute": 0})
+            prefix = service.upper()
+            _limiters[service] = ServiceLimiter(
+                service,
+                requests_per_second=config(f"{prefix}_RATE_LIMIT_RPS", default=defaults["rps"], cast=float),
+                burst=config(f"{prefix}_RATE_LIMIT_BURST", default=defaults["burst"], cast=float),
+                tokens_per_minute=config(f"{prefix}_TOKENS_PER_MINUTE", default=defaults["tokens_per_minute"], cast=float) or None
+            )
+        return _limiters[service]
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for throttling/overload errors from botocore or httpx."""
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in BOTOCORE_THROTTLING_CODES
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_HTTP_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the server-requested delay in seconds, if the error carries one."""
+    if isinstance(error, ClientError):
+        headers = error.response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+        return _parse_retry_after(headers.get("retry-after"))
+    if isinstance(error, httpx.HTTPStatusError):
+        return _parse_retry_after(error.response.headers.get("Retry-After"))
+    return None
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+def retry_with_backoff(
+    func: Callable[[], Any],
+    max_attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    is_retryable: Callable[[Exception], bool] = is_retryable_error,
+    on_retry: Callable[[Exception], None] = None,
+    sleep: Callable[[float], None] = time.sleep
+) -> Any:
+    """Call func, retrying retryable errors with jittered exponential backoff."""
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, get_retry_after(e))
+            logger.warning(f"Retryable error ({e}); attempt {attempt + 1}/{max_attempts}, retrying in {delay:.2f}s")
+            if on_retry:
+                on_retry(e)
+            sleep(delay)
+
+
+async def async_retry_with_backoff(
+    func: Callable[[], Awaitable[Any]],
+    max_attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    is_retryable: Callable[[Exception], bool] = is_retryable_error,
+    on_retry: Callable[[Exception], None] = None,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+) -> Any:
+    """Async variant of retry_with_backoff."""
+    for attempt in range(max_attempts):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, get_retry_after(e))
+            logger.warning(f"Retryable error ({e}); attempt {attempt + 1}/{max_attempts}, retrying in {delay:.2f}s")
+            if on_retry:
+                on_retry(e)
+            await sleep(delay)
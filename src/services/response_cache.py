@@ -0,0 +1,267 @@
+"""
+In-memory response cache for outbound GET APIs.
+
+Each endpoint has a TTL. A fresh entry is served without a request. A
+stale entry within the stale-while-revalidate window is served at once
+while one background request refreshes it. Refreshes send If-None-Match /
+If-Modified-Since when upstream gave validators, so an unchanged resource
+costs a 304 instead of a full body. Concurrent misses for the same request
+are coalesced into one upstream call.
+"""
+
+import asyncio
+import fnmatch
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FetchResult:
+    """Outcome of one upstream request made on behalf of the cache."""
+
+    def __init__(self, data: Any = None, etag: str = None, last_modified: str = None, not_modified: bool = False):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+
+class CacheEntry:
+    def __init__(self, data: Any, etag: Optional[str], last_modified: Optional[str], fetched_at: float, ttl: float):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+# fetch(validators) -> FetchResult; validators are the conditional headers to send
+Fetcher = Callable[[Dict[str, str]], Awaitable[FetchResult]]
+
+
+def parse_ttls(value: str) -> List[Tuple[str, float]]:
+    """Parse "pattern=seconds,..." where patterns are fnmatch globs over endpoint paths."""
+    ttls = []
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        pattern, seconds = item.rsplit("=", 1)
+        ttls.append((pattern.strip(), float(seconds)))
+    return ttls
+
+
+class ResponseCache:
+    """LRU cache of decoded responses with per-endpoint TTLs."""
+
+    def __init__(
+        self,
+        default_ttl: float,
+        endpoint_ttls: List[Tuple[str, float]] = None,
+        stale_seconds: float = 0.0,
+        max_entries: int = 1000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.default_ttl = default_ttl
+        self.endpoint_ttls = endpoint_ttls or []
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._background: set = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+        self.refresh_errors = 0
+
+    def ttl_for(self, endpoint: str) -> float:
+        """TTL of the first matching endpoint pattern, else the default."""
+        for pattern, ttl in self.endpoint_ttls:
+            if fnmatch.fnmatchcase(endpoint, pattern):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any] = None) -> str:
+        return endpoint + "?" + json.dumps(params or {}, sort_keys=True, default=str)
+
+    async def get(self, endpoint: str, params: Dict[str, Any], fetch: Fetcher) -> Any:
+        """Return the response data for a request, fetching only when needed."""
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            with self._lock:
+                self.misses += 1
+            return (await fetch({})).data
+
+        key = self.make_key(endpoint, params)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                age = now - entry.fetched_at
+                if age < entry.ttl:
+                    self.hits += 1
+                    return entry.data
+                if age < entry.ttl + self.stale_seconds:
+                    self.stale_hits += 1
+                    serve_stale = True
+                else:
+                    serve_stale = False
+            if not entry or not serve_stale:
+                self.misses += 1
+
+        if entry and serve_stale:
+            self._refresh_in_background(key, ttl, fetch)
+            return entry.data
+        return await self._refresh(key, ttl, fetch)
+
+    async def _refresh(self, key: str, ttl: float, fetch: Fetcher) -> Any:
+        """Fetch (or revalidate) one entry; concurrent callers share the request."""
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            future = self._inflight.get(flight_key)
+            owner = future is None
+            if owner:
+                future = loop.create_future()
+                self._inflight[flight_key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The owner was cancelled before it finished; fetch in its place
+                return await self._refresh(key, ttl, fetch)
+
+        try:
+            with self._lock:
+                entry = self._entries.get(key)
+            result = await fetch(entry.validators() if entry else {})
+
+            with self._lock:
+                if result.not_modified and entry:
+                    self.revalidated += 1
+                    entry.fetched_at = self._clock()
+                    entry.ttl = ttl
+                    data = entry.data
+                else:
+                    data = result.data
+                    self._entries[key] = CacheEntry(data, result.etag, result.last_modified, self._clock(), ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marks it retrieved when no other caller was waiting
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+            if not future.done():
+                # Cancelled mid-fetch: release the waiters rather than leave them hanging
+                future.cancel()
+
+    def _refresh_in_background(self, key: str, ttl: float, fetch: Fetcher):
+        """Start one refresh of a stale entry unless one is already running."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if (id(loop), key) in self._inflight:
+                return
+
+        task = loop.create_task(self._refresh(key, ttl, fetch))
+        self._background.add(task)
+
+        def finished(task: asyncio.Task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                with self._lock:
+                    self.refresh_errors += 1
+                logger.warning(f"Background refresh of {key} failed: {task.exception()}")
+
+        task.add_done_callback(finished)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and revalidation counters."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "revalidated": self.revalidated,
+                "refresh_errors": self.refresh_errors,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0
+            }
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+# Defaults per service; each can be overridden with <SERVICE>_CACHE_TTL,
+# <SERVICE>_CACHE_TTLS, <SERVICE>_CACHE_STALE_SECONDS and <SERVICE>_CACHE_MAX_ENTRIES
+SERVICE_DEFAULTS = {
+    "coingecko": {
+        "ttl": 60.0,
+        "ttls": "/search/trending=300,/coins/*/news=120",
+        "stale_seconds": 300.0,
+        "max_entries": 1000,
+    },
+}
+
+
+def get_response_cache(service: str) -> ResponseCache:
+    """Return the process-wide response cache for a service, creating it on first use."""
+    with _caches_lock:
+        if service not in _caches:
+            defaults = SERVICE_DEFAULTS.get(service, {"ttl": 0.0, "ttls": "", "stale_seconds": 0.0, "max_entries": 1000})
+            prefix = service.upper()
+            enabled = config(f"{prefix}_CACHE_ENABLED", default=True, cast=bool)
+            _caches[service] = ResponseCache(
+                default_ttl=config(f"{prefix}_CACHE_TTL", default=defaults["ttl"], cast=float) if enabled else 0.0,
+                endpoint_ttls=parse_ttls(config(f"{prefix}_CACHE_TTLS", default=defaults["ttls"])) if enabled else [],
+                stale_seconds=config(f"{prefix}_CACHE_STALE_SECONDS", default=defaults["stale_seconds"], cast=float),
+                max_entries=config(f"{prefix}_CACHE_MAX_ENTRIES", default=defaults["max_entries"], cast=int)
+            )
+        return _caches[service]
+
+
+def response_cache_report() -> Dict[str, Any]:
+    """Statistics for every service with a response cache, for the API."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {service: cache.stats() for service, cache in caches.items()}
@@ -5,19 +5,111 @@ S3 PDF processor for downloading and processing crypto news PDFs.
 import boto3
 import json
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO
 from datetime import datetime
-import PyPDF2
-import io
+from botocore.config import Config
 from decouple import config
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import NewsArticle
+from models import NewsArticle, S3IngestionState
+from services.article_store import bulk_insert_articles
+from services.near_duplicates import get_near_duplicate_index
+from services.job_manager import Job, JobCancelled
+from services.pdf_extraction import PdfExtractor
+from services.text_cache import TextCache
+from services.token_extractor import extract_tokens
+from services.token_prices import enrich_articles_with_prices
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Part of the text cache key; bump when extraction output changes
+EXTRACTION_VERSION = "2"
+
+
+class ByteBudget:
+    """Caps the bytes downloaded but not yet extracted.
+
+    Downloads block in acquire() until extraction releases enough bytes.
+    A single object larger than the whole budget is let through alone so
+    it cannot deadlock the pipeline.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> bool:
+        """Wait until size bytes fit; returns False if the budget was closed."""
+        with self._condition:
+            while not self._closed and self.in_flight and self.in_flight + size > self.limit:
+                self._condition.wait()
+            if self._closed:
+                return False
+            self.in_flight += size
+            self.peak = max(self.peak, self.in_flight)
+            return True
+
+    def release(self, size: int):
+        with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+    def close(self):
+        """Wake and fail every waiting download, e.g. on cancellation."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self.peak_rss_mb = None
+        self._lock = threading.Lock()
+
+    def record(self, size: int, seconds: float, error: bool = False, peak_rss_mb: float = None):
+        with self._lock:
+            self.items += 1
+            self.bytes += size
+            self.busy_seconds += seconds
+            if error:
+                self.errors += 1
+            if peak_rss_mb is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0.0, peak_rss_mb)
+
+    def report(self, wall_seconds: float) -> Dict[str, Any]:
+        """Items and MB per wall-clock second, plus mean time per item."""
+        with self._lock:
+            return {
+                "items": self.items,
+                "errors": self.errors,
+                "megabytes": round(self.bytes / 1e6, 3),
+                "items_per_second": round(self.items / wall_seconds, 3) if wall_seconds else None,
+                "megabytes_per_second": round(self.bytes / 1e6 / wall_seconds, 3) if wall_seconds else None,
+                "avg_item_seconds": round(self.busy_seconds / self.items, 4) if self.items else None,
+                "peak_rss_mb": self.peak_rss_mb
+            }
+
+
 class S3Processor:
     """Service for processing PDFs from S3 bucket."""
 
@@ -28,12 +120,40 @@ class S3Processor:
         self.aws_region = config("AWS_DEFAULT_REGION", default="us-east-1")
         self.s3_bucket_name = config("S3_BUCKET_NAME")
 
-        # Initialize S3 client
+        # Pipelined mode: concurrent downloads feeding a process pool of extractors
+        self.pipeline_enabled = config("S3_PIPELINE_ENABLED", default=True, cast=bool)
+        self.download_workers = config("S3_DOWNLOAD_WORKERS", default=8, cast=int)
+        self.extract_workers = config("S3_EXTRACT_WORKERS", default=os.cpu_count() or 1, cast=int)
+        self.max_inflight_bytes = config("S3_MAX_INFLIGHT_MB", default=256, cast=int) * 1024 * 1024
+        self.last_pipeline_report: Optional[Dict[str, Any]] = None
+        self.last_saved_ids: List[int] = []
+
+        # Streaming extraction: bodies are spooled to disk in chunks, and only
+        # the first pages/characters are extracted (the prompt uses 1000 chars)
+        self.download_chunk_bytes = config("S3_DOWNLOAD_CHUNK_KB", default=256, cast=int) * 1024
+        self.spool_dir = config("S3_SPOOL_DIR", default=None) or tempfile.gettempdir()
+        self.max_pages = config("PDF_MAX_PAGES", default=50, cast=int) or None
+        self.max_chars = config("PDF_MAX_CHARS", default=20000, cast=int) or None
+
+        # Extraction engines tried in order, each under a time and memory limit
+        self.extractor = PdfExtractor(max_pages=self.max_pages, max_chars=self.max_chars)
+
+        # Incremental mode: only fetch objects whose ETag differs from the last ingested one
+        self.incremental = config("S3_INCREMENTAL", default=True, cast=bool)
+        self.state_batch_size = config("S3_STATE_BATCH_SIZE", default=1000, cast=int)
+        self._pending_state: Dict[str, Dict[str, Any]] = {}
+        self._listed_objects: Optional[Dict[str, Dict[str, Any]]] = None
+
+        # Extracted text keyed by object ETag, shared by workers on this host
+        self.text_cache = TextCache() if config("PDF_TEXT_CACHE_ENABLED", default=True, cast=bool) else None
+
+        # Initialize S3 client; one pooled connection per download worker
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=self.aws_access_key,
             aws_secret_access_key=self.aws_secret_key,
-            region_name=self.aws_region
+            region_name=self.aws_region,
+            config=Config(max_pool_connections=max(self.download_workers, 10))
         )
 
         # Load news sources configuration
@@ -48,25 +168,31 @@ class S3Processor:
             logger.error("news_sources.json not found")
             return {"articles": []}
 
-    def _extract_text_from_pdf(self, pdf_content: bytes) -> str:
-        """Extract text content from PDF bytes."""
-        try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-            text = ""
-
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF: {e}")
-            return ""
-
-    def _download_pdf_from_s3(self, bucket: str, key: str) -> bytes:
-        """Download PDF from S3 bucket."""
+    def _copy_body(self, body, target: BinaryIO) -> int:
+        """Stream an S3 body into target in fixed-size chunks; returns bytes written."""
+        written = 0
+        for chunk in iter(lambda: body.read(self.download_chunk_bytes), b""):
+            target.write(chunk)
+            written += len(chunk)
+        return written
+
+    def _download_pdf_from_s3(self, bucket: str, key: str) -> Tuple[str, str]:
+        """Download PDF from S3 bucket into a spool file on disk.
+
+        The body is copied in chunks, so a large object never sits in
+        memory whole, and the extraction subprocess reads it by path.
+        Returns the file path and the object's ETag.
+        """
         try:
             response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            return response['Body'].read()
+            descriptor, path = tempfile.mkstemp(suffix=".pdf", dir=self.spool_dir)
+            try:
+                with os.fdopen(descriptor, "wb") as spool:
+                    self._copy_body(response['Body'], spool)
+            except Exception:
+                os.remove(path)
+                raise
+            return path, response.get("ETag", "").strip('"')
         except Exception as e:
             logger.error(f"Error downloading PDF from S3: {e}")
             raise
@@ -79,98 +205,411 @@ class S3Processor:
             logger.warning(f"Could not parse date: {date_str}")
             return datetime.now()
 
+    def _source_bucket(self) -> str:
+        """Bucket the configured articles are downloaded from."""
+        return self.news_sources.get("s3_bucket", "crypto-news-pdfs-sep-2025")
+
+    def _build_article(self, article_config: Dict[str, Any], bucket: str, extraction: Dict[str, Any]) -> NewsArticle:
+        """Create a NewsArticle from its configuration and extraction result.
+
+        Tokens are the configured ones plus every coin the title and text mention.
+        """
+        tokens = [token.upper() for token in article_config.get("tokens", [])]
+        tokens += extract_tokens(f"{article_config['title']} {extraction['text']}")
+        return NewsArticle(
+            title=article_config["title"],
+            content=extraction["text"],
+            source=article_config["source"],
+            url=None,  # No URL for PDF articles
+            published_at=self._parse_published_date(article_config["published_date"]),
+            tokens_mentioned=list(dict.fromkeys(tokens)),
+            sentiment=None,  # Will be filled by sentiment analysis
+            confidence_score=None,
+            s3_bucket_source=bucket,
+            s3_key_source=article_config["s3_key"],
+            extraction_engine=extraction.get("engine"),
+            extraction_seconds=extraction.get("seconds")
+        )
+
+    def _text_cache_key(self, etag: str) -> str:
+        """Cache key for the text of one object version under the current extraction settings."""
+        return TextCache.make_key(etag, EXTRACTION_VERSION, ",".join(self.extractor.engine_names), self.max_pages, self.max_chars)
+
+    def _listed_etag(self, key: str) -> Optional[str]:
+        """ETag of an object from this run's bucket listing, if there was one."""
+        listed = (self._listed_objects or {}).get(key)
+        return listed["etag"] if listed else None
+
+    def _cached_extraction(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction for an object, found without touching S3."""
+        etag = self._listed_etag(key)
+        if not self.text_cache or not etag:
+            return None
+        return self.text_cache.get(self._text_cache_key(etag))
+
+    def _store_extraction(self, etag: Optional[str], extraction: Dict[str, Any]):
+        """Cache a successful extraction; empty text is not cached so failures are retried."""
+        if self.text_cache and etag and extraction["text"]:
+            try:
+                self.text_cache.put(self._text_cache_key(etag), extraction)
+            except OSError as e:
+                logger.warning(f"Could not write PDF text cache entry: {e}")
+
     def process_single_article(self, article_config: Dict[str, Any]) -> NewsArticle:
         """Process a single article from S3."""
         try:
-            # Download PDF from instructor's bucket
-            instructor_bucket = self.news_sources.get("s3_bucket", "crypto-news-pdfs-sep-2025")
-            pdf_content = self._download_pdf_from_s3(instructor_bucket, article_config["s3_key"])
+            instructor_bucket = self._source_bucket()
+            extraction = self._cached_extraction(article_config["s3_key"])
+            if extraction:
+                logger.info(f"Using cached text for article: {article_config['title']}")
+                return self._build_article(article_config, instructor_bucket, extraction)
 
-            # Extract text content
-            content = self._extract_text_from_pdf(pdf_content)
+            # Download PDF from instructor's bucket
+            path, etag = self._download_pdf_from_s3(instructor_bucket, article_config["s3_key"])
+            try:
+                # Extract text content
+                extraction = self.extractor.extract(path)
+            finally:
+                os.remove(path)
+            self._store_extraction(etag, extraction)
 
             # Create NewsArticle object
-            article = NewsArticle(
-                title=article_config["title"],
-                content=content,
-                source=article_config["source"],
-                url=None,  # No URL for PDF articles
-                published_at=self._parse_published_date(article_config["published_date"]),
-                tokens_mentioned=article_config["tokens"],
-                sentiment=None,  # Will be filled by sentiment analysis
-                confidence_score=None,
-                s3_bucket_source=instructor_bucket,
-                s3_key_source=article_config["s3_key"]
-            )
+            article = self._build_article(article_config, instructor_bucket, extraction)
 
-            logger.info(f"Processed article: {article_config['title']}")
+            logger.info(
+                f"Processed article: {article_config['title']} "
+                f"({len(extraction['text'])} chars with {extraction['engine']} in {extraction['seconds']:.2f}s, "
+                f"peak RSS {extraction['peak_rss_mb']} MB)"
+            )
             return article
 
         except Exception as e:
             logger.error(f"Error processing article {article_config.get('title', 'Unknown')}: {e}")
             raise
 
-    def process_all_articles(self) -> List[NewsArticle]:
+    def _list_source_objects(self, bucket: str, prefix: str = "") -> Dict[str, Dict[str, Any]]:
+        """List a bucket with list_objects_v2, 1000 keys per request."""
+        objects = {}
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                objects[item["Key"]] = {
+                    "etag": item["ETag"].strip('"'),
+                    "last_modified": item.get("LastModified"),
+                    "size": item.get("Size")
+                }
+        return objects
+
+    def _load_ingestion_state(self, bucket: str) -> Dict[str, str]:
+        """Return key -> ETag of every object already ingested from bucket."""
+        db = SessionLocal()
+        try:
+            rows = db.query(S3IngestionState.key, S3IngestionState.etag).filter(S3IngestionState.bucket == bucket)
+            return dict(rows.all())
+        finally:
+            db.close()
+
+    def select_changed_articles(self, article_configs: List[Dict[str, Any]], job: Job = None) -> List[Dict[str, Any]]:
+        """Keep only manifest entries whose object is new or changed since its last ingestion.
+
+        One bucket listing and one state query replace a GET per object, so
+        a re-run over an unchanged bucket downloads nothing.
+        """
+        bucket = self._source_bucket()
+        listed = self._list_source_objects(bucket, prefix=self.news_sources.get("s3_prefix", ""))
+        self._listed_objects = listed
+        ingested = self._load_ingestion_state(bucket)
+
+        changed = []
+        missing = 0
+        for article_config in article_configs:
+            key = article_config["s3_key"]
+            current = listed.get(key)
+            if current is None:
+                missing += 1
+                logger.warning(f"Object not found in s3://{bucket}: {key}")
+                if job:
+                    job.record_error(f"{key}: not found in bucket")
+                continue
+            if ingested.get(key) == current["etag"]:
+                continue
+
+            self._pending_state[key] = current
+            changed.append(article_config)
+
+        logger.info(
+            f"Incremental S3 ingestion: {len(changed)} new or changed, "
+            f"{len(article_configs) - len(changed) - missing} unchanged, {missing} missing"
+        )
+        return changed
+
+    def _build_state_upsert(self, bucket: str, keys: List[str]):
+        """Build one INSERT ... ON CONFLICT DO UPDATE for ingested object versions."""
+        statement = insert(S3IngestionState).values([
+            {
+                "bucket": bucket,
+                "key": key,
+                "etag": self._pending_state[key]["etag"],
+                "last_modified": self._pending_state[key]["last_modified"],
+                "size": self._pending_state[key]["size"]
+            }
+            for key in keys
+        ])
+        return statement.on_conflict_do_update(
+            index_elements=[S3IngestionState.bucket, S3IngestionState.key],
+            set_={
+                "etag": statement.excluded.etag,
+                "last_modified": statement.excluded.last_modified,
+                "size": statement.excluded.size,
+                "ingested_at": datetime.now()
+            }
+        )
+
+    def _record_ingestion_state(self, db: Session, articles: List[NewsArticle]):
+        """Mark the objects behind these articles as ingested at their listed version."""
+        keys = [article.s3_key_source for article in articles if article.s3_key_source in self._pending_state]
+        for start in range(0, len(keys), self.state_batch_size):
+            db.execute(self._build_state_upsert(self._source_bucket(), keys[start:start + self.state_batch_size]))
+
+    def process_all_articles(self, job: Job = None) -> List[NewsArticle]:
         """Process all articles from the news sources configuration."""
-        articles = []
+        article_configs = self.news_sources.get("articles", [])
+        if self.incremental and article_configs:
+            article_configs = self.select_changed_articles(article_configs, job=job)
+        elif self.text_cache and article_configs:
+            # ETags from one listing let cached text be used without any GETs
+            try:
+                self._listed_objects = self._list_source_objects(self._source_bucket(), prefix=self.news_sources.get("s3_prefix", ""))
+            except Exception as e:
+                logger.warning(f"Could not list source bucket for the text cache: {e}")
+        if job:
+            job.add_total(len(article_configs))
 
-        for article_config in self.news_sources.get("articles", []):
+        if self.pipeline_enabled and len(article_configs) > 1:
+            return self.process_articles_pipelined(article_configs, job=job)
+
+        articles = []
+        for article_config in article_configs:
+            if job:
+                job.raise_if_cancelled()
             try:
                 article = self.process_single_article(article_config)
                 articles.append(article)
+                if job:
+                    job.advance()
             except Exception as e:
                 logger.error(f"Failed to process article: {e}")
+                if job:
+                    job.advance()
+                    job.record_error(f"{article_config.get('s3_key', 'unknown')}: {e}")
                 continue
 
         logger.info(f"Successfully processed {len(articles)} articles")
         return articles
 
+    def _download_within_budget(self, bucket: str, key: str, budget: ByteBudget, stats: StageStats) -> Tuple[str, int, str]:
+        """Stream one object to a spool file once its size fits the in-flight byte budget.
+
+        Returns the file path, which is what crosses to the extraction
+        subprocess instead of the PDF bytes.
+        """
+        started = time.perf_counter()
+        try:
+            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            size = response.get("ContentLength") or 0
+            if not budget.acquire(size):
+                response["Body"].close()
+                raise JobCancelled("S3 pipeline stopped")
+
+            descriptor, path = tempfile.mkstemp(suffix=".pdf", dir=self.spool_dir)
+            try:
+                with os.fdopen(descriptor, "wb") as spool:
+                    written = self._copy_body(response["Body"], spool)
+            except Exception:
+                budget.release(size)
+                os.remove(path)
+                raise
+        except Exception:
+            stats.record(0, time.perf_counter() - started, error=True)
+            raise
+
+        stats.record(written, time.perf_counter() - started)
+        return path, size, response.get("ETag", "").strip('"')
+
+    def process_articles_pipelined(self, article_configs: List[Dict[str, Any]], job: Job = None) -> List[NewsArticle]:
+        """Download and extract articles in overlapping stages.
+
+        Up to S3_DOWNLOAD_WORKERS downloads run on threads while
+        S3_EXTRACT_WORKERS extractions run at once, each attempt in its own
+        subprocess (or in a process pool when isolation is off). Bytes
+        held between the stages are capped at S3_MAX_INFLIGHT_MB, so fast
+        downloads wait for extraction instead of filling memory or disk.
+        Downloads are streamed to spool files and extractors read them from
+        disk, so PDF bytes are never pickled between processes.
+        """
+        bucket = self._source_bucket()
+        budget = ByteBudget(self.max_inflight_bytes)
+        download_stats = StageStats("download")
+        extract_stats = StageStats("extract")
+        results: Dict[int, NewsArticle] = {}
+        engines_used: Counter = Counter()
+        started = time.perf_counter()
+
+        if self.extractor.isolated:
+            # Threads only wait here; the extraction itself runs in per-attempt subprocesses
+            extract_pool = ThreadPoolExecutor(max_workers=max(1, self.extract_workers), thread_name_prefix="pdf-extract")
+        else:
+            # spawn, not fork: the API process has threads (jobs, DB pool) that fork would copy mid-state
+            extract_pool = ProcessPoolExecutor(
+                max_workers=max(1, self.extract_workers),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        download_pool = ThreadPoolExecutor(max_workers=max(1, self.download_workers), thread_name_prefix="s3-download")
+        pending: Dict[Future, Tuple[str, int, int, Optional[str], Optional[str]]] = {}
+
+        def fail(index: int, error: Exception):
+            key = article_configs[index].get("s3_key", "unknown")
+            logger.error(f"Failed to process article {key}: {error}")
+            if job:
+                job.advance()
+                job.record_error(f"{key}: {error}")
+
+        try:
+            for index, article_config in enumerate(article_configs):
+                extraction = self._cached_extraction(article_config["s3_key"])
+                if extraction:
+                    results[index] = self._build_article(article_config, bucket, extraction)
+                    engines_used["cache"] += 1
+                    if job:
+                        job.advance()
+                    continue
+                future = download_pool.submit(self._download_within_budget, bucket, article_config["s3_key"], budget, download_stats)
+                pending[future] = ("download", index, 0, None, None)
+
+            while pending:
+                if job:
+                    job.raise_if_cancelled()
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, index, size, path, etag = pending.pop(future)
+                    if stage == "extract":
+                        budget.release(size)
+                        os.remove(path)
+
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if stage == "extract":
+                            extract_stats.record(size, 0.0, error=True)
+                        fail(index, e)
+                        continue
+
+                    if stage == "download":
+                        path, size, etag = result
+                        future = extract_pool.submit(self.extractor.extract, path)
+                        pending[future] = ("extract", index, size, path, etag)
+                        continue
+
+                    extract_stats.record(size, result["total_seconds"], peak_rss_mb=result["peak_rss_mb"])
+                    self._store_extraction(etag, result)
+                    results[index] = self._build_article(article_configs[index], bucket, result)
+                    engines_used[result["engine"]] += 1
+                    logger.info(
+                        f"Processed article: {article_configs[index]['title']} "
+                        f"({len(result['text'])} chars with {result['engine']} in {result['seconds']:.2f}s, "
+                        f"peak RSS {result['peak_rss_mb']} MB)"
+                    )
+                    if job:
+                        job.advance()
+
+        finally:
+            budget.close()
+            for future in pending:
+                future.cancel()
+            download_pool.shutdown(wait=True, cancel_futures=True)
+            extract_pool.shutdown(wait=True, cancel_futures=True)
+            # Spool files of work that never finished, including downloads done after a cancel
+            for future, (stage, _, _, path, _) in pending.items():
+                if stage == "download" and not future.cancelled() and future.exception() is None:
+                    path = future.result()[0]
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+            wall_seconds = time.perf_counter() - started
+            self.last_pipeline_report = {
+                "wall_seconds": round(wall_seconds, 3),
+                "download_workers": self.download_workers,
+                "extract_workers": self.extract_workers,
+                "peak_inflight_megabytes": round(budget.peak / 1e6, 3),
+                "text_cache": self.text_cache.stats() if self.text_cache else None,
+                "engines": dict(engines_used),
+                "stages": {
+                    stats.name: stats.report(wall_seconds) for stats in (download_stats, extract_stats)
+                }
+            }
+            logger.info(f"S3 pipeline report: {json.dumps(self.last_pipeline_report)}")
+
+        articles = [results[index] for index in sorted(results)]
+        logger.info(f"Successfully processed {len(articles)} articles")
+        return articles
+
     def save_articles_to_db(self, articles: List[NewsArticle]) -> int:
-        """Save processed articles to database."""
+        """Save processed articles to database with one bulk upsert per batch.
+
+        Articles are deduplicated on their S3 object; an object whose text
+        changed since it was stored refreshes the stored article.
+        """
         db = SessionLocal()
-        saved_count = 0
 
         try:
-            for article in articles:
-                # Check if article already exists (by title and source)
-                existing = db.query(NewsArticle).filter(
-                    NewsArticle.title == article.title,
-                    NewsArticle.source == article.source
-                ).first()
-
-                if not existing:
-                    db.add(article)
-                    saved_count += 1
-                else:
-                    logger.info(f"Article already exists: {article.title}")
+            counts = bulk_insert_articles(db, articles, refresh_changed=True)
+            self.last_saved_ids = counts["article_ids"]
+
+            # Committed together with the articles, so a failed save is retried next run
+            self._record_ingestion_state(db, articles)
 
             db.commit()
-            logger.info(f"Saved {saved_count} new articles to database")
+            logger.info(
+                f"Saved {counts['inserted']} new articles to database "
+                f"({counts['updated']} refreshed, {counts['skipped']} already stored, "
+                f"{counts['near_duplicates']} near-duplicates)"
+            )
 
         except Exception as e:
             logger.error(f"Error saving articles to database: {e}")
             db.rollback()
+            get_near_duplicate_index().invalidate()
             raise
         finally:
             db.close()
 
-        return saved_count
+        return counts["inserted"]
+
 
+def process_s3_pdfs(job: Job = None, processor: S3Processor = None) -> int:
+    """Main function to process S3 PDFs and store in database.
 
-def process_s3_pdfs():
-    """Main function to process S3 PDFs and store in database."""
+    The ids of new and refreshed articles are left in processor.last_saved_ids.
+    """
     try:
-        processor = S3Processor()
+        processor = processor or S3Processor()
+        processor.last_saved_ids = []
 
         # Process all articles
-        articles = processor.process_all_articles()
+        articles = processor.process_all_articles(job=job)
 
         if articles:
+            # Prices of the mentioned tokens at ingestion time
+            enrich_articles_with_prices(articles)
+
             # Save to database
             saved_count = processor.save_articles_to_db(articles)
             logger.info(f"Successfully processed and saved {saved_count} articles")
+            return saved_count
         else:
-            logger.warning("No articles were processed")
+            logger.warning("No new or changed articles were processed")
+            return 0
 
     except Exception as e:
         logger.error(f"Error in process_s3_pdfs: {e}")
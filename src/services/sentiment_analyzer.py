@@ -5,16 +5,81 @@ Amazon Bedrock sentiment analysis service for crypto news.
 import boto3
 import json
 import logging
-from typing import Dict, Any, List, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Tuple, Callable, Iterator
+from botocore.config import Config
 from decouple import config
+from sqlalchemy import ARRAY, Float, Integer, String, cast, column, func, update, values
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import NewsArticle
+from services.job_manager import Job, JobCancelled
+from services.lexicon_classifier import LexiconClassifier
+from services.rate_limiter import get_rate_limiter, is_retryable_error, retry_with_backoff
+from services.sentiment_cache import SentimentCache
+from services.sentiment_rollups import apply_rollup_deltas, lock_rollup_rows, rollup_values
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompts change so cached results are not reused
+PROMPT_VERSION = "v1"
+
+# Per-request usage records kept in memory for measuring token savings
+USAGE_LOG_SIZE = 1000
+
+# Number of content characters sent to Bedrock per article
+PROMPT_CONTENT_CHARS = 1000
+
+VALID_SENTIMENTS = {"bullish", "bearish", "neutral"}
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD controller for the number of in-flight Bedrock requests.
+
+    The limit is halved whenever Bedrock throttles and grows by one after a
+    full window of successful calls, never leaving [minimum, maximum].
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None, cooldown: float = 1.0):
+        self.maximum = max(maximum or initial, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.cooldown = cooldown
+        self.throttle_count = 0
+        self._limit = min(max(initial, self.minimum), self.maximum)
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return self._limit
+
+    def on_success(self):
+        """Record a successful call, raising the limit after a clean window."""
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self._limit and self._limit < self.maximum:
+                self._limit += 1
+                self._successes = 0
+
+    def on_throttle(self):
+        """Record a throttled call and back the limit off multiplicatively."""
+        with self._lock:
+            self.throttle_count += 1
+            self._successes = 0
+            now = time.monotonic()
+            # A burst of throttles from one window should only count once
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(self.minimum, self._limit // 2)
+                self._last_decrease = now
+                logger.warning(f"Bedrock throttled, concurrency lowered to {self._limit}")
+
+
 class SentimentAnalyzer:
     """Service for analyzing sentiment of crypto news using Amazon Bedrock."""
 
@@ -25,12 +90,75 @@ class SentimentAnalyzer:
         self.aws_region = config("AWS_BEDROCK_REGION", default="us-east-1")
         self.model_id = config("BEDROCK_MODEL_ID", default="anthropic.claude-3-haiku-20240307-v1:0")
 
-        # Initialize Bedrock client
+        # Concurrency settings for batch analysis
+        self.max_concurrency = config("BEDROCK_MAX_CONCURRENCY", default=8, cast=int)
+        self.min_concurrency = config("BEDROCK_MIN_CONCURRENCY", default=1, cast=int)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=self.max_concurrency,
+            minimum=self.min_concurrency,
+            maximum=self.max_concurrency
+        )
+
+        # Packed mode: several articles per Bedrock request
+        self.pack_size = config("BEDROCK_PACK_SIZE", default=8, cast=int)
+        self.pack_token_budget = config("BEDROCK_PACK_TOKEN_BUDGET", default=6000, cast=int)
+
+        # Articles that ended with the neutral/0.5 fallback result
+        self.failed_count = 0
+
+        # Rows written per UPDATE statement
+        self.bulk_update_batch_size = config("BULK_UPDATE_BATCH_SIZE", default=1000, cast=int)
+
+        # Local pre-classifier that answers unambiguous articles without Bedrock
+        self.preclassifier = LexiconClassifier() if config("PRECLASSIFIER_ENABLED", default=True, cast=bool) else None
+
+        # Shared request/token budget and retry policy for Bedrock calls
+        self.rate_limiter = get_rate_limiter("bedrock")
+        self.max_retries = config("BEDROCK_MAX_RETRIES", default=4, cast=int)
+        self.retry_base_delay = config("BEDROCK_RETRY_BASE_DELAY", default=0.5, cast=float)
+        self.retry_max_delay = config("BEDROCK_RETRY_MAX_DELAY", default=20.0, cast=float)
+
+        # Compact responses: static instructions in a (cacheable) system block,
+        # assistant-prefilled JSON, a stop sequence and a tight max_tokens
+        self.compact_responses = config("BEDROCK_COMPACT_RESPONSES", default=True, cast=bool)
+        self.include_reasoning = config("BEDROCK_INCLUDE_REASONING", default=False, cast=bool)
+        self.prompt_caching = config("BEDROCK_PROMPT_CACHING", default=False, cast=bool)
+        self.max_output_tokens = config("BEDROCK_MAX_OUTPUT_TOKENS", default=100, cast=int)
+        self.packed_output_tokens = config("BEDROCK_PACKED_OUTPUT_TOKENS_PER_ARTICLE", default=80, cast=int)
+        if self.include_reasoning:
+            self.max_output_tokens += 80
+            self.packed_output_tokens += 80
+        self.prompt_version = PROMPT_VERSION
+        if self.compact_responses:
+            self.prompt_version += "-compact" + ("-reasoning" if self.include_reasoning else "")
+
+        # Token usage reported by Bedrock, in total and per request
+        self.usage_totals = {
+            "requests": 0,
+            "articles": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
+        self.usage_log = deque(maxlen=USAGE_LOG_SIZE)
+        self._usage_lock = threading.Lock()
+
+        # Cache of results keyed by the exact prompt inputs
+        self.cache = SentimentCache() if config("SENTIMENT_CACHE_ENABLED", default=True, cast=bool) else None
+
+        # Initialize Bedrock client. Throttles are retried only by
+        # _invoke_bedrock, which reports every throttled attempt to the
+        # concurrency limiter.
         self.bedrock_client = boto3.client(
             'bedrock-runtime',
             aws_access_key_id=self.aws_access_key,
             aws_secret_access_key=self.aws_secret_key,
-            region_name=self.aws_region
+            region_name=self.aws_region,
+            config=Config(
+                max_pool_connections=max(self.max_concurrency, 10),
+                retries={"mode": "standard", "total_max_attempts": 1}
+            )
         )
 
     def _create_sentiment_prompt(self, title: str, content: str) -> str:
@@ -41,7 +169,7 @@ Analyze the following crypto news article and determine its sentiment.
 
 Title: {title}
 
-Content: {content[:1000]}...
+Content: {content[:PROMPT_CONTENT_CHARS]}...
 
 Please analyze the sentiment and provide your response in the following JSON format:
 {{
@@ -62,6 +190,156 @@ Guidelines:
 Respond only with valid JSON, no additional text.
 """
 
+    def _create_packed_prompt(self, items: List[Tuple[int, str, str]]) -> str:
+        """Create one prompt covering several (item_id, title, content) articles."""
+        articles_block = "\n\n".join(
+            f"Article {item_id}\nTitle: {title}\nContent: {content[:PROMPT_CONTENT_CHARS]}..."
+            for item_id, title, content in items
+        )
+        return f"""
+You are a financial sentiment analysis expert specializing in cryptocurrency news.
+Analyze each of the following {len(items)} crypto news articles independently and determine its sentiment.
+
+{articles_block}
+
+Please provide your response as a JSON array with exactly one object per article, in the following format:
+[
+    {{
+        "id": <article number>,
+        "sentiment": "bullish|bearish|neutral",
+        "confidence_score": 0.0-1.0,
+        "reasoning": "Brief explanation of your analysis",
+        "tokens_mentioned": ["BTC", "ETH", "SOL", ...]
+    }}
+]
+
+Guidelines:
+- "bullish": Positive sentiment, optimistic outlook, price increases expected
+- "bearish": Negative sentiment, pessimistic outlook, price decreases expected
+- "neutral": Balanced or factual reporting without clear directional bias
+- confidence_score: 0.0 (low confidence) to 1.0 (high confidence)
+- Extract all cryptocurrency tokens mentioned in each article
+- Focus on the overall market sentiment, not just individual token mentions
+- Do not let one article influence the analysis of another
+
+Respond only with the valid JSON array, no additional text.
+"""
+
+    def _compact_instructions(self, packed: bool) -> str:
+        """Static instruction block for compact mode, identical for every request."""
+        fields = '"sentiment": "bullish|bearish|neutral", "confidence_score": 0.0-1.0, '
+        if self.include_reasoning:
+            fields += '"reasoning": "<one short sentence>", '
+        fields += '"tokens_mentioned": ["BTC", ...]'
+
+        if packed:
+            task = "Analyze each numbered crypto news article independently and determine its sentiment."
+            response_format = f"a JSON array with one object per article: [{{\"id\": <article number>, {fields}}}]"
+        else:
+            task = "Analyze the crypto news article and determine its sentiment."
+            response_format = f"one JSON object: {{{fields}}}"
+
+        return f"""You are a financial sentiment analysis expert specializing in cryptocurrency news.
+{task}
+
+Guidelines:
+- "bullish": Positive sentiment, optimistic outlook, price increases expected
+- "bearish": Negative sentiment, pessimistic outlook, price decreases expected
+- "neutral": Balanced or factual reporting without clear directional bias
+- confidence_score: 0.0 (low confidence) to 1.0 (high confidence)
+- tokens_mentioned: ticker symbols of all cryptocurrency tokens mentioned
+- Focus on the overall market sentiment, not just individual token mentions
+
+Respond only with {response_format}. No other text."""
+
+    def _create_article_message(self, items: List[Tuple[int, str, str]], packed: bool) -> str:
+        """Per-request article text that follows the static instructions."""
+        if not packed:
+            _, title, content = items[0]
+            return f"Title: {title}\n\nContent: {content[:PROMPT_CONTENT_CHARS]}..."
+        return "\n\n".join(
+            f"Article {item_id}\nTitle: {title}\nContent: {content[:PROMPT_CONTENT_CHARS]}..."
+            for item_id, title, content in items
+        )
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Rough input token estimate (about four characters per token)."""
+        return len(text) // 4 + 1
+
+    def _build_packs(self, articles: List[NewsArticle]) -> List[List[NewsArticle]]:
+        """Group articles into packs bounded by pack_size and the token budget."""
+        # Size of the shared instruction block, paid once per request
+        overhead = self._estimate_tokens(self._create_packed_prompt([]))
+        packs: List[List[NewsArticle]] = []
+        current: List[NewsArticle] = []
+        current_tokens = overhead
+
+        for article in articles:
+            article_tokens = self._estimate_tokens(article.title) + self._estimate_tokens((article.content or "")[:PROMPT_CONTENT_CHARS]) + 10
+            if current and (len(current) >= self.pack_size or current_tokens + article_tokens > self.pack_token_budget):
+                packs.append(current)
+                current, current_tokens = [], overhead
+            current.append(article)
+            current_tokens += article_tokens
+
+        if current:
+            packs.append(current)
+        return packs
+
+    def _validate_sentiment_entry(self, entry: Any) -> Dict[str, Any]:
+        """Return a normalized sentiment result, or None if the entry is malformed."""
+        if not isinstance(entry, dict) or entry.get("sentiment") not in VALID_SENTIMENTS:
+            return None
+        try:
+            confidence = float(entry.get("confidence_score"))
+        except (TypeError, ValueError):
+            return None
+        if not 0.0 <= confidence <= 1.0:
+            return None
+
+        tokens = entry.get("tokens_mentioned") or []
+        if not isinstance(tokens, list):
+            return None
+
+        return {
+            "sentiment": entry["sentiment"],
+            "confidence_score": confidence,
+            "reasoning": entry.get("reasoning", ""),
+            "tokens_mentioned": [str(token).upper() for token in tokens]
+        }
+
+    def _parse_packed_response(self, response_body: str, item_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Parse a packed Bedrock response into {item_id: sentiment data}.
+
+        Malformed, duplicated or unexpected entries are dropped so the caller
+        can retry just those articles on their own.
+        """
+        response_text = response_body.strip()
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        if start_idx == -1 or end_idx <= start_idx:
+            logger.error(f"No JSON array found in packed response: {response_body}")
+            return {}
+
+        try:
+            entries = json.loads(response_text[start_idx:end_idx])
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing packed JSON response: {e}")
+            return {}
+
+        expected = set(item_ids)
+        results: Dict[int, Dict[str, Any]] = {}
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                item_id = int(entry.get("id"))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            sentiment_data = self._validate_sentiment_entry(entry)
+            if item_id in expected and item_id not in results and sentiment_data:
+                results[item_id] = sentiment_data
+
+        return results
+
     def _parse_bedrock_response(self, response_body: str) -> Dict[str, Any]:
         """Parse Bedrock response and extract sentiment data."""
         try:
@@ -84,83 +362,186 @@ Respond only with valid JSON, no additional text.
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON response: {e}")
             logger.error(f"Response was: {response_body}")
-            return {
-                "sentiment": "neutral",
-                "confidence_score": 0.5,
-                "reasoning": "Failed to parse response",
-                "tokens_mentioned": []
-            }
+            return self._fallback_result("Failed to parse response")
         except Exception as e:
             logger.error(f"Error parsing response: {e}")
-            return {
-                "sentiment": "neutral",
-                "confidence_score": 0.5,
-                "reasoning": "Error in analysis",
-                "tokens_mentioned": []
-            }
-
-    def analyze_sentiment(self, title: str, content: str) -> Dict[str, Any]:
-        """Analyze sentiment of a news article using Bedrock."""
-        try:
-            # Create prompt
-            prompt = self._create_sentiment_prompt(title, content)
-
-            # Prepare request body for Claude
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
-
-            # Call Bedrock
-            response = self.bedrock_client.invoke_model(
+            return self._fallback_result("Error in analysis")
+
+    def _fallback_result(self, reasoning: str) -> Dict[str, Any]:
+        """Default result used when an article could not be analyzed."""
+        return {
+            "sentiment": "neutral",
+            "confidence_score": 0.5,
+            "reasoning": reasoning,
+            "tokens_mentioned": [],
+            "fallback": True  # marks default results so they are never cached
+        }
+
+    def _cache_key(self, title: str, content: str) -> str:
+        """Cache key for the prompt inputs of one article."""
+        return SentimentCache.make_key(self.model_id, self.prompt_version, title, content[:PROMPT_CONTENT_CHARS])
+
+    def _invoke_bedrock(self, prompt: str, max_tokens: int, system: str = None, prefill: str = None,
+                        stop_sequences: List[str] = None, mode: str = "single", articles: int = 1) -> str:
+        """Send a prompt to Bedrock and return the response text.
+
+        A prefill is sent as the start of the assistant turn and prepended to
+        the returned text, as is the stop sequence that ended the response.
+        """
+        # Prepare request body for Claude
+        request_body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        if system:
+            system_block = {"type": "text", "text": system}
+            if self.prompt_caching:
+                system_block["cache_control"] = {"type": "ephemeral"}
+            request_body["system"] = [system_block]
+        if prefill:
+            request_body["messages"].append({"role": "assistant", "content": prefill})
+        if stop_sequences:
+            request_body["stop_sequences"] = stop_sequences
+
+        # Reserve the worst case against the tokens/min budget, settle it later
+        estimated_tokens = self._estimate_tokens((system or "") + prompt) + max_tokens
+
+        def call():
+            self.rate_limiter.acquire(tokens=estimated_tokens)
+            return self.bedrock_client.invoke_model(
                 modelId=self.model_id,
                 body=json.dumps(request_body),
                 contentType="application/json"
             )
 
-            # Parse response
-            response_body = json.loads(response['body'].read())
-            content_text = response_body['content'][0]['text']
+        # Call Bedrock
+        try:
+            response = retry_with_backoff(
+                call,
+                max_attempts=self.max_retries + 1,
+                base_delay=self.retry_base_delay,
+                max_delay=self.retry_max_delay,
+                on_retry=lambda error: self.concurrency.on_throttle()
+            )
+        except Exception as e:
+            # The last attempt is not retried, so on_retry never saw it
+            if is_retryable_error(e):
+                self.concurrency.on_throttle()
+            raise
+
+        # Parse response
+        response_body = json.loads(response['body'].read())
+        usage = response_body.get("usage")
+        if usage:
+            self.rate_limiter.record_tokens(estimated_tokens, usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+            self._record_usage(mode, articles, usage, response_body.get("stop_reason"))
+
+        text = (prefill or "") + response_body['content'][0]['text']
+        if response_body.get("stop_reason") == "stop_sequence" and response_body.get("stop_sequence"):
+            text += response_body["stop_sequence"]
+        return text
+
+    def _record_usage(self, mode: str, articles: int, usage: Dict[str, Any], stop_reason: str = None):
+        """Record the token usage block of one Bedrock response."""
+        record = {
+            "mode": mode,
+            "articles": articles,
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+            "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+            "stop_reason": stop_reason
+        }
+        with self._usage_lock:
+            self.usage_log.append(record)
+            self.usage_totals["requests"] += 1
+            self.usage_totals["articles"] += articles
+            for key in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+                self.usage_totals[key] += record[key]
+        logger.debug(f"Bedrock usage: {record}")
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """Return token usage totals and per-request/per-article averages."""
+        with self._usage_lock:
+            totals = dict(self.usage_totals)
+        requests = totals["requests"]
+        articles = totals["articles"]
+        totals["avg_input_tokens_per_request"] = round(totals["input_tokens"] / requests, 1) if requests else 0.0
+        totals["avg_output_tokens_per_request"] = round(totals["output_tokens"] / requests, 1) if requests else 0.0
+        totals["avg_output_tokens_per_article"] = round(totals["output_tokens"] / articles, 1) if articles else 0.0
+        return totals
+
+    def _request_sentiment(self, title: str, content: str) -> Dict[str, Any]:
+        """Call Bedrock for one article, letting any error propagate."""
+        if self.preclassifier:
+            preclassified = self.preclassifier.preclassify(title, content)
+            if preclassified is not None:
+                return preclassified
+
+        cache_key = None
+        if self.cache:
+            cache_key = self._cache_key(title, content)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Sentiment cache hit: {cached['sentiment']} (confidence: {cached['confidence_score']})")
+                return cached
+
+        # Create prompt and call Bedrock
+        if self.compact_responses:
+            content_text = self._invoke_bedrock(
+                self._create_article_message([(1, title, content)], packed=False),
+                max_tokens=self.max_output_tokens,
+                system=self._compact_instructions(packed=False),
+                prefill="{",
+                stop_sequences=["}"]
+            )
+        else:
+            prompt = self._create_sentiment_prompt(title, content)
+            content_text = self._invoke_bedrock(prompt, max_tokens=1000)
+
+        # Parse the sentiment analysis result
+        sentiment_data = self._parse_bedrock_response(content_text)
 
-            # Parse the sentiment analysis result
-            sentiment_data = self._parse_bedrock_response(content_text)
+        if cache_key and not sentiment_data.get("fallback"):
+            self.cache.put(cache_key, self.model_id, self.prompt_version, sentiment_data)
 
-            logger.info(f"Sentiment analysis completed: {sentiment_data['sentiment']} (confidence: {sentiment_data['confidence_score']})")
-            return sentiment_data
+        logger.info(f"Sentiment analysis completed: {sentiment_data['sentiment']} (confidence: {sentiment_data['confidence_score']})")
+        return sentiment_data
 
+    def analyze_sentiment(self, title: str, content: str) -> Dict[str, Any]:
+        """Analyze sentiment of a news article using Bedrock."""
+        try:
+            return self._request_sentiment(title, content)
         except Exception as e:
             logger.error(f"Error in sentiment analysis: {e}")
-            return {
-                "sentiment": "neutral",
-                "confidence_score": 0.5,
-                "reasoning": f"Analysis failed: {str(e)}",
-                "tokens_mentioned": []
-            }
+            return self._fallback_result(f"Analysis failed: {str(e)}")
+
+    def _apply_sentiment(self, article: NewsArticle, sentiment_data: Dict[str, Any]) -> NewsArticle:
+        """Copy a sentiment result onto an article."""
+        article.sentiment = sentiment_data["sentiment"]
+        article.confidence_score = sentiment_data["confidence_score"]
+
+        # Update tokens mentioned if we found additional ones
+        if sentiment_data.get("tokens_mentioned"):
+            existing_tokens = set(article.tokens_mentioned or [])
+            new_tokens = set(sentiment_data["tokens_mentioned"])
+            article.tokens_mentioned = list(existing_tokens.union(new_tokens))
+
+        logger.info(f"Updated article '{article.title[:50]}...' with sentiment: {article.sentiment}")
+        return article
 
     def analyze_article(self, article: NewsArticle) -> NewsArticle:
         """Analyze sentiment of a single article and update it."""
         try:
             # Perform sentiment analysis
             sentiment_data = self.analyze_sentiment(article.title, article.content or "")
-
-            # Update article with sentiment data
-            article.sentiment = sentiment_data["sentiment"]
-            article.confidence_score = sentiment_data["confidence_score"]
-
-            # Update tokens mentioned if we found additional ones
-            if sentiment_data.get("tokens_mentioned"):
-                existing_tokens = set(article.tokens_mentioned or [])
-                new_tokens = set(sentiment_data["tokens_mentioned"])
-                article.tokens_mentioned = list(existing_tokens.union(new_tokens))
-
-            logger.info(f"Updated article '{article.title[:50]}...' with sentiment: {article.sentiment}")
-            return article
+            return self._apply_sentiment(article, sentiment_data)
 
         except Exception as e:
             logger.error(f"Error analyzing article: {e}")
@@ -170,32 +551,276 @@ Respond only with valid JSON, no additional text.
             return article
 
     def analyze_articles_batch(self, articles: List[NewsArticle]) -> List[NewsArticle]:
-        """Analyze sentiment for a batch of articles."""
-        analyzed_articles = []
+        """Analyze sentiment for a batch of articles; same as analyze_articles_concurrent."""
+        return self.analyze_articles_concurrent(articles)
+
+    def _run_with_adaptive_concurrency(self, func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """Run func over items keeping up to the adaptive limit in flight.
+
+        Returns one entry per item, in order: the return value of func, or the
+        exception it raised. Throttles are retried inside func (_invoke_bedrock),
+        so a call that fails here is not re-queued.
+        """
+        results: List[Any] = [None] * len(items)
+        pending = deque(range(len(items)))
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency.maximum) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.concurrency.limit:
+                    index = pending.popleft()
+                    in_flight[executor.submit(func, items[index])] = index
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    try:
+                        results[index] = future.result()
+                        self.concurrency.on_success()
+                    except Exception as e:
+                        results[index] = e
+
+        return results
+
+    def analyze_articles_concurrent(self, articles: List[NewsArticle]) -> List[NewsArticle]:
+        """Analyze a batch of articles with several Bedrock requests in flight.
+
+        Articles are updated exactly as analyze_article would update them,
+        including the neutral/0.5 fallback for failed analyses.
+        """
+        results = self._run_with_adaptive_concurrency(
+            lambda article: self._request_sentiment(article.title, article.content or ""),
+            articles
+        )
 
+        for article, result in zip(articles, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in sentiment analysis for article {article.id}: {result}")
+                result = self._fallback_result(f"Analysis failed: {str(result)}")
+            if result.get("fallback"):
+                self.failed_count += 1
+            self._apply_sentiment(article, result)
+
+        logger.info(
+            f"Analyzed {len(articles)} articles concurrently "
+            f"(concurrency limit {self.concurrency.limit}, throttles {self.concurrency.throttle_count})"
+        )
+        self._log_stats()
+        return articles
+
+    def _request_packed_sentiment(self, articles: List[NewsArticle]) -> Dict[int, Dict[str, Any]]:
+        """Analyze a pack of articles in one Bedrock call.
+
+        Returns {position in pack: sentiment data}; positions missing from the
+        result were malformed in the response and should be retried singly.
+        """
+        results: Dict[int, Dict[str, Any]] = {}
+        cache_keys: Dict[int, str] = {}
+        items: List[Tuple[int, str, str]] = []
+
+        for position, article in enumerate(articles, start=1):
+            content = article.content or ""
+            if self.cache:
+                cache_keys[position] = self._cache_key(article.title, content)
+                cached = self.cache.get(cache_keys[position])
+                if cached is not None:
+                    results[position] = cached
+                    continue
+            items.append((position, article.title, content))
+
+        if not items:
+            return results
+
+        if self.compact_responses:
+            # Entries contain "}" and "]", so packed responses end at max_tokens or naturally
+            content_text = self._invoke_bedrock(
+                self._create_article_message(items, packed=True),
+                max_tokens=min(4096, self.packed_output_tokens * len(items)),
+                system=self._compact_instructions(packed=True),
+                prefill="[",
+                mode="packed",
+                articles=len(items)
+            )
+        else:
+            prompt = self._create_packed_prompt(items)
+            content_text = self._invoke_bedrock(prompt, max_tokens=min(4096, 250 * len(items)), mode="packed", articles=len(items))
+        parsed = self._parse_packed_response(content_text, [item_id for item_id, _, _ in items])
+
+        for position, sentiment_data in parsed.items():
+            results[position] = sentiment_data
+            if self.cache:
+                self.cache.put(cache_keys[position], self.model_id, self.prompt_version, sentiment_data)
+
+        logger.info(f"Packed sentiment analysis completed: {len(parsed)}/{len(items)} articles parsed")
+        return results
+
+    def analyze_articles_packed(self, articles: List[NewsArticle]) -> List[NewsArticle]:
+        """Analyze a batch of articles several per Bedrock request.
+
+        Packs are dispatched with adaptive concurrency. Articles whose entry is
+        missing or malformed, or whose whole pack failed, are retried on their
+        own via analyze_articles_concurrent.
+        """
+        pending_articles = []
         for article in articles:
-            try:
-                analyzed_article = self.analyze_article(article)
-                analyzed_articles.append(analyzed_article)
-            except Exception as e:
-                logger.error(f"Error analyzing article {article.id}: {e}")
-                # Add article with default sentiment
-                article.sentiment = "neutral"
-                article.confidence_score = 0.5
-                analyzed_articles.append(article)
+            preclassified = self.preclassifier.preclassify(article.title, article.content or "") if self.preclassifier else None
+            if preclassified is not None:
+                self._apply_sentiment(article, preclassified)
+            else:
+                pending_articles.append(article)
+
+        packs = self._build_packs(pending_articles)
+        pack_results = self._run_with_adaptive_concurrency(self._request_packed_sentiment, packs)
 
-        return analyzed_articles
+        retry_articles = []
+        for pack, results in zip(packs, pack_results):
+            if isinstance(results, Exception):
+                logger.error(f"Packed sentiment request for {len(pack)} articles failed: {results}")
+                retry_articles.extend(pack)
+                continue
+
+            for position, article in enumerate(pack, start=1):
+                if position in results:
+                    self._apply_sentiment(article, results[position])
+                else:
+                    retry_articles.append(article)
+
+        if retry_articles:
+            logger.info(f"Retrying {len(retry_articles)} articles individually after packed analysis")
+            self.analyze_articles_concurrent(retry_articles)
+
+        logger.info(f"Analyzed {len(articles)} articles in {len(packs)} packed requests")
+        self._log_stats()
+        return articles
+
+    def _log_stats(self):
+        """Log how many Bedrock calls the pre-classifier and cache avoided."""
+        if self.preclassifier:
+            logger.info(f"Pre-classifier stats: {self.preclassifier.stats()}")
+        if self.cache:
+            logger.info(f"Sentiment cache stats: {self.cache.stats()}")
+        logger.info(f"Bedrock token usage: {self.usage_stats()}")
+
+    def analyze_articles(self, articles: List[NewsArticle]) -> List[NewsArticle]:
+        """Analyze a batch, several articles per request when packing is enabled."""
+        if self.pack_size > 1:
+            return self.analyze_articles_packed(articles)
+        return self.analyze_articles_concurrent(articles)
+
+    def _build_sentiment_update(self, articles: List[NewsArticle]):
+        """Build one UPDATE ... FROM (VALUES ...) statement for a batch of articles."""
+        updates = values(
+            column("id", Integer),
+            column("sentiment", String),
+            column("confidence_score", Float),
+            column("tokens_mentioned", ARRAY(String)),
+            name="updates"
+        ).data([
+            (article.id, article.sentiment, article.confidence_score, list(article.tokens_mentioned or []))
+            for article in articles
+        ])
+
+        # Casts keep the column types when every value in a batch is NULL or empty
+        table = NewsArticle.__table__
+        return update(table).where(table.c.id == updates.c.id).values(
+            sentiment=cast(updates.c.sentiment, String),
+            confidence_score=cast(updates.c.confidence_score, Float),
+            tokens_mentioned=cast(updates.c.tokens_mentioned, ARRAY(String))
+        ).returning(table.c.id, *rollup_values(table))
+
+    def _build_duplicate_sentiment_copy(self, article_ids: List[int]):
+        """Build an UPDATE copying sentiment from each article's canonical article."""
+        table = NewsArticle.__table__
+        canonical = table.alias("canonical")
+        return update(table).where(
+            table.c.duplicate_of_id == canonical.c.id,
+            table.c.id.in_(article_ids),
+            table.c.sentiment.is_(None),
+            canonical.c.sentiment.isnot(None)
+        ).values(
+            sentiment=canonical.c.sentiment,
+            confidence_score=canonical.c.confidence_score,
+            tokens_mentioned=func.coalesce(table.c.tokens_mentioned, canonical.c.tokens_mentioned)
+        ).returning(table.c.id, *rollup_values(table))
+
+    def reuse_duplicate_sentiment(self, articles: List[NewsArticle]) -> List[NewsArticle]:
+        """Give near-duplicates their canonical article's sentiment without Bedrock.
+
+        Returns the articles that were updated; duplicates whose canonical
+        article has no sentiment yet are left for normal analysis.
+        """
+        duplicates = {article.id: article for article in articles if article.duplicate_of_id is not None}
+        if not duplicates:
+            return []
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(self._build_duplicate_sentiment_copy(list(duplicates))).all()
+            # Only articles without sentiment are copied to, so nothing is replaced
+            apply_rollup_deltas(db, added=[tuple(row[1:]) for row in rows])
+            db.commit()
+            reused_ids = [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"Error reusing canonical sentiment: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if reused_ids:
+            logger.info(f"Reused canonical sentiment for {len(reused_ids)} near-duplicate articles")
+        return [duplicates[article_id] for article_id in reused_ids]
+
+    def analyze_and_store(self, articles: List[NewsArticle]) -> int:
+        """Analyze and commit one chunk, reusing sentiment for near-duplicates.
+
+        Originals are analyzed and written first so duplicates of an article
+        in the same chunk can copy its fresh result.
+        """
+        originals = [article for article in articles if article.duplicate_of_id is None]
+        duplicates = [article for article in articles if article.duplicate_of_id is not None]
+
+        updated = 0
+        if originals:
+            updated += self.update_articles_in_db(self.analyze_articles(originals))
+
+        if duplicates:
+            reused = self.reuse_duplicate_sentiment(duplicates)
+            updated += len(reused)
+            reused_ids = {article.id for article in reused}
+            remaining = [article for article in duplicates if article.id not in reused_ids]
+            if remaining:
+                updated += self.update_articles_in_db(self.analyze_articles(remaining))
+
+        return updated
 
     def update_articles_in_db(self, articles: List[NewsArticle]) -> int:
-        """Update articles in database with sentiment analysis results."""
+        """Update articles in database with sentiment analysis results.
+
+        Writes sentiment, confidence_score and tokens_mentioned with one
+        set-based UPDATE per BULK_UPDATE_BATCH_SIZE articles and returns the
+        number of rows changed. The sentiment rollups are adjusted by the
+        difference between the replaced and new results in the same
+        transaction.
+        """
+        articles = [article for article in articles if article.id is not None]
+        if not articles:
+            return 0
+
         db = SessionLocal()
         updated_count = 0
 
         try:
-            for article in articles:
-                # Update the article in database
-                db.merge(article)
-                updated_count += 1
+            for start in range(0, len(articles), self.bulk_update_batch_size):
+                batch = articles[start:start + self.bulk_update_batch_size]
+                previous = lock_rollup_rows(db, NewsArticle.__table__.c.id, [article.id for article in batch])
+                rows = db.execute(self._build_sentiment_update(batch)).all()
+                apply_rollup_deltas(
+                    db,
+                    added=[tuple(row[1:]) for row in rows],
+                    removed=[previous[row[0]] for row in rows if row[0] in previous]
+                )
+                updated_count += len(rows)
 
             db.commit()
             logger.info(f"Updated {updated_count} articles with sentiment analysis")
@@ -210,37 +835,106 @@ Respond only with valid JSON, no additional text.
         return updated_count
 
 
-def analyze_all_articles():
-    """Main function to analyze sentiment for all articles without sentiment."""
-    try:
-        db = SessionLocal()
-        analyzer = SentimentAnalyzer()
+def iter_unanalyzed_chunks(chunk_size: int) -> Iterator[List[NewsArticle]]:
+    """Yield detached chunks of unanalyzed articles in id order.
 
-        # Get articles without sentiment analysis
-        articles = db.query(NewsArticle).filter(
-            NewsArticle.sentiment.is_(None)
-        ).all()
+    Uses keyset pagination (id > last seen id) with a fresh session per
+    chunk, so memory stays flat however large the backlog is.
+    """
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            articles = db.query(NewsArticle).filter(
+                NewsArticle.sentiment.is_(None),
+                NewsArticle.id > last_id
+            ).order_by(NewsArticle.id).limit(chunk_size).all()
+        finally:
+            db.close()
 
         if not articles:
-            logger.info("No articles found that need sentiment analysis")
             return
 
-        logger.info(f"Found {len(articles)} articles to analyze")
+        last_id = articles[-1].id
+        yield articles
+
+
+def load_unanalyzed_articles(article_ids: List[int]) -> List[NewsArticle]:
+    """Load the articles among article_ids that still have no sentiment, detached."""
+    if not article_ids:
+        return []
+    db = SessionLocal()
+    try:
+        return db.query(NewsArticle).filter(
+            NewsArticle.id.in_(article_ids),
+            NewsArticle.sentiment.is_(None)
+        ).order_by(NewsArticle.id).all()
+    finally:
+        db.close()
 
-        # Analyze articles
-        analyzed_articles = analyzer.analyze_articles_batch(articles)
 
-        # Update in database
-        updated_count = analyzer.update_articles_in_db(analyzed_articles)
+def unanalyzed_article_ids(limit: int) -> List[int]:
+    """Ids of the oldest articles that still have no sentiment."""
+    db = SessionLocal()
+    try:
+        return [row.id for row in db.query(NewsArticle.id).filter(
+            NewsArticle.sentiment.is_(None)
+        ).order_by(NewsArticle.id).limit(limit)]
+    finally:
+        db.close()
 
-        logger.info(f"Successfully analyzed sentiment for {updated_count} articles")
 
-    except Exception as e:
-        logger.error(f"Error in analyze_all_articles: {e}")
-        raise
+def count_unanalyzed_articles() -> int:
+    """Count articles that still have no sentiment."""
+    db = SessionLocal()
+    try:
+        return db.query(NewsArticle).filter(NewsArticle.sentiment.is_(None)).count()
     finally:
         db.close()
 
 
+def analyze_all_articles(chunk_size: int = None, job: Job = None) -> int:
+    """Main function to analyze sentiment for all articles without sentiment.
+
+    Each chunk is analyzed and committed before the next one is read, so an
+    interrupted run loses at most one chunk and a re-run resumes with the
+    articles that still have no sentiment. When run as a background job,
+    progress is reported per chunk and cancellation is honoured between
+    chunks.
+    """
+    chunk_size = chunk_size or config("SENTIMENT_CHUNK_SIZE", default=200, cast=int)
+    total_updated = 0
+
+    try:
+        analyzer = SentimentAnalyzer()
+        if job:
+            job.add_total(count_unanalyzed_articles())
+
+        for chunk_number, articles in enumerate(iter_unanalyzed_chunks(chunk_size), start=1):
+            if job:
+                job.raise_if_cancelled()
+            logger.info(f"Analyzing chunk {chunk_number} ({len(articles)} articles, ids {articles[0].id}-{articles[-1].id})")
+
+            # Analyze and commit this chunk before reading the next one
+            failed_before = analyzer.failed_count
+            total_updated += analyzer.analyze_and_store(articles)
+
+            if job:
+                job.advance(len(articles), errors=analyzer.failed_count - failed_before)
+
+        if total_updated:
+            logger.info(f"Successfully analyzed sentiment for {total_updated} articles")
+        else:
+            logger.info("No articles found that need sentiment analysis")
+        return total_updated
+
+    except JobCancelled:
+        logger.info(f"Sentiment analysis cancelled after {total_updated} articles")
+        raise
+    except Exception as e:
+        logger.error(f"Error in analyze_all_articles after {total_updated} articles: {e}")
+        raise
+
+
 if __name__ == "__main__":
     analyze_all_articles()
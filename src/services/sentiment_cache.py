@@ -0,0 +1,159 @@
+"""
+Persistent content-hash cache for Bedrock sentiment results.
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from decouple import config
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from models import SentimentCacheEntry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SentimentCache:
+    """Database-backed cache so identical prompt inputs are only billed once."""
+
+    def __init__(self, session_factory=SessionLocal, max_entries: int = None, max_age_days: int = None, evict_every: int = None):
+        """Initialize cache limits from configuration."""
+        self.session_factory = session_factory
+        self.max_entries = max_entries if max_entries is not None else config("SENTIMENT_CACHE_MAX_ENTRIES", default=100000, cast=int)
+        self.max_age_days = max_age_days if max_age_days is not None else config("SENTIMENT_CACHE_MAX_AGE_DAYS", default=30, cast=int)
+        self.evict_every = evict_every if evict_every is not None else config("SENTIMENT_CACHE_EVICT_EVERY", default=500, cast=int)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes_since_eviction = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id: str, prompt_version: str, title: str, content: str) -> str:
+        """Hash the exact inputs that end up in the Bedrock prompt."""
+        digest = hashlib.sha256()
+        for part in (model_id, prompt_version, title, content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x1f")  # unit separator keeps field boundaries unambiguous
+        return digest.hexdigest()
+
+    def _expiry_cutoff(self) -> datetime:
+        """Oldest creation time that is still considered fresh."""
+        return datetime.now() - timedelta(days=self.max_age_days)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None on a miss."""
+        db = self.session_factory()
+        try:
+            entry = db.get(SentimentCacheEntry, key)
+            if entry is None or (self.max_age_days and entry.created_at < self._expiry_cutoff()):
+                with self._lock:
+                    self.misses += 1
+                return None
+
+            entry.hit_count += 1
+            entry.last_accessed_at = datetime.now()
+            result = dict(entry.result)
+            db.commit()
+
+            with self._lock:
+                self.hits += 1
+            return result
+
+        except Exception as e:
+            logger.warning(f"Sentiment cache lookup failed: {e}")
+            db.rollback()
+            with self._lock:
+                self.misses += 1
+            return None
+        finally:
+            db.close()
+
+    def put(self, key: str, model_id: str, prompt_version: str, result: Dict[str, Any]):
+        """Store a result, evicting old entries every evict_every writes."""
+        db = self.session_factory()
+        now = datetime.now()
+        try:
+            db.merge(SentimentCacheEntry(
+                cache_key=key,
+                model_id=model_id,
+                prompt_version=prompt_version,
+                result=result,
+                hit_count=0,
+                created_at=now,
+                last_accessed_at=now
+            ))
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same key first; its result is as good as ours
+            db.rollback()
+            return
+        except Exception as e:
+            logger.warning(f"Sentiment cache store failed: {e}")
+            db.rollback()
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self._writes_since_eviction += 1
+            should_evict = self._writes_since_eviction >= self.evict_every
+            if should_evict:
+                self._writes_since_eviction = 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones above max_entries."""
+        db = self.session_factory()
+        removed = 0
+        try:
+            if self.max_age_days:
+                result = db.execute(
+                    delete(SentimentCacheEntry).where(SentimentCacheEntry.created_at < self._expiry_cutoff())
+                )
+                removed += result.rowcount or 0
+
+            if self.max_entries:
+                total = db.scalar(select(func.count()).select_from(SentimentCacheEntry))
+                excess = total - self.max_entries
+                if excess > 0:
+                    stale_keys = select(SentimentCacheEntry.cache_key).order_by(
+                        SentimentCacheEntry.last_accessed_at.asc()
+                    ).limit(excess).scalar_subquery()
+                    result = db.execute(
+                        delete(SentimentCacheEntry).where(SentimentCacheEntry.cache_key.in_(stale_keys))
+                    )
+                    removed += result.rowcount or 0
+
+            db.commit()
+            if removed:
+                logger.info(f"Evicted {removed} sentiment cache entries")
+
+        except Exception as e:
+            logger.warning(f"Sentiment cache eviction failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,261 @@
+"""
+Hourly sentiment rollups per token.
+
+sentiment_rollups holds, for every (token, hour), the number of analyzed
+articles per sentiment label and their summed confidence; token "*" covers
+all articles. Articles are bucketed by published_at, else created_at.
+
+Writers that change stored sentiment (SentimentAnalyzer.update_articles_in_db,
+reuse_duplicate_sentiment and the refresh of re-ingested articles) pass the
+old and new results of the rows they touched to apply_rollup_deltas, which
+adds the difference with one upsert in the writer's transaction. Old
+results are read with lock_rollup_rows before the write, so concurrent
+writers of the same article take turns and each replaces what the previous
+one committed. Rollups therefore never need re-aggregating from
+news_articles, and time series read only the buckets in range.
+rebuild_rollups() recomputes the table from scratch.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import NewsArticle, SentimentRollup
+from services.sentiment_stats import SENTIMENT_LABELS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Token under which every analyzed article is counted
+ALL_TOKENS = "*"
+
+# date_trunc units the time series can be grouped by
+GRANULARITIES = ("hour", "day", "week", "month")
+
+# Additive columns of a rollup row
+ROLLUP_COLUMNS = SENTIMENT_LABELS + ("articles", "confidence_sum")
+
+# Range served when the caller gives no start
+DEFAULT_RANGE = timedelta(days=7)
+
+# (bucket, sentiment, confidence_score, tokens_mentioned) of one article
+RollupRow = Tuple[Optional[datetime], Optional[str], Optional[float], Optional[List[str]]]
+
+
+def rollup_bucket(table=NewsArticle.__table__):
+    """The hour an article of table is rolled up under."""
+    return func.date_trunc("hour", func.coalesce(table.c.published_at, table.c.created_at))
+
+
+def rollup_values(table=NewsArticle.__table__) -> Tuple:
+    """Columns that give a RollupRow for each row of table, e.g. in RETURNING."""
+    return (rollup_bucket(table), table.c.sentiment, table.c.confidence_score, table.c.tokens_mentioned)
+
+
+def lock_rollup_rows(db: Session, key_column, keys: Iterable[Any]) -> Dict[Any, RollupRow]:
+    """Current RollupRow of each row whose key_column is in keys, locked until the transaction ends.
+
+    Rows are locked in key order, so writers of overlapping batches cannot
+    deadlock on each other.
+    """
+    table = key_column.table
+    rows = db.execute(
+        select(key_column, *rollup_values(table)).where(key_column.in_(list(keys))).order_by(key_column).with_for_update()
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def rollup_deltas(
+    added: Iterable[RollupRow] = (),
+    removed: Iterable[RollupRow] = ()
+) -> Dict[Tuple[str, datetime], Dict[str, Any]]:
+    """Net change per (token, bucket) from results written and results replaced.
+
+    Rows without sentiment or a timestamp are not rolled up, so they
+    contribute nothing either way. A re-analysis that stores the same
+    result cancels out and produces no delta.
+    """
+    deltas: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+    for rows, sign in ((added, 1), (removed, -1)):
+        for bucket, sentiment, confidence, tokens in rows:
+            if sentiment is None or bucket is None:
+                continue
+            for token in {ALL_TOKENS, *(token for token in (tokens or []) if token)}:
+                delta = deltas.setdefault((token, bucket), dict.fromkeys(ROLLUP_COLUMNS, 0))
+                delta["articles"] += sign
+                delta["confidence_sum"] += sign * (confidence or 0.0)
+                if sentiment in SENTIMENT_LABELS:
+                    delta[sentiment] += sign
+
+    return {
+        key: delta for key, delta in deltas.items()
+        if any(delta[name] for name in ROLLUP_COLUMNS[:-1]) or abs(delta["confidence_sum"]) > 1e-9
+    }
+
+
+def build_rollup_upsert(deltas: Dict[Tuple[str, datetime], Dict[str, Any]]):
+    """One multi-row INSERT ... ON CONFLICT that adds each delta to its bucket."""
+    # Key order keeps concurrent writers locking shared buckets in the same order
+    rows = [{"token": token, "bucket": bucket, **delta} for (token, bucket), delta in sorted(deltas.items())]
+    statement = insert(SentimentRollup).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[SentimentRollup.token, SentimentRollup.bucket],
+        set_={name: getattr(SentimentRollup, name) + getattr(statement.excluded, name) for name in ROLLUP_COLUMNS}
+    )
+
+
+def apply_rollup_deltas(db: Session, added: Iterable[RollupRow] = (), removed: Iterable[RollupRow] = ()) -> int:
+    """Apply written and replaced results to the rollups in the caller's transaction.
+
+    Returns the number of (token, hour) buckets changed.
+    """
+    deltas = rollup_deltas(added, removed)
+    if deltas:
+        db.execute(build_rollup_upsert(deltas))
+    return len(deltas)
+
+
+def build_rollup_rebuild():
+    """INSERT ... SELECT aggregating every analyzed article into rollup rows."""
+    table = NewsArticle.__table__
+    # DISTINCT drops a token listed twice in one article, as rollup_deltas does
+    mentions = select(
+        table.c.id,
+        rollup_bucket(table).label("bucket"),
+        table.c.sentiment,
+        table.c.confidence_score,
+        func.unnest(func.array_append(table.c.tokens_mentioned, ALL_TOKENS)).label("token")
+    ).where(
+        table.c.sentiment.isnot(None),
+        func.coalesce(table.c.published_at, table.c.created_at).isnot(None)
+    ).distinct().subquery("mentions")
+
+    aggregates = select(
+        mentions.c.token,
+        mentions.c.bucket,
+        *[func.count().filter(mentions.c.sentiment == label).label(label) for label in SENTIMENT_LABELS],
+        func.count().label("articles"),
+        func.coalesce(func.sum(mentions.c.confidence_score), 0.0).label("confidence_sum")
+    ).where(
+        mentions.c.token.isnot(None),
+        mentions.c.token != ""
+    ).group_by(mentions.c.token, mentions.c.bucket)
+
+    return insert(SentimentRollup).from_select(["token", "bucket", *ROLLUP_COLUMNS], aggregates)
+
+
+def rebuild_rollups() -> int:
+    """Recompute sentiment_rollups from news_articles and return the number of rows.
+
+    The table is locked against writers for the duration, so results
+    written concurrently are applied after the rebuild rather than lost.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(text("LOCK TABLE sentiment_rollups IN EXCLUSIVE MODE"))
+        db.query(SentimentRollup).delete(synchronize_session=False)
+        db.execute(build_rollup_rebuild())
+        rows = db.query(SentimentRollup).count()
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error rebuilding sentiment rollups: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Rebuilt sentiment rollups: {rows} (token, hour) buckets")
+    return rows
+
+
+def backfill_rollups() -> int:
+    """Build the rollups once for articles analyzed before the table existed."""
+    db = SessionLocal()
+    try:
+        missing = db.query(SentimentRollup.token).first() is None and db.query(NewsArticle.id).filter(
+            NewsArticle.sentiment.isnot(None)
+        ).first() is not None
+    finally:
+        db.close()
+
+    return rebuild_rollups() if missing else 0
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Article timestamps are stored without a time zone, in UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def timeseries_query(token: Optional[str], start: datetime, end: datetime, granularity: str):
+    """Rollups of one token in [start, end), summed per granularity period."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(GRANULARITIES)}")
+
+    period = func.date_trunc(literal_column(f"'{granularity}'"), SentimentRollup.bucket).label("period")
+    return select(
+        period,
+        *[func.sum(getattr(SentimentRollup, name)).label(name) for name in ROLLUP_COLUMNS]
+    ).where(
+        SentimentRollup.token == (token.upper() if token else ALL_TOKENS),
+        SentimentRollup.bucket >= start,
+        SentimentRollup.bucket < end
+    ).group_by(literal_column("period")).having(
+        func.sum(SentimentRollup.articles) > 0
+    ).order_by(literal_column("period"))
+
+
+def build_timeseries(
+    rows: Iterable[Tuple],
+    token: Optional[str],
+    start: datetime,
+    end: datetime,
+    granularity: str
+) -> Dict[str, Any]:
+    """Assemble the /api/sentiment/timeseries/ response from the grouped rollups."""
+    points = []
+    for period, bullish, bearish, neutral, articles, confidence_sum in rows:
+        points.append({
+            "period": period.isoformat(),
+            "sentiment_distribution": {"bullish": bullish, "bearish": bearish, "neutral": neutral},
+            "total_articles": articles,
+            "average_confidence": round(confidence_sum / articles, 3)
+        })
+
+    return {
+        "token": token.upper() if token else None,
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": points
+    }
+
+
+def sentiment_timeseries(
+    db: Session,
+    token: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "hour"
+) -> Dict[str, Any]:
+    """Sentiment counts and average confidence per period, from the rollups only.
+
+    The range defaults to the DEFAULT_RANGE before end, and end to now.
+    Raises ValueError for an empty range or an unknown granularity.
+    """
+    end = _naive_utc(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+    start = _naive_utc(start) if start else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("start must be before end")
+    rows = db.execute(timeseries_query(token, start, end, granularity)).all()
+    return build_timeseries(rows, token, start, end, granularity)
+
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,88 @@
+"""
+Sentiment aggregates computed in the database.
+
+The /api/sentiment/ summary is two GROUP BY queries over the analyzed
+articles: one per sentiment label (count and confidence sum) and one per
+token over unnest(tokens_mentioned). Only those small result sets reach
+Python, so the endpoint's memory no longer grows with the table.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import String, func, literal_column, select, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from models import NewsArticle
+
+# Labels reported in the distribution, in tie-break order for overall_sentiment
+SENTIMENT_LABELS = ("bullish", "bearish", "neutral")
+
+
+def mentions_token(token: str):
+    """tokens_mentioned @> ARRAY[token], the form the GIN index on the column serves."""
+    # The model column is the generic ARRAY type, which has no contains()
+    return type_coerce(NewsArticle.tokens_mentioned, ARRAY(String)).contains([token.upper()])
+
+
+def _analyzed_filter(token: Optional[str]):
+    conditions = [NewsArticle.sentiment.isnot(None)]
+    if token:
+        conditions.append(mentions_token(token))
+    return conditions
+
+
+def sentiment_distribution_query(token: Optional[str] = None):
+    """Articles and summed confidence per sentiment label."""
+    return select(
+        NewsArticle.sentiment,
+        func.count().label("articles"),
+        func.coalesce(func.sum(NewsArticle.confidence_score), 0.0).label("confidence_sum")
+    ).where(*_analyzed_filter(token)).group_by(NewsArticle.sentiment)
+
+
+def token_mentions_query(token: Optional[str] = None):
+    """Mentions per token across the analyzed articles."""
+    mentioned = func.unnest(NewsArticle.tokens_mentioned).label("token")
+    return select(mentioned, func.count().label("mentions")).where(
+        *_analyzed_filter(token)
+    ).group_by(literal_column("token")).order_by(literal_column("mentions").desc(), literal_column("token"))
+
+
+def build_sentiment_summary(
+    distribution_rows: Iterable[Tuple[str, int, float]],
+    token_rows: Iterable[Tuple[str, int]],
+    token: Optional[str] = None
+) -> Dict[str, Any]:
+    """Assemble the /api/sentiment/ response from the two aggregate result sets.
+
+    Every analyzed article counts towards total_articles and the confidence
+    average, but only the known labels appear in the distribution.
+    """
+    sentiment_counts = {label: 0 for label in SENTIMENT_LABELS}
+    total_articles = 0
+    total_confidence = 0.0
+
+    for sentiment, articles, confidence_sum in distribution_rows:
+        total_articles += articles
+        total_confidence += confidence_sum or 0.0
+        if sentiment in sentiment_counts:
+            sentiment_counts[sentiment] = articles
+
+    avg_confidence = total_confidence / total_articles if total_articles > 0 else 0
+    overall_sentiment = max(sentiment_counts, key=sentiment_counts.get) if total_articles > 0 else "neutral"
+
+    return {
+        "overall_sentiment": overall_sentiment,
+        "sentiment_distribution": sentiment_counts,
+        "total_articles": total_articles,
+        "average_confidence": round(avg_confidence, 3),
+        "token_mentions": {mentioned: mentions for mentioned, mentions in token_rows if mentioned is not None},
+        "filtered_by_token": token
+    }
+
+
+def aggregate_sentiment(db: Session, token: Optional[str] = None) -> Dict[str, Any]:
+    """Sentiment distribution, average confidence and token mentions, optionally for one token."""
+    distribution_rows = db.execute(sentiment_distribution_query(token)).all()
+    token_rows = db.execute(token_mentions_query(token)).all()
+    return build_sentiment_summary(distribution_rows, token_rows, token)
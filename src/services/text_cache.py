@@ -0,0 +1,160 @@
+"""
+Content-addressed on-disk cache of text extracted from PDFs.
+
+Entries are keyed by the source object's ETag plus the extraction
+settings, so an unchanged PDF is never downloaded or parsed twice, even
+after the database is reset or the container is redeployed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, Optional
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = ".json.z"
+
+# Eviction trims the cache to this fraction of its cap so it does not run on every write
+EVICT_TO_FRACTION = 0.9
+
+
+class TextCache:
+    """zlib-compressed JSON entries on local disk with an LRU size cap.
+
+    Writes go to a temporary file that is renamed into place with
+    os.replace, so concurrent workers and processes sharing the directory
+    only ever see complete entries. Reads refresh the entry's mtime, which
+    eviction uses as the last-access time.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None, evict_every: int = None):
+        """Initialize cache location and size limit from configuration."""
+        self.directory = directory or config("PDF_TEXT_CACHE_DIR", default=os.path.join(tempfile.gettempdir(), "pdf-text-cache"))
+        self.max_bytes = max_bytes if max_bytes is not None else config("PDF_TEXT_CACHE_MAX_MB", default=512, cast=int) * 1024 * 1024
+        self.evict_every = evict_every if evict_every is not None else config("PDF_TEXT_CACHE_EVICT_EVERY", default=200, cast=int)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._writes_since_eviction = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash the source version (ETag or content SHA-256) and extraction settings."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Two-character fan-out keeps directories small."""
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as entry_file:
+                entry = json.loads(zlib.decompress(entry_file.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError, zlib.error) as e:
+            # A corrupt entry is dropped and treated as a miss
+            logger.warning(f"Discarding unreadable text cache entry {key}: {e}")
+            self._remove(path)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Store an entry atomically, evicting least recently used entries every evict_every writes."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = zlib.compress(json.dumps(entry).encode("utf-8"), 6)
+
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as temp_file:
+                temp_file.write(payload)
+            os.replace(temp_path, path)
+        except Exception:
+            self._remove(temp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            self._writes_since_eviction += 1
+            should_evict = self._writes_since_eviction >= self.evict_every
+            if should_evict:
+                self._writes_since_eviction = 0
+
+        if should_evict:
+            self.evict()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache is under its cap."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO_FRACTION
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+            logger.info(f"Evicted {removed} PDF text cache entries")
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/write/eviction counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
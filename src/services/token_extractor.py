@@ -0,0 +1,358 @@
+"""
+Token symbol extraction backed by the CoinGecko coin registry.
+
+The registry (every listed coin's id, symbol and name, plus the market-cap
+rank of the top coins) is fetched from CoinGecko and kept as a JSON
+snapshot on local disk. The extractor compiles it into a trie over words:
+text is split into words once and walked left to right, taking the longest
+coin name, alias or symbol that starts at each word, so a document is
+scanned in a single pass however many coins are registered. Matching is
+on whole words, so "UNI" does not match inside "UNITED".
+
+Every hit maps to a canonical upper-case symbol:
+- "$sym" cashtags match any listed coin, in any case
+- symbols without a letter never match, since "$100" is a price
+- names and aliases ("Bitcoin", "Shiba Inu", "ether") match in any case
+- bare symbols ("ETH") match only when written in upper case
+
+Names and bare symbols are limited to the top ranked coins, because the
+long tail of the registry is full of coins named after common words and
+people; cashtags reach every coin.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from decouple import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A word is a run of letters and digits, optionally prefixed with "$"
+WORD = re.compile(r"(\$?)([^\W_]+)")
+
+# Used until a snapshot has been fetched (and in tests): the major coins
+SEED_COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "rank": 1},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum", "rank": 2},
+    {"id": "tether", "symbol": "usdt", "name": "Tether", "rank": 3},
+    {"id": "ripple", "symbol": "xrp", "name": "XRP", "rank": 4},
+    {"id": "binancecoin", "symbol": "bnb", "name": "BNB", "rank": 5},
+    {"id": "solana", "symbol": "sol", "name": "Solana", "rank": 6},
+    {"id": "usd-coin", "symbol": "usdc", "name": "USDC", "rank": 7},
+    {"id": "dogecoin", "symbol": "doge", "name": "Dogecoin", "rank": 8},
+    {"id": "cardano", "symbol": "ada", "name": "Cardano", "rank": 9},
+    {"id": "chainlink", "symbol": "link", "name": "Chainlink", "rank": 10},
+    {"id": "avalanche-2", "symbol": "avax", "name": "Avalanche", "rank": 11},
+    {"id": "bitcoin-cash", "symbol": "bch", "name": "Bitcoin Cash", "rank": 12},
+    {"id": "polkadot", "symbol": "dot", "name": "Polkadot", "rank": 13},
+    {"id": "litecoin", "symbol": "ltc", "name": "Litecoin", "rank": 14},
+    {"id": "uniswap", "symbol": "uni", "name": "Uniswap", "rank": 15},
+    {"id": "cosmos", "symbol": "atom", "name": "Cosmos Hub", "rank": 16},
+    {"id": "matic-network", "symbol": "matic", "name": "Polygon", "rank": 17},
+]
+
+# Common alternative names, always matched; extend with COINGECKO_TOKEN_ALIASES
+ALIASES = {
+    "ether": "ETH",
+    "xbt": "BTC",
+    "ripple": "XRP",
+    "binance coin": "BNB",
+    "usd coin": "USDC",
+    "cosmos": "ATOM",
+}
+
+# Upper-case words that are coin symbols but far more often mean something else
+AMBIGUOUS_SYMBOLS = {
+    "A", "I", "AI", "AN", "AND", "ARE", "AS", "AT", "BE", "BY", "CAN", "DO", "FOR", "GO", "IF",
+    "IN", "IS", "IT", "ME", "MY", "NEW", "NO", "NOT", "NOW", "OF", "ON", "ONE", "OR", "OUT",
+    "SO", "THE", "TO", "UP", "US", "WE", "YOU", "ALL", "GET", "TOP", "BIG", "KEY", "WIN",
+    "API", "APR", "APY", "ATH", "CEO", "CEX", "CFO", "CPI", "CTO", "DAO", "DEX", "ETF", "EU",
+    "FAQ", "FED", "GDP", "IPO", "KYC", "AML", "NFT", "OTC", "PR", "SEC", "TV", "TVL", "UK",
+    "USA", "USD", "EUR", "GBP", "JPY", "CNY", "PDF", "NEWS", "Q1", "Q2", "Q3", "Q4",
+}
+
+# Coin names that are everyday words; those coins match as cashtags or symbols only
+COMMON_WORDS = {
+    "the", "and", "for", "you", "not", "all", "new", "one", "out", "now", "get", "can", "may",
+    "coin", "token", "crypto", "money", "cash", "gold", "silver", "market", "price", "data",
+    "chain", "network", "protocol", "finance", "dollar", "euro", "bank", "fund", "pay", "game",
+    "world", "life", "time", "energy", "power", "media", "meta", "bull", "bear", "moon", "safe",
+    "black", "white", "blue", "green", "red", "sun", "star", "apple", "dog", "cat", "open",
+    "graph", "maker", "compound", "dash", "wave", "waves", "flow", "near", "just", "based",
+    "hedge", "stable", "trust", "bridge", "swap", "yield", "staked", "wrapped", "bridged",
+    "index", "capital", "global", "digital", "smart", "home",
+}
+
+RegistryEntry = Dict[str, Any]
+
+
+def words_of(text: str) -> Tuple[str, ...]:
+    """Lower-case words of a name, the unit the trie is keyed on."""
+    return tuple(word.lower() for _, word in WORD.findall(text))
+
+
+def parse_aliases(value: str) -> Dict[str, str]:
+    """Parse "name=SYMBOL,..." alias overrides."""
+    aliases = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, symbol = item.rsplit("=", 1)
+        if name.strip() and symbol.strip():
+            aliases[name.strip().lower()] = symbol.strip().upper()
+    return aliases
+
+
+class TokenExtractor:
+    """Single-pass matcher of coin names, aliases and symbols over words.
+
+    Names and aliases live in a trie of lower-case words (a node maps the
+    next word to a child node, and the "" key holds the symbol of a name
+    ending there); symbols are dict lookups on the same words. At each word
+    the longest name wins, then an exact upper-case symbol, so the cost is
+    one dict lookup per word plus one per extra word of a multi-word name.
+    """
+
+    def __init__(self, coins: Iterable[RegistryEntry], aliases: Dict[str, str] = None, rank_limit: int = 1000):
+        self.rank_limit = rank_limit
+        self._trie: Dict[str, Any] = {}
+        self._symbols: Dict[str, str] = {}
+        self._cashtags: Dict[str, str] = {}
+        self._coin_ids: Dict[str, str] = {}
+        self.coins = 0
+        self.names = 0
+
+        # Ranked coins first so a shared name or symbol maps to the biggest coin
+        ordered = sorted(coins, key=lambda coin: (coin.get("rank") is None, coin.get("rank") or 0))
+        for coin in ordered:
+            self._add_coin(coin)
+
+        for name, symbol in {**ALIASES, **(aliases or {})}.items():
+            self._add_name(words_of(name), symbol, override=True)
+
+    def _matchable(self, coin: RegistryEntry) -> bool:
+        """Whether a coin's name and bare symbol are matched, not just its cashtag."""
+        rank = coin.get("rank")
+        return self.rank_limit <= 0 or (rank is not None and rank <= self.rank_limit)
+
+    def _add_coin(self, coin: RegistryEntry):
+        symbol = (coin.get("symbol") or "").strip().upper()
+        symbol_words = words_of(symbol)
+        if len(symbol_words) != 1:
+            return
+        self.coins += 1
+        # Digit-only symbols would turn prices and figures into coins
+        lettered = any(char.isalpha() for char in symbol)
+        if lettered:
+            self._cashtags.setdefault(symbol_words[0], symbol)
+        if coin.get("id"):
+            self._coin_ids.setdefault(symbol, coin["id"])
+
+        if not self._matchable(coin):
+            return
+        if lettered and symbol not in AMBIGUOUS_SYMBOLS and len(symbol) > 1:
+            self._symbols.setdefault(symbol, symbol)
+
+        name = words_of(coin.get("name") or "")
+        joined = " ".join(name)
+        # A name that is just an ambiguous symbol ("ETF") would match that word in any case
+        if len(joined) > 2 and joined not in COMMON_WORDS and not (name == symbol_words and symbol in AMBIGUOUS_SYMBOLS):
+            self._add_name(name, symbol)
+
+    def _add_name(self, name: Tuple[str, ...], symbol: str, override: bool = False):
+        if not name:
+            return
+        node = self._trie
+        for word in name:
+            node = node.setdefault(word, {})
+        if override or "" not in node:
+            if "" not in node:
+                self.names += 1
+            node[""] = symbol
+
+    def extract(self, text: str) -> List[str]:
+        """Canonical symbols of every coin mentioned in text, in order of first mention."""
+        if not text:
+            return []
+        words = WORD.findall(text)
+        lowered = [word.lower() for _, word in words]
+        found: Dict[str, None] = {}
+        trie, symbols, cashtags = self._trie, self._symbols, self._cashtags
+        count = len(words)
+
+        index = 0
+        while index < count:
+            prefix, word = words[index]
+            lower = lowered[index]
+            if prefix:
+                symbol = cashtags.get(lower)
+                if symbol:
+                    found[symbol] = None
+                    index += 1
+                    continue
+
+            # Longest name starting at this word
+            match, end = None, index
+            node = trie.get(lower)
+            position = index
+            while node is not None:
+                if "" in node:
+                    match, end = node[""], position
+                position += 1
+                if position == count:
+                    break
+                node = node.get(lowered[position])
+
+            symbol = symbols.get(word)
+            if match and (end > index or not symbol):
+                found[match] = None
+                index = end + 1
+                continue
+            if symbol:
+                found[symbol] = None
+            index += 1
+
+        return list(found)
+
+    def coin_id(self, symbol: str) -> Optional[str]:
+        """CoinGecko id of the highest ranked coin with this symbol."""
+        return self._coin_ids.get(symbol.upper())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size of the loaded registry and its lookup tables."""
+        return {
+            "coins": self.coins,
+            "names": self.names,
+            "symbols": len(self._symbols),
+            "cashtags": len(self._cashtags),
+            "rank_limit": self.rank_limit,
+        }
+
+
+def registry_path() -> str:
+    """Where the coin registry snapshot is stored."""
+    return config("COINGECKO_COIN_REGISTRY_PATH", default=os.path.join(tempfile.gettempdir(), "coingecko-coins.json"))
+
+
+def load_registry(path: str = None) -> Optional[List[RegistryEntry]]:
+    """Coins from the local snapshot, or None when there is no readable snapshot."""
+    path = path or registry_path()
+    try:
+        with open(path, "r", encoding="utf-8") as snapshot:
+            return json.load(snapshot)["coins"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable coin registry snapshot {path}: {e}")
+        return None
+
+
+def save_registry(coins: List[RegistryEntry], path: str = None):
+    """Write a snapshot atomically so readers never see a partial file."""
+    path = path or registry_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as temp_file:
+            json.dump({"fetched_at": time.time(), "coins": coins}, temp_file, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def registry_age_seconds(path: str = None) -> Optional[float]:
+    """Seconds since the snapshot was written, or None when there is none."""
+    try:
+        return time.time() - os.path.getmtime(path or registry_path())
+    except OSError:
+        return None
+
+
+async def refresh_coin_registry(service, path: str = None, force: bool = False) -> bool:
+    """Re-fetch the registry through a CoinGeckoService when the snapshot is older than the max age.
+
+    Returns whether a new snapshot was written.
+    """
+    path = path or registry_path()
+    max_age = config("COINGECKO_COIN_REGISTRY_MAX_AGE_HOURS", default=24.0, cast=float) * 3600
+    age = registry_age_seconds(path)
+    if not force and age is not None and age < max_age:
+        return False
+
+    started = time.perf_counter()
+    coins = await service.fetch_coin_registry()
+    if not coins:
+        logger.warning("CoinGecko returned an empty coin list; keeping the current registry")
+        return False
+    save_registry(coins, path)
+    logger.info(f"Saved coin registry snapshot with {len(coins)} coins in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+_extractor: Optional[TokenExtractor] = None
+_extractor_source: Optional[Tuple[str, Optional[float]]] = None
+_extractor_lock = threading.Lock()
+
+
+def get_token_extractor() -> TokenExtractor:
+    """Return the process-wide extractor, rebuilt whenever the snapshot file changes.
+
+    Before the first snapshot has been fetched it knows the seed coins only.
+    """
+    global _extractor, _extractor_source
+    path = registry_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    with _extractor_lock:
+        if _extractor is None or _extractor_source != (path, mtime):
+            started = time.perf_counter()
+            coins = load_registry(path) if mtime is not None else None
+            _extractor = TokenExtractor(
+                coins or SEED_COINS,
+                aliases=parse_aliases(config("COINGECKO_TOKEN_ALIASES", default="")),
+                rank_limit=config("COINGECKO_TOKEN_MATCH_RANK_LIMIT", default=1000, cast=int)
+            )
+            _extractor_source = (path, mtime)
+            logger.info(
+                f"Built token extractor from {'snapshot' if coins else 'seed coins'} "
+                f"({_extractor.coins} coins, {_extractor.names} names) in {time.perf_counter() - started:.2f}s"
+            )
+        return _extractor
+
+
+def extract_tokens(text: str) -> List[str]:
+    """Canonical symbols mentioned in text, using the process-wide extractor."""
+    return get_token_extractor().extract(text)
+
+
+async def _main():
+    from services.coingecko_service import CoinGeckoService
+    from services.http_pool import close_http_clients
+
+    try:
+        await refresh_coin_registry(CoinGeckoService(), force=True)
+    finally:
+        await close_http_clients()
+    print(get_token_extractor().stats())
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(_main())
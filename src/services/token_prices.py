@@ -0,0 +1,214 @@
+"""
+Token price snapshots for the coins articles mention.
+
+Prices come from CoinGecko /simple/price, which takes many coin ids per
+call, so a batch of articles costs one request per COINGECKO_PRICE_BATCH_SIZE
+distinct coins. A short per-coin cache lets concurrent batches share
+lookups: a coin fetched within COINGECKO_PRICE_CACHE_SECONDS is not
+requested again, and a coin already being fetched is awaited rather than
+requested twice. Fetched prices are kept in the token_price_snapshots
+time series, one row per coin and CoinGecko update time.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from decouple import config
+from sqlalchemy.dialects.postgresql import insert
+from database import SessionLocal
+from models import NewsArticle, TokenPriceSnapshot
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# fetch(coin_ids) -> {coin_id: price}; coins missing from the result have no price
+PriceFetcher = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+def parse_simple_price(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Normalize a /simple/price response (vs_currencies=usd) to {coin_id: price}."""
+    prices = {}
+    for coin_id, quote in (data or {}).items():
+        if not quote or quote.get("usd") is None:
+            continue
+        updated = quote.get("last_updated_at")
+        prices[coin_id] = {
+            "price_usd": float(quote["usd"]),
+            "change_24h_pct": quote.get("usd_24h_change"),
+            "captured_at": datetime.fromtimestamp(updated, tz=timezone.utc) if updated else datetime.now(timezone.utc)
+        }
+    return prices
+
+
+class PriceCache:
+    """Per-coin price cache with a short TTL and coalesced lookups."""
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_many(self, coin_ids: List[str], fetch: PriceFetcher) -> Dict[str, Dict[str, Any]]:
+        """Prices for coin_ids, calling fetch once for the coins nobody has cached or in flight."""
+        loop = asyncio.get_running_loop()
+        now = self._clock()
+        prices: Dict[str, Dict[str, Any]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, asyncio.Future] = {}
+
+        with self._lock:
+            for coin_id in dict.fromkeys(coin_ids):
+                entry = self._entries.get(coin_id)
+                if entry and now - entry[0] < self.ttl:
+                    self.hits += 1
+                    prices[coin_id] = entry[1]
+                elif (id(loop), coin_id) in self._inflight:
+                    self.coalesced += 1
+                    waiting[coin_id] = self._inflight[(id(loop), coin_id)]
+                else:
+                    self.misses += 1
+                    owned[coin_id] = loop.create_future()
+                    self._inflight[(id(loop), coin_id)] = owned[coin_id]
+
+        if owned:
+            try:
+                fetched = await fetch(list(owned))
+            except Exception as e:
+                for future in owned.values():
+                    future.set_exception(e)
+                    future.exception()  # marks it retrieved when no other batch was waiting
+                raise
+            except BaseException:
+                # Cancelled mid-fetch: release the waiting batches rather than leave them hanging
+                for future in owned.values():
+                    future.cancel()
+                raise
+            finally:
+                with self._lock:
+                    for coin_id in owned:
+                        self._inflight.pop((id(loop), coin_id), None)
+
+            fetched_at = self._clock()
+            with self._lock:
+                for coin_id, price in fetched.items():
+                    self._entries[coin_id] = (fetched_at, price)
+                # Forget expired coins so the cache stays the size of the active set
+                for coin_id in [key for key, (at, _) in self._entries.items() if fetched_at - at >= self.ttl]:
+                    del self._entries[coin_id]
+            for coin_id, future in owned.items():
+                future.set_result(fetched.get(coin_id))
+                if coin_id in fetched:
+                    prices[coin_id] = fetched[coin_id]
+
+        abandoned = []
+        for coin_id, future in waiting.items():
+            try:
+                price = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                abandoned.append(coin_id)
+                continue
+            except Exception:
+                continue
+            if price is not None:
+                prices[coin_id] = price
+
+        if abandoned:
+            # The batch fetching these was cancelled; look them up in its place
+            prices.update(await self.get_many(abandoned, fetch))
+        return prices
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0
+            }
+
+
+_price_cache = None
+_price_cache_lock = threading.Lock()
+
+
+def get_price_cache() -> PriceCache:
+    """Return the process-wide price cache."""
+    global _price_cache
+    with _price_cache_lock:
+        if _price_cache is None:
+            _price_cache = PriceCache(ttl=config("COINGECKO_PRICE_CACHE_SECONDS", default=30.0, cast=float))
+        return _price_cache
+
+
+def build_snapshot_insert(rows: List[Dict[str, Any]]):
+    """One multi-row INSERT; a price already stored for that coin and update time is skipped."""
+    return insert(TokenPriceSnapshot).values(rows).on_conflict_do_nothing(
+        index_elements=[TokenPriceSnapshot.coin_id, TokenPriceSnapshot.captured_at]
+    )
+
+
+def save_price_snapshots(prices: Dict[str, Dict[str, Any]], symbols: Dict[str, str]):
+    """Append fetched prices to the time series; symbols maps coin id to symbol."""
+    rows = [
+        {
+            "coin_id": coin_id,
+            "captured_at": price["captured_at"],
+            "symbol": symbols.get(coin_id, ""),
+            "price_usd": price["price_usd"],
+            "change_24h_pct": price["change_24h_pct"]
+        }
+        for coin_id, price in prices.items()
+    ]
+    if not rows:
+        return
+
+    db = SessionLocal()
+    try:
+        db.execute(build_snapshot_insert(rows))
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error saving token price snapshots: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def enrich_articles_with_prices(articles: List[NewsArticle]) -> Dict[str, Any]:
+    """Synchronous entry point for callers without an event loop (S3 ingestion).
+
+    Enrichment never fails ingestion: errors are logged and the articles
+    are saved without prices.
+    """
+    if not articles or not config("PRICE_ENRICHMENT_ENABLED", default=True, cast=bool):
+        return {}
+
+    async def enrich() -> Dict[str, Any]:
+        from services.coingecko_service import CoinGeckoService
+        from services.http_pool import close_http_clients
+
+        try:
+            return await CoinGeckoService().enrich_with_prices(articles)
+        finally:
+            await close_http_clients()
+
+    try:
+        return asyncio.run(enrich())
+    except Exception as e:
+        logger.warning(f"Price enrichment skipped: {e}")
+        return {}
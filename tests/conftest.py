@@ -2,6 +2,21 @@
 Simple pytest configuration for the crypto sentiment agent tests.
 """
 
+import os
+import sys
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
+
+# Mirror the container's PYTHONPATH=/app/src so the flat imports used by the
+# application (``from models import ...``) resolve the same way under pytest.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# ``src.models`` and ``models`` must be the same module, otherwise the
+# NewsArticle table is declared twice on the shared declarative Base.
+import models  # noqa: E402
+
+sys.modules.setdefault("src.models", models)
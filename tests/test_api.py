@@ -54,16 +54,28 @@ def test_get_sentiment_endpoint(test_client):
     assert "sentiment_distribution" in data
 
 
+def test_sentiment_timeseries_validates_range_and_granularity(test_client):
+    """Test that bad time series parameters are rejected before any query runs."""
+    response = test_client.get("/api/sentiment/timeseries/?granularity=minute")
+    assert response.status_code == 422
+
+    response = test_client.get("/api/sentiment/timeseries/?start=2025-10-02T00:00:00&end=2025-10-01T00:00:00")
+    assert response.status_code == 400
+
+
 def test_process_s3_endpoint(test_client):
     """Test S3 processing endpoint."""
     response = test_client.post("/api/process/s3/")
 
-    # The endpoint should return 200 even if the actual processing fails
-    # due to missing AWS credentials or S3 access
-    assert response.status_code in [200, 500]
-    if response.status_code == 200:
-        data = response.json()
-        assert data["message"] == "S3 PDFs processed successfully"
+    # Processing runs as a background job, so the endpoint returns at once;
+    # missing AWS credentials only show up in the job status
+    assert response.status_code == 202
+    data = response.json()
+    assert "job_id" in data
+
+    job_response = test_client.get(f"/api/jobs/{data['job_id']}/")
+    assert job_response.status_code == 200
+    assert job_response.json()["kind"] == "process_s3"
 
 
 def test_fetch_live_news_endpoint(test_client):
@@ -82,9 +94,25 @@ def test_analyze_sentiment_endpoint(test_client):
     """Test analyze sentiment endpoint."""
     response = test_client.post("/api/analyze/sentiment/")
 
-    # The endpoint should return 200 even if the actual analysis fails
-    # due to missing AWS Bedrock access
-    assert response.status_code in [200, 500]
-    if response.status_code == 200:
-        data = response.json()
-        assert data["message"] == "Sentiment analysis completed successfully"
+    # Analysis runs as a background job, so the endpoint returns at once;
+    # missing AWS Bedrock access only shows up in the job status
+    assert response.status_code == 202
+    data = response.json()
+    assert "job_id" in data
+
+
+def test_get_unknown_job_returns_404(test_client):
+    """Test job status for an unknown job id."""
+    response = test_client.get("/api/jobs/does-not-exist/")
+
+    assert response.status_code == 404
+
+
+def test_pipeline_endpoint_reports_stopped_pipeline(test_client):
+    """Test pipeline status when PIPELINE_ENABLED is off."""
+    response = test_client.get("/api/pipeline/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["running"] is False
+    assert data["queue"]["depth"] == 0
@@ -0,0 +1,101 @@
+"""
+Tests for shared article persistence.
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import services.article_store as article_store
+from models import NewsArticle
+from services.article_store import _build_insert, article_dedup_key, bulk_insert_articles, make_dedup_key, normalize_url
+
+
+def test_normalize_url_drops_tracking_and_fragments():
+    assert normalize_url("HTTPS://News.Example.com/btc/?utm_source=x&id=7#top") == "https://news.example.com/btc?id=7"
+
+
+def test_dedup_key_prefers_url_then_s3_key_then_title():
+    """Test which identity each kind of article is deduplicated on."""
+    assert make_dedup_key(url="https://a.com/x", title="One") == make_dedup_key(url="https://a.com/x/", title="Two")
+    assert make_dedup_key(s3_bucket="b", s3_key="k.pdf", title="One") == make_dedup_key(s3_bucket="b", s3_key="k.pdf", title="Two")
+    assert make_dedup_key(title="Bitcoin  Rallies", source="Decrypt") == make_dedup_key(title="bitcoin rallies", source="decrypt")
+    assert make_dedup_key(title="Bitcoin Rallies", source="Decrypt") != make_dedup_key(title="Bitcoin Rallies", source="CoinDesk")
+
+
+@pytest.mark.parametrize("refresh_changed, clause", [
+    (False, "ON CONFLICT (dedup_key) DO NOTHING"),
+    (True, "ON CONFLICT (dedup_key) DO UPDATE"),
+])
+def test_insert_is_one_statement_with_returning(refresh_changed, clause):
+    """Test that a batch is written with a single INSERT ... ON CONFLICT ... RETURNING."""
+    articles = [NewsArticle(title=f"Article {i}", source="Test", dedup_key=str(i)) for i in range(3)]
+    sql = str(_build_insert(articles, refresh_changed).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO news_articles") == 1
+    assert clause in sql
+    assert "RETURNING news_articles.id, news_articles.dedup_key, (xmax = 0) AS inserted" in sql
+
+
+class FakeSession:
+    """Session stand-in whose database already holds some dedup keys."""
+
+    def __init__(self, existing_keys):
+        self.existing_keys = set(existing_keys)
+        self.statements = 0
+
+    def execute(self, statement):
+        self.statements += 1
+        rows = statement.compile().params
+        keys = [value for name, value in rows.items() if name.startswith("dedup_key")]
+        return [(100 + index, key, True) for index, key in enumerate(keys) if key not in self.existing_keys]
+
+
+def test_bulk_insert_reports_inserted_and_skipped(monkeypatch):
+    """Test counts, id assignment and one round trip per batch."""
+    flagged = []
+    monkeypatch.setattr(article_store, "get_near_duplicate_index", lambda: type("Index", (), {
+        "flag_articles": lambda self, db, articles: flagged.extend(articles) or 0
+    })())
+    articles = [NewsArticle(title=f"Article {i}", source="Test") for i in range(5)]
+    articles.append(NewsArticle(title="Article 0", source="Test"))  # repeated within the batch
+    db = FakeSession({make_dedup_key(title="Article 1", source="Test")})
+
+    counts = bulk_insert_articles(db, articles, batch_size=10)
+
+    assert counts == {"inserted": 4, "updated": 0, "skipped": 2, "near_duplicates": 0, "article_ids": [100, 102, 103, 104]}
+    assert db.statements == 1
+    assert all(article.id is not None for article in flagged)
+
+
+def test_refresh_clears_the_near_duplicate_flag():
+    """Test that a refreshed row is judged again instead of keeping its old duplicate_of_id."""
+    articles = [NewsArticle(title="Article", source="Test", dedup_key="1")]
+    sql = str(_build_insert(articles, refresh_changed=True).compile(dialect=postgresql.dialect()))
+
+    assert "duplicate_of_id = %(" in sql.split("DO UPDATE")[1]
+
+
+def test_refreshing_analyzed_articles_takes_them_out_of_the_rollups(monkeypatch):
+    """Test that re-ingested articles whose sentiment is cleared are subtracted from the rollups."""
+    flagged = []
+    monkeypatch.setattr(article_store, "get_near_duplicate_index", lambda: type("Index", (), {
+        "flag_articles": lambda self, db, articles: flagged.extend(articles) or 0
+    })())
+    articles = [NewsArticle(title=f"Article {i}", source="Test") for i in range(3)]
+    keys = [article_dedup_key(article) for article in articles]
+    analyzed = {keys[0]: ("hour", "bullish", 0.9, ["BTC"]), keys[1]: ("hour", "bearish", 0.4, [])}
+    monkeypatch.setattr(article_store, "lock_rollup_rows", lambda db, key_column, keys: analyzed)
+    retracted = []
+    monkeypatch.setattr(article_store, "apply_rollup_deltas", lambda db, removed=(): retracted.extend(removed) or 0)
+
+    class RefreshSession:
+        def execute(self, statement):
+            # Article 0 changed and is refreshed, 1 is unchanged, 2 is new
+            return [(10, keys[0], False), (12, keys[2], True)]
+
+    counts = bulk_insert_articles(RefreshSession(), articles, refresh_changed=True)
+
+    assert counts["updated"] == 1 and counts["inserted"] == 1
+    assert retracted == [analyzed[keys[0]]]
+    # Both the new and the refreshed article are (re-)signed
+    assert sorted(article.id for article in flagged) == [10, 12]
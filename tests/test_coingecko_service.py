@@ -0,0 +1,113 @@
+"""
+Tests for the CoinGecko service.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from services.coingecko_service import CoinGeckoService, merge_duplicate_articles, parse_watchlist
+from services.response_cache import ResponseCache
+from models import NewsArticle
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Create a service whose requests skip the shared rate limiter and response cache."""
+    monkeypatch.setenv("COINGECKO_API_KEY", "test")
+    service = CoinGeckoService()
+    service.response_cache = ResponseCache(default_ttl=0)
+
+    async def no_wait(tokens=0):
+        pass
+
+    monkeypatch.setattr(service.rate_limiter, "acquire_async", no_wait)
+    return service
+
+
+def coin_news_handler(in_flight, peak):
+    """Serve /coins/<id>/news with one story per coin plus one shared story."""
+    async def handler(request):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+
+        if request.url.path.endswith("/search/trending"):
+            return httpx.Response(200, json={"coins": []})
+        coin_id = request.url.path.split("/")[-2]
+        if coin_id == "missing":
+            return httpx.Response(404, json={"error": "coin not found"})
+        return httpx.Response(200, json=[
+            {"title": f"{coin_id} news", "content": "Update", "url": f"https://news.example/{coin_id}"},
+            {"title": "Market wrap", "content": "Bitcoin and Ethereum", "url": "https://news.example/wrap?utm_source=cg"},
+        ])
+
+    return handler
+
+
+def test_parse_watchlist_keeps_order_and_drops_duplicates():
+    """Test comma and whitespace separated coin ids."""
+    assert parse_watchlist("bitcoin, Ethereum solana,,bitcoin") == ["bitcoin", "ethereum", "solana"]
+
+
+def test_watchlist_fans_out_under_concurrency_cap(service):
+    """Test that coins are fetched concurrently, capped, merged and reported."""
+    in_flight, peak = [0], [0]
+    coin_ids = [f"coin-{i}" for i in range(20)] + ["missing"]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(coin_news_handler(in_flight, peak))) as client:
+            service.client = client
+            return await service.fetch_watchlist_news(coin_ids, concurrency=5)
+
+    articles, report = asyncio.run(run())
+
+    assert 1 < peak[0] <= 6  # five coin requests plus the trending call
+    assert report["coins"] == 21 and report["failed_coins"] == 1
+    assert report["articles_fetched"] == 40
+    assert len(articles) == report["articles_unique"] == 21  # the shared story is kept once
+    missing = next(coin for coin in report["per_coin"] if coin["coin_id"] == "missing")
+    assert missing["error"] and missing["articles"] == 0
+    assert all(coin["seconds"] >= 0 for coin in report["per_coin"])
+
+
+def test_merge_duplicate_articles_unions_tokens():
+    """Test that copies of one story keep every token they mention."""
+    first = NewsArticle(title="Wrap", source="CoinGecko", url="https://news.example/wrap", tokens_mentioned=["BTC"])
+    second = NewsArticle(title="Wrap", source="CoinGecko", url="https://news.example/wrap/", tokens_mentioned=["ETH", "BTC"])
+
+    merged = merge_duplicate_articles([first, second])
+
+    assert merged == [first]
+    assert first.tokens_mentioned == ["BTC", "ETH"]
+
+
+def test_trending_is_revalidated_with_if_none_match(service):
+    """Test that an expired response is revalidated and a 304 reuses the cached body."""
+    now = [0.0]
+    service.response_cache = ResponseCache(default_ttl=300, clock=lambda: now[0])
+    conditional = []
+
+    def handler(request):
+        conditional.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"trending-1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"coins": [{"item": {"id": "bitcoin", "name": "Bitcoin", "symbol": "btc"}}]}, headers={"ETag": '"trending-1"'})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            service.client = client
+            first = await service.fetch_trending_news()
+            cached = await service.fetch_trending_news()
+            now[0] = 301
+            revalidated = await service.fetch_trending_news()
+            return first, cached, revalidated
+
+    first, cached, revalidated = asyncio.run(run())
+
+    assert conditional == [None, '"trending-1"']
+    assert [article.title for article in revalidated] == [article.title for article in first] == ["Trending: Bitcoin (BTC)"]
+    assert len(cached) == 1
+    assert service.response_cache.stats()["revalidated"] == 1
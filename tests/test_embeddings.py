@@ -0,0 +1,117 @@
+"""
+Tests for article embeddings.
+"""
+
+import io
+import json
+
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+from sqlalchemy.dialects import postgresql
+
+from database import EMBEDDING_DIMENSIONS
+from services.embeddings import BedrockTitanEmbedder, HashingEmbedder, build_embedding_update, get_embedding_backend
+from services.rate_limiter import ServiceLimiter
+
+
+def cosine(first, second):
+    return float(np.dot(first, second))
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    """Same text gives the same unit vector across instances."""
+    first = HashingEmbedder().embed(["Bitcoin surges past $70k"])[0]
+    second = HashingEmbedder().embed(["Bitcoin surges past $70k"])[0]
+
+    assert first == second
+    assert len(first) == EMBEDDING_DIMENSIONS
+    assert np.linalg.norm(first) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_hashing_embedder_ranks_related_text_closer():
+    """Texts sharing vocabulary are more similar than unrelated ones."""
+    query, related, unrelated = HashingEmbedder().embed([
+        "Bitcoin ETF approval drives bitcoin price rally",
+        "Bitcoin price rally continues after ETF approval",
+        "Solana validators ship network upgrade for DeFi apps",
+    ])
+
+    assert cosine(query, related) > cosine(query, unrelated)
+
+
+def test_hashing_embedder_handles_empty_text():
+    """Empty text gives a zero vector instead of NaNs."""
+    vector = HashingEmbedder(dimensions=8).embed([""])[0]
+    assert vector == [0.0] * 8
+
+
+def test_embedding_update_is_single_statement():
+    """Embeddings are written with one UPDATE ... FROM (VALUES ...)."""
+    statement = build_embedding_update([(1, [0.1] * EMBEDDING_DIMENSIONS), (2, [0.2] * EMBEDDING_DIMENSIONS)])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("UPDATE news_articles SET embedding=CAST(updates.embedding AS VECTOR(")
+    assert "FROM (VALUES" in sql
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_embedding_backend("word2vec")
+
+
+class FakeTitanClient:
+    """bedrock-runtime stand-in returning hashing embeddings."""
+
+    def __init__(self):
+        self.requests = []
+
+    def invoke_model(self, modelId, body, **kwargs):
+        request = json.loads(body)
+        self.requests.append(request)
+        payload = {
+            "embedding": HashingEmbedder().embed([request["inputText"]])[0],
+            "inputTextTokenCount": 12
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+
+def test_titan_embedder_preserves_batch_order(monkeypatch):
+    """Concurrent Titan requests come back in input order."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    embedder = BedrockTitanEmbedder()
+    embedder.bedrock_client = FakeTitanClient()
+    embedder.rate_limiter = ServiceLimiter("test", requests_per_second=1000, burst=1000)
+
+    texts = [f"article number {index}" for index in range(10)]
+    assert embedder.embed(texts) == HashingEmbedder().embed(texts)
+    assert all("dimensions" not in request for request in embedder.bedrock_client.requests)
+
+
+def test_titan_retries_go_through_the_rate_limiter(monkeypatch):
+    """A throttled request waits for the limiter again before it is retried."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("BEDROCK_RETRY_BASE_DELAY", "0")
+    embedder = BedrockTitanEmbedder()
+
+    class ThrottlingOnceClient(FakeTitanClient):
+        def invoke_model(self, modelId, body, **kwargs):
+            if not self.requests:
+                self.requests.append(None)
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+            return super().invoke_model(modelId, body, **kwargs)
+
+    class CountingLimiter(ServiceLimiter):
+        acquired = 0
+
+        def acquire(self, tokens: float = 0):
+            self.acquired += 1
+            super().acquire(tokens)
+
+    embedder.bedrock_client = ThrottlingOnceClient()
+    embedder.rate_limiter = CountingLimiter("test", requests_per_second=1000, burst=1000)
+
+    assert embedder.embed(["one article"]) == HashingEmbedder().embed(["one article"])
+    assert embedder.rate_limiter.acquired == 2
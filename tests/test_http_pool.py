@@ -0,0 +1,97 @@
+"""
+Tests for the pooled outbound HTTP clients.
+"""
+
+import asyncio
+
+import httpx
+
+from services.coingecko_service import CoinGeckoService
+from services.response_cache import ResponseCache
+from services.http_pool import (
+    PoolStats,
+    build_client,
+    close_http_clients,
+    get_http_client,
+    http_pool_report,
+)
+
+
+def test_one_client_per_event_loop():
+    """Test that requests on one loop share a client and a new loop gets its own."""
+    async def clients():
+        first = get_http_client("test-service")
+        second = get_http_client("test-service")
+        await close_http_clients()
+        return first, second
+
+    first, second = asyncio.run(clients())
+    other, _ = asyncio.run(clients())
+
+    assert first is second
+    assert first is not other
+    assert first.is_closed and other.is_closed
+    assert http_pool_report()["test-service"]["open_clients"] == 0
+
+
+def test_pool_stats_count_reused_connections():
+    """Test that requests without a new connection count as reused."""
+    stats = PoolStats()
+
+    async def trace_requests():
+        await stats.trace("connection.connect_tcp.complete", {})
+        await stats.trace("connection.start_tls.complete", {})
+        for _ in range(4):
+            await stats.trace("http2.send_request_headers.started", {})
+
+    asyncio.run(trace_requests())
+    report = stats.report()
+
+    assert report["requests"] == 4
+    assert report["connections_opened"] == 1
+    assert report["connections_reused"] == 3
+    assert report["http2_requests"] == 4
+    assert report["reuse_rate"] == 0.75
+
+
+def test_build_client_applies_pool_limits(monkeypatch):
+    """Test that limits and timeouts come from per-service settings."""
+    monkeypatch.setenv("COINGECKO_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("COINGECKO_HTTP_CONNECT_TIMEOUT", "2.5")
+    monkeypatch.setenv("COINGECKO_HTTP2", "false")
+
+    async def limits():
+        client = build_client("coingecko")
+        pool = client._transport._pool
+        await client.aclose()
+        return pool, client.timeout
+
+    pool, timeout = asyncio.run(limits())
+
+    assert pool._max_connections == 7
+    assert timeout.connect == 2.5
+
+
+def test_coingecko_requests_reuse_the_injected_client(monkeypatch):
+    """Test that the service sends every request through one client."""
+    monkeypatch.setenv("COINGECKO_API_KEY", "test")
+    seen = []
+
+    def handler(request):
+        seen.append((request.url.path, request.headers["x-cg-demo-api-key"]))
+        return httpx.Response(200, json={"coins": []})
+
+    async def no_wait(tokens=0):
+        pass
+
+    async def fetch_twice():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            service = CoinGeckoService(client=client)
+            service.response_cache = ResponseCache(default_ttl=0)
+            monkeypatch.setattr(service.rate_limiter, "acquire_async", no_wait)
+            await service.fetch_trending_news()
+            await service.fetch_trending_news()
+            return client.is_closed
+
+    assert asyncio.run(fetch_twice()) is False
+    assert seen == [("/api/v3/search/trending", "test")] * 2
@@ -0,0 +1,92 @@
+"""
+Tests for the background job manager.
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.job_manager import JobManager
+
+
+@pytest.fixture
+def manager():
+    """Create a job manager and shut it down afterwards."""
+    job_manager = JobManager(max_workers=2)
+    yield job_manager
+    job_manager.shutdown()
+
+
+def wait_for(job, timeout=5):
+    """Poll until a job leaves the queued/running states."""
+    deadline = time.monotonic() + timeout
+    while job.is_active:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"Job still {job.status}")
+        time.sleep(0.01)
+
+
+def test_job_reports_progress_and_result(manager):
+    """Test progress counters and the task's return value."""
+    def task(job):
+        job.add_total(3)
+        for _ in range(3):
+            job.advance()
+        job.advance(0, errors=1)
+        return 3
+
+    job, created = manager.submit("demo", task)
+    wait_for(job)
+
+    data = job.to_dict()
+    assert created
+    assert data["status"] == "completed"
+    assert data["items_done"] == 3
+    assert data["items_total"] == 3
+    assert data["error_count"] == 1
+    assert data["result"] == 3
+
+
+def test_duplicate_kind_returns_active_job(manager):
+    """Test deduplication of concurrent jobs of the same kind."""
+    release = threading.Event()
+
+    first, created_first = manager.submit("demo", lambda job: release.wait(5))
+    second, created_second = manager.submit("demo", lambda job: None)
+    release.set()
+    wait_for(first)
+
+    assert created_first
+    assert not created_second
+    assert second is first
+
+
+def test_cancel_stops_job_at_next_checkpoint(manager):
+    """Test cooperative cancellation."""
+    started = threading.Event()
+
+    def task(job):
+        started.set()
+        while True:
+            job.raise_if_cancelled()
+            job.advance()
+
+    job, _ = manager.submit("demo", task)
+    started.wait(5)
+    manager.cancel(job.id)
+    wait_for(job)
+
+    assert job.status == "cancelled"
+
+
+def test_failed_job_records_error(manager):
+    """Test that exceptions mark the job failed with the message."""
+    def task(job):
+        raise RuntimeError("boom")
+
+    job, _ = manager.submit("demo", task)
+    wait_for(job)
+
+    assert job.status == "failed"
+    assert job.errors == ["boom"]
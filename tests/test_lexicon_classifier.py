@@ -0,0 +1,94 @@
+"""
+Tests for the lexicon sentiment pre-classifier.
+"""
+
+import time
+
+import pytest
+
+from services.lexicon_classifier import LexiconClassifier
+
+
+@pytest.fixture
+def classifier():
+    """Create a classifier with the default threshold."""
+    return LexiconClassifier(threshold=0.85)
+
+
+def test_trending_rows_are_classified_locally(classifier):
+    """Test that synthetic CoinGecko trending rows never need Bedrock."""
+    result = classifier.preclassify("Trending: Pepe (PEPE)", "Coin Pepe is trending with rank #30")
+
+    assert result["sentiment"] == "neutral"
+    assert result["tokens_mentioned"] == ["PEPE"]
+
+
+def test_unambiguous_headlines_are_confident(classifier):
+    """Test clearly bullish and bearish headlines."""
+    bullish = classifier.preclassify("Bitcoin surges to all-time high as ETF inflows soar", "")
+    bearish = classifier.preclassify("Exchange hacked, token crashes in massive sell-off", "")
+
+    assert bullish["sentiment"] == "bullish"
+    assert bearish["sentiment"] == "bearish"
+
+
+def test_mixed_or_neutral_headlines_go_to_bedrock(classifier):
+    """Test that ambiguous text falls below the threshold."""
+    assert classifier.preclassify("ETH Rejects USD4.2K But ETF Inflows Are Bullish", "") is None
+    assert classifier.preclassify("SEC schedules hearing on staking rules", "") is None
+    assert classifier.stats() == {"evaluated": 2, "calls_saved": 0, "save_rate": 0.0}
+
+
+def test_negation_flips_polarity(classifier):
+    """Test that negated bearish wording does not read as bearish."""
+    result = classifier.classify("Bitcoin isn’t crashing despite the fear", "")
+
+    assert result["sentiment"] != "bearish" or result["confidence_score"] < 0.85
+
+
+@pytest.mark.parametrize("title", [
+    "Will Bitcoin crash?",
+    "Is this the end of the bull market?",
+    "Exchange denies hack rumors",
+])
+def test_questions_and_denials_go_to_bedrock(classifier, title):
+    """Test that speculative or denied claims are never labelled locally."""
+    assert classifier.classify(title, "")["confidence_score"] < classifier.threshold
+
+
+def test_phrases_match_whole_words(classifier):
+    """Test that "sell offers" is not read as "sell off"."""
+    result = classifier.classify("Exchange opens sell offers for new token", "")
+
+    assert result["sentiment"] == "neutral"
+    assert result["confidence_score"] < classifier.threshold
+
+
+def test_phrase_words_are_not_counted_twice(classifier):
+    """Test that "etf approval" is one term, not a phrase plus "approval"."""
+    assert classifier.classify("SEC delays ETF approval decision", "")["confidence_score"] < classifier.threshold
+
+
+def test_negation_stops_at_contrast_words(classifier):
+    """Test that "not" does not reach past "despite" to flip "fears"."""
+    result = classifier.classify("Bitcoin price does not crash despite fears", "")
+
+    assert result["sentiment"] != "bullish"
+    assert result["confidence_score"] < classifier.threshold
+
+
+@pytest.mark.slow
+def test_preclassifier_throughput(classifier):
+    """Test that the pre-classifier handles well over 10k articles per second."""
+    body = (
+        "Bitcoin traded near $113,000 on Tuesday as traders weighed macroeconomic data. "
+        "Spot ETF flows were mixed, with analysts pointing to on-chain data. "
+    ) * 8
+    count = 20000
+
+    started = time.perf_counter()
+    for _ in range(count):
+        classifier.preclassify("Bitcoin steadies near $113K ahead of CPI data", body)
+    rate = count / (time.perf_counter() - started)
+
+    assert rate > 10000
@@ -0,0 +1,129 @@
+"""
+Tests for MinHash/LSH near-duplicate detection.
+"""
+
+import random
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from models import NewsArticle
+from services.near_duplicates import NUM_PERM, NearDuplicateIndex, article_signature
+
+WORDS = (
+    "bitcoin ether solana market traders price rally etf approval exchange inflows "
+    "liquidity volatility stablecoin regulators network upgrade validators funding "
+    "rate futures options whale wallet treasury yields macro inflation data week"
+).split()
+
+
+def random_article(seed, length=200):
+    """Generate a pseudo-random article body."""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def repost(text, edits=3, seed=0):
+    """Copy text with a few words changed, like a syndicated repost."""
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = "edited"
+    return " ".join(words)
+
+
+class FakeSession:
+    """Session stand-in that records executed statements and parameters."""
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, statement, parameters=None):
+        self.executed.append((statement, parameters))
+
+
+@pytest.fixture
+def index():
+    """Create an empty index that never touches the database."""
+    near_duplicates = NearDuplicateIndex(threshold=0.8)
+    near_duplicates._loaded = True
+    return near_duplicates
+
+
+def test_signature_is_stable_and_sized():
+    """Signatures are deterministic so persisted ones stay comparable."""
+    body = random_article(1)
+    assert np.array_equal(article_signature("Title", body), article_signature("Title", body))
+    assert article_signature("Title", body).shape == (NUM_PERM,)
+
+
+def test_short_texts_are_not_signed():
+    """Templated one-liners are too short to compare."""
+    assert article_signature("Trending: Bitcoin (BTC)", "Coin Bitcoin is trending with rank #1") is None
+
+
+def test_repost_is_flagged_and_unrelated_article_is_not(index):
+    """A lightly edited repost matches; a different article does not."""
+    original = random_article(1)
+    index.add(1, article_signature("Bitcoin rallies", original))
+
+    match = index.find_duplicate(article_signature("Bitcoin rallies", repost(original)))
+    assert match is not None and match[0] == 1 and match[1] >= 0.8
+    assert index.find_duplicate(article_signature("Other", random_article(2))) is None
+
+
+def test_flag_articles_clusters_on_the_canonical_article(index):
+    """Duplicates of a duplicate point at the first article of the cluster."""
+    body = random_article(3)
+    articles = [
+        NewsArticle(id=10, title="Story", content=body),
+        NewsArticle(id=11, title="Story", content=repost(body, seed=1)),
+        NewsArticle(id=12, title="Story", content=repost(body, seed=2)),
+        NewsArticle(id=13, title="Other", content=random_article(4)),
+    ]
+    db = FakeSession()
+
+    assert index.flag_articles(db, articles) == 2
+    assert [article.duplicate_of_id for article in articles] == [None, 10, 10, None]
+    signature_insert, signature_rows = db.executed[0]
+    assert signature_insert.table.name == "article_minhash"
+    assert [row["article_id"] for row in signature_rows] == [10, 11, 12, 13]
+    assert db.executed[1][0].table.name == "news_articles"
+
+
+def test_refreshed_article_is_signed_again_from_its_new_text(index):
+    """A refreshed article replaces its old signature and is not matched against it."""
+    body = random_article(5)
+    index.flag_articles(FakeSession(), [
+        NewsArticle(id=20, title="Story", content=body),
+        NewsArticle(id=21, title="Story", content=repost(body)),
+    ])
+
+    db = FakeSession()
+    rewritten = NewsArticle(id=21, title="Story", content=random_article(6))
+    assert index.flag_articles(db, [rewritten]) == 0
+    assert rewritten.duplicate_of_id is None
+    assert len(index) == 2
+    assert index.find_duplicate(article_signature("Story", repost(body, seed=1)))[0] == 20
+    assert index.find_duplicate(article_signature("Story", repost(random_article(6))))[0] == 21
+
+    signature_upsert, signature_rows = db.executed[0]
+    assert "ON CONFLICT (article_id) DO UPDATE" in str(signature_upsert.compile(dialect=postgresql.dialect()))
+    assert [row["article_id"] for row in signature_rows] == [21]
+
+
+@pytest.mark.slow
+def test_lookup_is_sub_millisecond(index):
+    """Test that index lookups stay under a millisecond with many articles indexed."""
+    for article_id in range(20000):
+        index.add(article_id, article_signature("Title", random_article(article_id, length=60)))
+
+    probes = [article_signature("Title", random_article(seed, length=60)) for seed in range(50000, 51000)]
+    started = time.perf_counter()
+    for signature in probes:
+        index.find_duplicate(signature)
+    per_lookup = (time.perf_counter() - started) / len(probes)
+
+    assert per_lookup < 0.001
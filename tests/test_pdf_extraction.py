@@ -0,0 +1,150 @@
+"""
+Tests for the PDF extraction engines and their fallback chain.
+"""
+
+import time
+import zlib
+
+import pytest
+
+from services.pdf_extraction import (
+    ENGINES,
+    EngineDeclined,
+    ExtractionEngine,
+    FastPathEngine,
+    PdfExtractionError,
+    PdfExtractor,
+)
+from tests.test_s3_processor import make_pdf
+
+
+class FailingEngine(ExtractionEngine):
+    name = "failing"
+
+    def extract(self, source, max_pages=None, max_chars=None):
+        raise ValueError("broken xref table")
+
+
+class SlowEngine(ExtractionEngine):
+    name = "slow"
+
+    def extract(self, source, max_pages=None, max_chars=None):
+        time.sleep(30)
+        return "too late"
+
+
+class GreedyEngine(ExtractionEngine):
+    name = "greedy"
+
+    def extract(self, source, max_pages=None, max_chars=None):
+        return str(len(bytearray(1024 ** 3)))
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "article.pdf"
+    path.write_bytes(make_pdf("Bitcoin rallies", "Ether follows"))
+    return str(path)
+
+
+def test_extraction_stops_at_page_and_character_caps():
+    """Test that only the capped prefix of a long PDF is extracted."""
+    pdf = make_pdf(*[f"Page {i} text" for i in range(20)])
+
+    for engine in ("fast", "pypdf2"):
+        assert "Page 2" in ENGINES[engine].extract(pdf, max_pages=3)
+        assert "Page 3" not in ENGINES[engine].extract(pdf, max_pages=3)
+        assert len(ENGINES[engine].extract(pdf, max_chars=25)) == 25
+
+
+def test_fast_path_decodes_escapes_and_flate_streams():
+    """Test literal string escapes and a compressed content stream."""
+    assert ENGINES["fast"].extract(make_pdf(r"Ether \(ETH\) up 5\045")) == "Ether (ETH) up 5%"
+
+    stream = zlib.compress(b"BT /F1 12 Tf 72 720 Td (Solana) Tj T* <4441> Tj ET")
+    pdf = f"%PDF-1.4\n4 0 obj\n<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() + stream + b"\nendstream\nendobj\n"
+    assert ENGINES["fast"].extract(pdf) == "Solana\nDA"
+
+
+def test_fast_path_declines_fonts_that_need_decoding():
+    """Test that composite fonts are left to a full parser."""
+    pdf = make_pdf("Bitcoin").replace(b"/Subtype /Type1", b"/Subtype /Type0")
+
+    with pytest.raises(EngineDeclined):
+        ENGINES["fast"].extract(pdf)
+
+
+@pytest.mark.parametrize("font", [
+    b"/Subtype /Type1 /BaseFont /Helvetica /Encoding << /Differences [65 /B] >>",
+    b"/Subtype /Type1 /BaseFont /Helvetica /Encoding /MacRomanEncoding",
+    b"/Subtype /Type1 /BaseFont /Helvetica /Encoding 9 0 R",
+])
+def test_fast_path_declines_custom_encodings(font):
+    """Test that re-encoded simple fonts fall through instead of yielding wrong text."""
+    pdf = make_pdf("Bitcoin").replace(b"/Subtype /Type1 /BaseFont /Helvetica", font)
+
+    with pytest.raises(EngineDeclined):
+        ENGINES["fast"].extract(pdf)
+
+
+def test_fast_path_reads_standard_encodings_and_declines_large_documents():
+    """Test the WinAnsi case, and that only PDF_FAST_PATH_MAX_MB is ever read."""
+    pdf = make_pdf("Bitcoin").replace(b"/BaseFont /Helvetica", b"/BaseFont /Helvetica /Encoding /WinAnsiEncoding")
+    assert ENGINES["fast"].extract(pdf) == "Bitcoin"
+
+    with pytest.raises(EngineDeclined):
+        FastPathEngine(max_bytes=len(pdf) - 1).extract(pdf)
+
+
+def test_falls_back_in_order_and_records_attempts(pdf_path):
+    """Test that a failing engine hands the document to the next one."""
+    extractor = PdfExtractor(engines=["fast"], isolated=False)
+    extractor.engines = [FailingEngine(), ENGINES["fast"]]
+
+    result = extractor.extract(pdf_path)
+
+    assert result["engine"] == "fast"
+    assert "Bitcoin rallies" in result["text"]
+    assert [attempt["engine"] for attempt in result["attempts"]] == ["failing", "fast"]
+    assert "broken xref table" in result["attempts"][0]["error"]
+    assert result["total_seconds"] >= result["attempts"][-1]["seconds"]
+
+
+def test_empty_text_counts_as_failure(tmp_path):
+    """Test that a document without text raises instead of returning ''."""
+    path = tmp_path / "blank.pdf"
+    path.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    extractor = PdfExtractor(engines=["fast"], isolated=False)
+
+    with pytest.raises(PdfExtractionError, match="no text found"):
+        extractor.extract(str(path))
+
+
+def test_isolated_attempt_is_killed_at_timeout(pdf_path):
+    """Test that a slow engine is stopped and the next engine is used."""
+    extractor = PdfExtractor(engines=["fast"], timeout=0.5, memory_mb=1024, isolated=True)
+    extractor.engines = [SlowEngine(), ENGINES["fast"]]
+
+    started = time.perf_counter()
+    result = extractor.extract(pdf_path)
+
+    assert time.perf_counter() - started < 10
+    assert result["engine"] == "fast"
+    assert "timed out" in result["attempts"][0]["error"]
+
+
+def test_isolated_attempt_is_capped_in_memory(pdf_path):
+    """Test that an engine exceeding the memory limit fails alone."""
+    extractor = PdfExtractor(engines=["fast"], timeout=10, memory_mb=256, isolated=True)
+    extractor.engines = [GreedyEngine(), ENGINES["fast"]]
+
+    result = extractor.extract(pdf_path)
+
+    assert result["engine"] == "fast"
+    assert result["attempts"][0]["error"] == "memory limit exceeded"
+
+
+def test_unknown_engine_is_rejected():
+    """Test that a misconfigured engine list fails fast."""
+    with pytest.raises(ValueError, match="pdfminer"):
+        PdfExtractor(engines=["pypdf2", "pdfminer"])
@@ -0,0 +1,120 @@
+"""
+Tests for the continuous ingest -> analyze pipeline.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import NewsArticle
+from services.pipeline import SourcePoller, StreamingPipeline
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def one_shot_source(name, batches):
+    """A source whose polls return the given id lists, then nothing."""
+    remaining = list(batches)
+    return SourcePoller(name, 0.02, lambda: remaining.pop(0) if remaining else [], jitter=0.0)
+
+
+class RecordingStage:
+    """Sentiment stage stand-in that records the ids it was given."""
+
+    def __init__(self, gate: threading.Event = None, fail_first: bool = False):
+        self.gate = gate
+        self.fail_first = fail_first
+        self.seen = []
+        self.calls = 0
+
+    def __call__(self, article_ids):
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail_first and self.calls == 1:
+            raise RuntimeError("database unavailable")
+        self.seen.extend(article_ids)
+        created = datetime.now() - timedelta(seconds=2)
+        return [NewsArticle(id=article_id, title="t", created_at=created, published_at=created) for article_id in article_ids]
+
+
+def test_polled_articles_are_analyzed_with_lag_metrics():
+    """Test that ids from every source reach the stage once and lag is reported."""
+    stage = RecordingStage()
+    pipeline = StreamingPipeline(
+        sources=[one_shot_source("coingecko", [[1, 2], [3]]), one_shot_source("s3", [[4, 2]])],
+        analyze=stage,
+        batch_wait=0.01
+    )
+
+    pipeline.start()
+    assert wait_for(lambda: len(stage.seen) >= 4)
+    assert pipeline.stop() is True
+
+    stats = pipeline.stats()
+    assert sorted(set(stage.seen)) == [1, 2, 3, 4]
+    assert stats["running"] is False
+    assert stats["sentiment"]["analyzed"] == len(stage.seen)
+    assert stats["lag"]["ingest"]["samples"] == len(stage.seen)
+    assert stats["lag"]["ingest"]["p50_seconds"] >= 2
+    assert stats["sources"]["coingecko"]["articles"] == 3
+    assert stats["sources"]["s3"]["runs"] >= 1
+
+
+def test_full_queue_blocks_pollers_until_the_stage_catches_up():
+    """Test backpressure: a bounded queue holds producers back instead of growing."""
+    gate = threading.Event()
+    stage = RecordingStage(gate=gate)
+    pipeline = StreamingPipeline(
+        sources=[one_shot_source("s3", [list(range(1, 11))])],
+        analyze=stage,
+        queue_size=2,
+        batch_size=2,
+        batch_wait=0.0
+    )
+
+    pipeline.start()
+    assert wait_for(lambda: pipeline.stats()["queue"]["producer_blocks"] >= 1)
+    assert pipeline.stats()["queue"]["depth"] <= 2
+
+    gate.set()
+    assert wait_for(lambda: len(stage.seen) == 10)
+    pipeline.stop()
+
+    assert stage.seen == list(range(1, 11))
+    assert pipeline.stats()["queue"]["producer_blocked_seconds"] > 0
+
+
+def test_stop_drains_queued_articles():
+    """Test that stopping lets the stage finish what is already queued."""
+    stage = RecordingStage()
+    pipeline = StreamingPipeline(sources=[], analyze=stage, batch_size=1, batch_wait=0.0)
+    pipeline.enqueue("test", [1, 2, 3, 3])
+
+    pipeline.start()
+    assert pipeline.stop() is True
+
+    assert stage.seen == [1, 2, 3]
+    assert pipeline.stats()["queue"]["duplicates"] == 1
+
+
+def test_failed_batch_is_counted_and_the_stage_keeps_going():
+    """Test that a failing batch is reported and later batches still run."""
+    stage = RecordingStage(fail_first=True)
+    pipeline = StreamingPipeline(sources=[], analyze=stage, batch_size=1, batch_wait=0.0)
+    pipeline.enqueue("test", [1, 2])
+
+    pipeline.start()
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    assert stage.seen == [2]
+    assert stats["sentiment"]["errors"] == 1
+    assert stats["sentiment"]["last_error"] == "database unavailable"
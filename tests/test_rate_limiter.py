@@ -0,0 +1,125 @@
+"""
+Tests for the shared rate limiter and retry/backoff helpers.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from botocore.exceptions import ClientError
+
+from services.rate_limiter import (
+    TokenBucket,
+    async_retry_with_backoff,
+    get_retry_after,
+    is_retryable_error,
+    retry_with_backoff,
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def bedrock_error(code, retry_after=None):
+    """Build a botocore ClientError with an optional Retry-After header."""
+    headers = {"retry-after": retry_after} if retry_after else {}
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPHeaders": headers}},
+        "InvokeModel"
+    )
+
+
+def http_error(status, retry_after=None):
+    """Build an httpx HTTPStatusError for the given status code."""
+    headers = {"Retry-After": retry_after} if retry_after else {}
+    request = httpx.Request("GET", "https://api.coingecko.com/api/v3/ping")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_token_bucket_spaces_out_reservations():
+    """Test that callers beyond the burst are told to wait their turn."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    clock.now = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_adjust_refunds_unused_tokens():
+    """Test settling a token reservation with the real usage."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=100.0, capacity=1000.0, clock=clock)
+
+    assert bucket.reserve(1500) == pytest.approx(5.0)
+    bucket.adjust(-1000)  # only 500 tokens were actually used
+    assert bucket.reserve(500) == 0.0
+
+
+def test_retryable_errors_and_retry_after():
+    """Test throttling classification and Retry-After parsing."""
+    assert is_retryable_error(bedrock_error("ThrottlingException"))
+    assert not is_retryable_error(bedrock_error("ValidationException"))
+    assert is_retryable_error(http_error(429))
+    assert not is_retryable_error(http_error(404))
+
+    assert get_retry_after(bedrock_error("ThrottlingException", "3")) == 3.0
+    assert get_retry_after(http_error(429, "7")) == 7.0
+
+
+def test_retry_with_backoff_honours_retry_after():
+    """Test that retries wait at least as long as the server asked."""
+    delays = []
+    errors = [http_error(429, "2"), bedrock_error("ThrottlingException")]
+
+    def flaky():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    result = retry_with_backoff(flaky, base_delay=0.01, sleep=delays.append)
+
+    assert result == "ok"
+    assert len(delays) == 2
+    assert delays[0] >= 2.0
+
+
+def test_retry_with_backoff_does_not_retry_client_errors():
+    """Test that non-throttling errors are raised immediately."""
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise bedrock_error("ValidationException")
+
+    with pytest.raises(ClientError):
+        retry_with_backoff(invalid, sleep=lambda delay: None)
+    assert len(calls) == 1
+
+
+def test_async_retry_with_backoff_gives_up_after_max_attempts():
+    """Test the async variant re-raises once attempts are exhausted."""
+    calls = []
+
+    async def throttled():
+        calls.append(1)
+        raise http_error(503)
+
+    async def no_sleep(delay):
+        return None
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(async_retry_with_backoff(throttled, max_attempts=3, sleep=no_sleep))
+    assert len(calls) == 3
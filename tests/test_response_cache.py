@@ -0,0 +1,187 @@
+"""
+Tests for the outbound API response cache.
+"""
+
+import asyncio
+
+import pytest
+
+from services.response_cache import FetchResult, ResponseCache, parse_ttls
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUpstream:
+    """Fetcher that counts calls, records validators and answers 304 when asked."""
+
+    def __init__(self, etag='"v1"', delay=0.0):
+        self.calls = 0
+        self.validators = []
+        self.etag = etag
+        self.delay = delay
+        self.version = 1
+
+    async def __call__(self, validators):
+        self.calls += 1
+        self.validators.append(validators)
+        await asyncio.sleep(self.delay)
+        if self.etag and validators.get("If-None-Match") == self.etag:
+            return FetchResult(not_modified=True)
+        return FetchResult(data={"version": self.version}, etag=self.etag)
+
+
+def test_parse_ttls_and_endpoint_matching():
+    """Test that the first matching endpoint pattern sets the TTL."""
+    cache = ResponseCache(default_ttl=60, endpoint_ttls=parse_ttls("/search/trending=300, /coins/*/news=120"))
+
+    assert cache.ttl_for("/search/trending") == 300
+    assert cache.ttl_for("/coins/bitcoin/news") == 120
+    assert cache.ttl_for("/simple/price") == 60
+
+
+def test_fresh_entries_are_served_without_requests():
+    """Test a miss followed by hits within the TTL."""
+    clock = FakeClock()
+    cache = ResponseCache(default_ttl=60, clock=clock)
+    upstream = FakeUpstream()
+
+    async def run():
+        first = await cache.get("/search/trending", {}, upstream)
+        clock.now = 59
+        second = await cache.get("/search/trending", {}, upstream)
+        return first, second
+
+    assert asyncio.run(run()) == ({"version": 1}, {"version": 1})
+    assert upstream.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_stale_entry_is_served_while_revalidating_with_etag():
+    """Test stale-while-revalidate with a conditional request answered by 304."""
+    clock = FakeClock()
+    cache = ResponseCache(default_ttl=60, stale_seconds=300, clock=clock)
+    upstream = FakeUpstream()
+
+    async def run():
+        await cache.get("/search/trending", {}, upstream)
+        clock.now = 100
+        stale = await cache.get("/search/trending", {}, upstream)
+        await asyncio.sleep(0.01)  # let the background refresh finish
+        clock.now = 150
+        fresh = await cache.get("/search/trending", {}, upstream)
+        return stale, fresh
+
+    assert asyncio.run(run()) == ({"version": 1}, {"version": 1})
+    assert upstream.calls == 2
+    assert upstream.validators[1] == {"If-None-Match": '"v1"'}
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1 and stats["revalidated"] == 1 and stats["hits"] == 1
+
+
+def test_expired_entry_past_stale_window_is_refetched():
+    """Test that a caller waits for the refresh once the stale window has passed."""
+    clock = FakeClock()
+    cache = ResponseCache(default_ttl=60, stale_seconds=30, clock=clock)
+    upstream = FakeUpstream(etag=None)
+
+    async def run():
+        await cache.get("/coins/bitcoin/news", {}, upstream)
+        upstream.version = 2
+        clock.now = 100
+        return await cache.get("/coins/bitcoin/news", {}, upstream)
+
+    assert asyncio.run(run()) == {"version": 2}
+    assert upstream.calls == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    """Test that identical concurrent requests share one upstream call."""
+    cache = ResponseCache(default_ttl=60)
+    upstream = FakeUpstream(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.get("/search/trending", {"page": 1}, upstream) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert results == [{"version": 1}] * 10
+    assert upstream.calls == 1
+    assert cache.stats()["coalesced"] == 9
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached():
+    """Test that an upstream error is raised to coalesced callers and retried next time."""
+    cache = ResponseCache(default_ttl=60)
+    calls = []
+
+    async def failing(validators):
+        calls.append(validators)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get("/search/trending", {}, failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 1
+    with pytest.raises(ConnectionError):
+        asyncio.run(cache.get("/search/trending", {}, failing))
+    assert len(calls) == 2
+
+
+def test_waiters_fetch_themselves_when_the_owner_is_cancelled():
+    """Test that cancelling the caller that owns a request does not strand coalesced callers."""
+    cache = ResponseCache(default_ttl=60)
+    upstream = FakeUpstream(delay=0.05)
+
+    async def run():
+        owner = asyncio.ensure_future(cache.get("/search/trending", {}, upstream))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.get("/search/trending", {}, upstream))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await asyncio.wait_for(waiter, timeout=1), owner.cancelled()
+
+    result, owner_cancelled = asyncio.run(run())
+
+    assert result == {"version": 1}
+    assert owner_cancelled
+    assert upstream.calls == 2
+
+
+def test_zero_ttl_disables_caching():
+    """Test that endpoints with no TTL always go upstream."""
+    cache = ResponseCache(default_ttl=0)
+    upstream = FakeUpstream()
+
+    async def run():
+        await cache.get("/simple/price", {}, upstream)
+        await cache.get("/simple/price", {}, upstream)
+
+    asyncio.run(run())
+    assert upstream.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_bound_on_entries():
+    """Test that the least recently used entry is dropped at the cap."""
+    cache = ResponseCache(default_ttl=60, max_entries=2)
+    upstream = FakeUpstream()
+
+    async def run():
+        for page in (1, 2, 1, 3):
+            await cache.get("/coins/markets", {"page": page}, upstream)
+
+    asyncio.run(run())
+    assert cache.stats()["entries"] == 2
+    assert ResponseCache.make_key("/coins/markets", {"page": 2}) not in cache._entries
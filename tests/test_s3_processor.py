@@ -0,0 +1,268 @@
+"""
+Tests for the S3 PDF processor.
+"""
+
+import io
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from services.job_manager import Job
+from sqlalchemy.dialects import postgresql
+
+from services.s3_processor import ByteBudget, S3Processor
+
+
+def make_pdf(*pages):
+    """Build a minimal valid PDF with one line of text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R /Resources << /Font << /F1 3 0 R >> >> >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return output
+
+
+class FakeS3Client:
+    """get_object stand-in serving PDFs from a dict."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            self.calls += 1
+        if Key not in self.objects:
+            raise KeyError(Key)
+        body = self.objects[Key]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": f'"etag-{Key}"'}
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(self.objects)
+        for start in range(0, len(keys), 2):
+            yield {"Contents": [
+                {"Key": key, "ETag": f'"etag-{key}"', "Size": len(self.objects[key]), "LastModified": datetime(2025, 9, 30, tzinfo=timezone.utc)}
+                for key in keys[start:start + 2]
+            ]}
+
+
+@pytest.fixture
+def processor(monkeypatch, tmp_path):
+    """Create a processor with fake credentials, two extraction workers and a private text cache."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("S3_DOWNLOAD_WORKERS", "4")
+    monkeypatch.setenv("S3_EXTRACT_WORKERS", "2")
+    monkeypatch.setenv("S3_INCREMENTAL", "false")
+    monkeypatch.setenv("PDF_TEXT_CACHE_DIR", str(tmp_path / "text-cache"))
+    monkeypatch.setenv("COINGECKO_COIN_REGISTRY_PATH", str(tmp_path / "coins.json"))
+    return S3Processor()
+
+
+def article_configs(count):
+    return [
+        {"title": f"Article {i}", "s3_key": f"article-{i}.pdf", "source": "Test", "published_date": "2025-09-30", "tokens": ["BTC"]}
+        for i in range(count)
+    ]
+
+
+def test_sequential_processing_spools_and_reports_rss(processor):
+    """Test the streaming download and extraction of one article."""
+    config = article_configs(1)[0]
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf("Spooled body")})
+    processor.download_chunk_bytes = 64
+
+    article = processor.process_single_article(config)
+
+    assert "Spooled body" in article.content
+    assert article.extraction_engine == "fast"
+    assert article.extraction_seconds is not None
+
+
+def test_pdf_tokens_include_coins_mentioned_in_text(processor):
+    """Test that tokens found in the PDF text are added to the configured ones."""
+    config = article_configs(1)[0]
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf("Solana and ETH rallied in the UNITED States")})
+
+    article = processor.process_single_article(config)
+
+    assert article.tokens_mentioned == ["BTC", "SOL", "ETH"]
+
+
+def test_pipelined_processing_keeps_order_and_reports_stages(processor, tmp_path):
+    """Test the download/extract pipeline end to end."""
+    configs = article_configs(6)
+    processor.news_sources = {"s3_bucket": "source-bucket", "articles": configs}
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf(f"Body {i}") for i, config in enumerate(configs)})
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    processor.spool_dir = str(spool)
+    job = Job("process_s3")
+
+    articles = processor.process_all_articles(job=job)
+
+    assert [article.title for article in articles] == [config["title"] for config in configs]
+    assert all(f"Body {i}" in article.content for i, article in enumerate(articles))
+    assert job.items_done == 6 and job.error_count == 0
+    report = processor.last_pipeline_report
+    assert report["stages"]["download"]["items"] == 6
+    assert report["stages"]["extract"]["items"] == 6
+    assert report["stages"]["extract"]["peak_rss_mb"] > 0
+    assert report["engines"] == {"fast": 6}
+    assert list(spool.iterdir()) == []  # spool files are removed after extraction
+
+
+def test_unreadable_pdf_fails_instead_of_storing_empty_text(processor):
+    """Test that a document no engine can read is reported, not sent on with empty content."""
+    configs = article_configs(2)
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({"article-0.pdf": make_pdf("Readable"), "article-1.pdf": b"not a pdf"})
+    job = Job("process_s3")
+
+    articles = processor.process_all_articles(job=job)
+
+    assert [article.title for article in articles] == ["Article 0"]
+    assert job.error_count == 1
+    assert processor.last_pipeline_report["stages"]["extract"]["errors"] == 1
+
+
+def test_pipelined_processing_records_failed_downloads(processor):
+    """Test that one missing object fails alone."""
+    configs = article_configs(3)
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({"article-0.pdf": make_pdf("One"), "article-2.pdf": make_pdf("Three")})
+    job = Job("process_s3")
+
+    articles = processor.process_all_articles(job=job)
+
+    assert [article.title for article in articles] == ["Article 0", "Article 2"]
+    assert job.items_done == 3 and job.error_count == 1
+
+
+def test_byte_budget_blocks_until_released():
+    """Test backpressure between download and extraction."""
+    budget = ByteBudget(limit=100)
+    assert budget.acquire(80)
+
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: budget.acquire(50) and acquired.set())
+    waiter.start()
+    assert not acquired.wait(0.1)
+
+    budget.release(80)
+    assert acquired.wait(1.0)
+    waiter.join()
+    assert budget.peak == 80
+
+
+def test_byte_budget_admits_oversized_object_alone():
+    """Test that an object larger than the budget cannot deadlock the pipeline."""
+    budget = ByteBudget(limit=10)
+    assert budget.acquire(50)
+    budget.release(50)
+    budget.close()
+    assert not budget.acquire(1)
+
+
+def test_incremental_mode_skips_unchanged_objects(processor, monkeypatch):
+    """Test that only new or changed objects are downloaded."""
+    configs = article_configs(4)
+    processor.incremental = True
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf(config["title"]) for config in configs[:3]})
+    monkeypatch.setattr(processor, "_load_ingestion_state", lambda bucket: {
+        "article-0.pdf": "etag-article-0.pdf",  # unchanged
+        "article-1.pdf": "stale-etag",  # changed
+    })
+    job = Job("process_s3")
+
+    articles = processor.process_all_articles(job=job)
+
+    assert [article.s3_key_source for article in articles] == ["article-1.pdf", "article-2.pdf"]
+    assert processor.s3_client.calls == 2
+    assert job.error_count == 1  # article-3.pdf is not in the bucket
+    assert set(processor._pending_state) == {"article-1.pdf", "article-2.pdf"}
+
+
+def test_unchanged_bucket_downloads_nothing(processor, monkeypatch):
+    """Test that a re-run over an unchanged bucket makes no GETs."""
+    configs = article_configs(5)
+    processor.incremental = True
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({config["s3_key"]: b"" for config in configs})
+    monkeypatch.setattr(processor, "_load_ingestion_state", lambda bucket: {
+        config["s3_key"]: f"etag-{config['s3_key']}" for config in configs
+    })
+
+    assert processor.process_all_articles() == []
+    assert processor.s3_client.calls == 0
+
+
+def test_warm_reingestion_uses_cached_text(processor, tmp_path):
+    """Test that a second run over unchanged objects makes no GETs and parses nothing."""
+    configs = article_configs(3)
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf(config["title"]) for config in configs})
+    processor.process_all_articles()
+    assert processor.s3_client.calls == 3
+
+    # A fresh processor, as after a redeploy, shares the on-disk cache
+    processor = S3Processor()
+    processor.news_sources = {"articles": configs}
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf(config["title"]) for config in configs})
+    articles = processor.process_all_articles()
+
+    assert processor.s3_client.calls == 0
+    assert [article.content for article in articles] == ["Article 0", "Article 1", "Article 2"]
+    assert processor.text_cache.stats()["hits"] == 3
+
+
+def test_single_article_checks_text_cache_first(processor):
+    """Test that process_single_article skips the download on a cache hit."""
+    config = article_configs(1)[0]
+    processor.s3_client = FakeS3Client({config["s3_key"]: make_pdf("Cached body")})
+    processor._listed_objects = processor._list_source_objects("bucket")
+
+    assert "Cached body" in processor.process_single_article(config).content
+    assert "Cached body" in processor.process_single_article(config).content
+    assert processor.s3_client.calls == 1
+
+
+def test_text_cache_key_changes_with_extraction_caps(processor):
+    """Test that raising the caps does not serve text extracted under the old ones."""
+    key = processor._text_cache_key("etag")
+    processor.max_chars = 50000
+    assert processor._text_cache_key("etag") != key
+
+
+def test_state_upsert_is_a_single_statement(processor):
+    """Test that ingestion state is written with one INSERT ... ON CONFLICT."""
+    processor._pending_state = {
+        "a.pdf": {"etag": "1", "last_modified": None, "size": 10},
+        "b.pdf": {"etag": "2", "last_modified": None, "size": 20},
+    }
+    sql = str(processor._build_state_upsert("bucket", ["a.pdf", "b.pdf"]).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO s3_ingestion_state") == 1
+    assert "ON CONFLICT (bucket, key) DO UPDATE" in sql
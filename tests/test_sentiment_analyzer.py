@@ -0,0 +1,426 @@
+"""
+Tests for the Bedrock sentiment analyzer.
+"""
+
+import io
+import json
+import threading
+from datetime import datetime
+
+import pytest
+from botocore.exceptions import ClientError
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from models import NewsArticle, SentimentCacheEntry
+from services.lexicon_classifier import LexiconClassifier
+from services.rate_limiter import ServiceLimiter
+from services.sentiment_analyzer import AdaptiveConcurrencyLimiter, SentimentAnalyzer
+from services.sentiment_cache import SentimentCache
+
+
+def bedrock_response(payload, request=None):
+    """Build an invoke_model response carrying the given JSON payload.
+
+    Like the real API, an assistant prefill is not repeated in the output and
+    a matched stop sequence is reported instead of being emitted.
+    """
+    text = json.dumps(payload)
+    body = {"stop_reason": "end_turn", "usage": {"input_tokens": 100, "output_tokens": len(text) // 4}}
+
+    request = request or {}
+    last_message = request.get("messages", [{}])[-1]
+    if last_message.get("role") == "assistant":
+        text = text[len(last_message["content"]):]
+    for stop in request.get("stop_sequences", []):
+        if stop in text:
+            text = text[:text.index(stop)]
+            body.update(stop_reason="stop_sequence", stop_sequence=stop)
+            break
+
+    body["content"] = [{"type": "text", "text": text}]
+    return {"body": io.BytesIO(json.dumps(body).encode())}
+
+
+def request_text(request):
+    """System and user text of an invoke_model request body."""
+    system = " ".join(block["text"] for block in request.get("system", []))
+    return system + "\n" + request["messages"][0]["content"]
+
+
+def throttling_error():
+    """Build the ClientError Bedrock raises when throttling."""
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}},
+        "InvokeModel"
+    )
+
+
+class FakeBedrockClient:
+    """Minimal bedrock-runtime stand-in that records concurrency."""
+
+    def __init__(self, throttle_first=0, fail_titles=()):
+        self.throttle_first = throttle_first
+        self.fail_titles = set(fail_titles)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, contentType):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            throttle = self.calls <= self.throttle_first
+        try:
+            if throttle:
+                raise throttling_error()
+            request = json.loads(body)
+            if any(title in request_text(request) for title in self.fail_titles):
+                raise RuntimeError("model error")
+            return bedrock_response({
+                "sentiment": "bullish",
+                "confidence_score": 0.9,
+                "reasoning": "test",
+                "tokens_mentioned": ["BTC"]
+            }, request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    """Create an analyzer with fake credentials and no retry backoff."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("BEDROCK_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("SENTIMENT_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PRECLASSIFIER_ENABLED", "false")
+    monkeypatch.setenv("BEDROCK_RETRY_BASE_DELAY", "0")
+    sentiment_analyzer = SentimentAnalyzer()
+    sentiment_analyzer.rate_limiter = ServiceLimiter("bedrock", requests_per_second=1000, burst=1000)
+    return sentiment_analyzer
+
+
+def make_articles(count):
+    """Create unsaved articles with distinct titles."""
+    return [NewsArticle(id=i, title=f"Article {i}", content="Bitcoin rallies") for i in range(count)]
+
+
+def test_adaptive_limiter_backs_off_and_recovers():
+    """Test AIMD behaviour of the concurrency limiter."""
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=8, cooldown=0)
+
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_throttle()
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        limiter.on_success()
+    assert limiter.limit == 3
+    assert limiter.throttle_count == 2
+
+
+def test_analyze_articles_concurrent_updates_every_article(analyzer):
+    """Test that concurrent analysis fills in each article."""
+    analyzer.bedrock_client = FakeBedrockClient()
+    articles = make_articles(12)
+
+    result = analyzer.analyze_articles_concurrent(articles)
+
+    assert result == articles
+    assert all(article.sentiment == "bullish" for article in articles)
+    assert all(article.tokens_mentioned == ["BTC"] for article in articles)
+    assert analyzer.bedrock_client.max_in_flight <= 4
+
+
+def test_analyze_articles_batch_runs_concurrently(analyzer):
+    """Test that the batch entry point takes the concurrent path."""
+    analyzer.bedrock_client = FakeBedrockClient()
+    articles = make_articles(12)
+    batches = []
+    run = analyzer._run_with_adaptive_concurrency
+    analyzer._run_with_adaptive_concurrency = lambda func, items: batches.append(items) or run(func, items)
+
+    assert analyzer.analyze_articles_batch(articles) == articles
+    assert batches == [articles]
+    assert all(article.sentiment == "bullish" for article in articles)
+
+
+def test_analyze_articles_concurrent_retries_throttled_calls(analyzer):
+    """Test that throttled calls are retried and lower the concurrency limit."""
+    analyzer.bedrock_client = FakeBedrockClient(throttle_first=3)
+    articles = make_articles(6)
+
+    analyzer.analyze_articles_concurrent(articles)
+
+    assert all(article.sentiment == "bullish" for article in articles)
+    assert analyzer.concurrency.throttle_count >= 1
+    assert analyzer.bedrock_client.calls == 9
+
+
+def test_throttled_call_is_retried_by_one_layer_only(analyzer):
+    """Test that a call that stays throttled is tried BEDROCK_MAX_RETRIES + 1 times, each seen once."""
+    analyzer.bedrock_client = FakeBedrockClient(throttle_first=100)
+    articles = make_articles(1)
+
+    analyzer.analyze_articles_concurrent(articles)
+
+    assert articles[0].sentiment == "neutral"
+    assert analyzer.bedrock_client.calls == analyzer.max_retries + 1
+    assert analyzer.concurrency.throttle_count == analyzer.max_retries + 1
+
+
+def test_analyze_articles_concurrent_reports_failures_like_analyze_article(analyzer):
+    """Test that a failed call falls back to neutral/0.5 for that article only."""
+    analyzer.bedrock_client = FakeBedrockClient(fail_titles=["Article 1"])
+    articles = make_articles(3)
+
+    analyzer.analyze_articles_concurrent(articles)
+
+    assert articles[1].sentiment == "neutral"
+    assert articles[1].confidence_score == 0.5
+    assert articles[0].sentiment == "bullish"
+    assert articles[2].sentiment == "bullish"
+
+
+def test_cached_result_skips_bedrock(analyzer):
+    """Test that identical prompt inputs are only sent to Bedrock once."""
+    engine = create_engine("sqlite://")
+    SentimentCacheEntry.__table__.create(engine)
+    analyzer.cache = SentimentCache(session_factory=sessionmaker(bind=engine))
+    analyzer.bedrock_client = FakeBedrockClient()
+
+    first = analyzer.analyze_sentiment("Same title", "Same content")
+    second = analyzer.analyze_sentiment("Same title", "Same content")
+
+    assert first == second
+    assert analyzer.bedrock_client.calls == 1
+    assert analyzer.cache.stats()["hits"] == 1
+
+
+class FakePackedBedrockClient(FakeBedrockClient):
+    """Bedrock stand-in that answers packed prompts, breaking one entry."""
+
+    def __init__(self, malformed_id=None):
+        super().__init__()
+        self.malformed_id = malformed_id
+        self.packed_calls = 0
+
+    def invoke_model(self, modelId, body, contentType):
+        request = json.loads(body)
+        prompt = request_text(request)
+        if "JSON array" not in prompt:
+            return super().invoke_model(modelId, body, contentType)
+
+        with self._lock:
+            self.calls += 1
+            self.packed_calls += 1
+        ids = [int(line.split()[1]) for line in prompt.splitlines() if line.startswith("Article ")]
+        entries = [
+            {"id": item_id, "sentiment": "bearish", "confidence_score": 0.7, "tokens_mentioned": ["eth"]}
+            if item_id != self.malformed_id else {"id": item_id, "sentiment": "very bad"}
+            for item_id in ids
+        ]
+        return bedrock_response(entries, request)
+
+
+def test_build_packs_respects_pack_size_and_token_budget(analyzer):
+    """Test that packs never exceed the configured size or token budget."""
+    analyzer.pack_size = 3
+    articles = make_articles(7)
+    assert [len(pack) for pack in analyzer._build_packs(articles)] == [3, 3, 1]
+
+    analyzer.pack_size = 10
+    analyzer.pack_token_budget = analyzer._estimate_tokens(analyzer._create_packed_prompt([])) + 30
+    assert all(len(pack) <= 2 for pack in analyzer._build_packs(articles))
+
+
+def test_parse_packed_response_drops_malformed_entries(analyzer):
+    """Test that only well-formed, expected entries are mapped back."""
+    response = json.dumps([
+        {"id": 1, "sentiment": "bullish", "confidence_score": 0.8, "tokens_mentioned": ["btc"]},
+        {"id": 2, "sentiment": "sideways", "confidence_score": 0.8},
+        {"id": 3, "sentiment": "bearish", "confidence_score": "high"},
+        {"id": 9, "sentiment": "bullish", "confidence_score": 0.8},
+    ])
+
+    results = analyzer._parse_packed_response(f"Here you go: {response}", [1, 2, 3])
+
+    assert list(results) == [1]
+    assert results[1]["tokens_mentioned"] == ["BTC"]
+
+
+def test_analyze_articles_packed_retries_only_malformed_article(analyzer):
+    """Test packed analysis with a single malformed entry."""
+    analyzer.pack_size = 5
+    analyzer.bedrock_client = FakePackedBedrockClient(malformed_id=2)
+    articles = make_articles(5)
+
+    analyzer.analyze_articles_packed(articles)
+
+    assert analyzer.bedrock_client.packed_calls == 1
+    assert analyzer.bedrock_client.calls == 2
+    assert articles[1].sentiment == "bullish"  # answered by the single-article retry
+    assert all(articles[i].sentiment == "bearish" for i in (0, 2, 3, 4))
+
+
+def test_preclassified_articles_skip_bedrock(analyzer):
+    """Test that confident pre-classifier results never reach Bedrock."""
+    analyzer.preclassifier = LexiconClassifier(threshold=0.85)
+    analyzer.bedrock_client = FakePackedBedrockClient()
+    articles = [
+        NewsArticle(id=1, title="Trending: Pepe (PEPE)", content="Coin Pepe is trending with rank #30"),
+        NewsArticle(id=2, title="Weekly market wrap", content="Prices moved today."),
+    ]
+
+    analyzer.analyze_articles_packed(articles)
+
+    assert articles[0].sentiment == "neutral"
+    assert articles[0].tokens_mentioned == ["PEPE"]
+    assert articles[1].sentiment == "bearish"
+    assert analyzer.bedrock_client.calls == 1
+    assert analyzer.preclassifier.stats()["calls_saved"] == 1
+
+
+def test_analyze_all_articles_commits_each_chunk_before_reading_next(analyzer, monkeypatch):
+    """Test the streaming, chunk-at-a-time commit order."""
+    import services.sentiment_analyzer as sentiment_module
+
+    events = []
+    chunks = [make_articles(2), make_articles(2)]
+
+    def fake_chunks(chunk_size):
+        for number, chunk in enumerate(chunks):
+            events.append(f"read {number}")
+            yield chunk
+
+    def fake_update(self, articles):
+        events.append("commit")
+        return len(articles)
+
+    monkeypatch.setattr(sentiment_module, "iter_unanalyzed_chunks", fake_chunks)
+    monkeypatch.setattr(SentimentAnalyzer, "analyze_articles", lambda self, articles: articles)
+    monkeypatch.setattr(SentimentAnalyzer, "update_articles_in_db", fake_update)
+
+    assert sentiment_module.analyze_all_articles(chunk_size=2) == 4
+    assert events == ["read 0", "commit", "read 1", "commit"]
+
+
+def test_near_duplicates_reuse_canonical_sentiment(analyzer, monkeypatch):
+    """Test that only originals and orphaned duplicates reach Bedrock."""
+    articles = make_articles(4)
+    articles[2].duplicate_of_id = 0
+    articles[3].duplicate_of_id = 99  # canonical article has no sentiment yet
+    analyzed_ids = []
+
+    def fake_analyze(self, batch):
+        analyzed_ids.append([article.id for article in batch])
+        return batch
+
+    monkeypatch.setattr(SentimentAnalyzer, "analyze_articles", fake_analyze)
+    monkeypatch.setattr(SentimentAnalyzer, "update_articles_in_db", lambda self, batch: len(batch))
+    monkeypatch.setattr(SentimentAnalyzer, "reuse_duplicate_sentiment", lambda self, batch: [articles[2]])
+
+    assert analyzer.analyze_and_store(articles) == 4
+    assert analyzed_ids == [[0, 1], [3]]
+
+
+def test_duplicate_sentiment_copy_is_a_single_statement(analyzer):
+    """Test that canonical sentiment is copied with one UPDATE ... FROM."""
+    sql = str(analyzer._build_duplicate_sentiment_copy([2, 3]).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("UPDATE news_articles") == 1
+    assert "FROM news_articles AS canonical" in sql
+    assert "RETURNING news_articles.id" in sql
+
+
+def test_build_sentiment_update_is_a_single_set_based_statement(analyzer):
+    """Test that a batch compiles to one UPDATE ... FROM (VALUES ...)."""
+    articles = make_articles(3)
+    for article in articles:
+        article.sentiment = "bullish"
+        article.confidence_score = 0.9
+        article.tokens_mentioned = ["BTC"]
+
+    sql = str(analyzer._build_sentiment_update(articles).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("UPDATE news_articles") == 1
+    assert "FROM (VALUES" in sql
+    assert sql.count("::VARCHAR[]") == 3
+
+
+def test_sentiment_update_replaces_locked_results_in_the_rollups(analyzer, monkeypatch):
+    """Test that old results come from rows locked before the UPDATE, not from the UPDATE itself."""
+    import services.sentiment_analyzer as sentiment_module
+    hour = datetime(2025, 10, 1, 9)
+    statements = []
+
+    class RecordingSession:
+        def execute(self, statement):
+            sql = str(statement.compile(dialect=postgresql.dialect()))
+            statements.append(sql)
+            if sql.startswith("SELECT"):
+                # What a writer that committed first left behind
+                return [(0, hour, "bullish", 0.9, ["BTC"]), (1, hour, None, None, None)]
+            return type("Result", (), {"all": lambda self: [(0, hour, "bearish", 0.6, ["BTC"]), (1, hour, "neutral", 0.5, [])]})()
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    applied = []
+    monkeypatch.setattr(sentiment_module, "SessionLocal", RecordingSession)
+    monkeypatch.setattr(sentiment_module, "apply_rollup_deltas", lambda db, added=(), removed=(): applied.append((added, removed)))
+
+    assert analyzer.update_articles_in_db(make_articles(2)) == 2
+
+    assert statements[0].startswith("SELECT") and statements[0].endswith("FOR UPDATE")
+    assert statements[1].startswith("UPDATE news_articles")
+    assert "previous" not in statements[1]
+    assert applied == [(
+        [(hour, "bearish", 0.6, ["BTC"]), (hour, "neutral", 0.5, [])],
+        [(hour, "bullish", 0.9, ["BTC"]), (hour, None, None, None)]
+    )]
+
+
+def test_compact_request_uses_prefill_stop_sequence_and_records_usage(analyzer):
+    """Test the compact request shape and usage accounting."""
+    requests = []
+
+    class RecordingClient(FakeBedrockClient):
+        def invoke_model(self, modelId, body, contentType):
+            requests.append(json.loads(body))
+            return super().invoke_model(modelId, body, contentType)
+
+    analyzer.bedrock_client = RecordingClient()
+    analyzer.prompt_caching = True
+
+    result = analyzer.analyze_sentiment("Bitcoin rallies", "Price is up")
+
+    request = requests[0]
+    assert result["sentiment"] == "bullish"
+    assert request["max_tokens"] == analyzer.max_output_tokens
+    assert request["messages"][-1] == {"role": "assistant", "content": "{"}
+    assert request["stop_sequences"] == ["}"]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "reasoning" not in request["system"][0]["text"]
+    assert analyzer.usage_stats()["requests"] == 1
+    assert analyzer.usage_stats()["input_tokens"] == 100
+
+
+def test_full_prompt_mode_is_still_available(analyzer):
+    """Test that compact responses can be switched off."""
+    analyzer.compact_responses = False
+    analyzer.bedrock_client = FakeBedrockClient()
+
+    assert analyzer.analyze_sentiment("Bitcoin rallies", "Price is up")["reasoning"] == "test"
@@ -0,0 +1,73 @@
+"""
+Tests for the persistent sentiment result cache.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import SentimentCacheEntry
+from services.sentiment_cache import SentimentCache
+
+RESULT = {"sentiment": "bearish", "confidence_score": 0.8, "reasoning": "test", "tokens_mentioned": ["ETH"]}
+
+
+@pytest.fixture
+def session_factory():
+    """Create an in-memory database holding only the cache table."""
+    engine = create_engine("sqlite://")
+    SentimentCacheEntry.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_make_key_depends_on_every_prompt_input():
+    """Test that the key changes with model, prompt version, title and content."""
+    base = SentimentCache.make_key("model", "v1", "Title", "Content")
+
+    assert base == SentimentCache.make_key("model", "v1", "Title", "Content")
+    assert base != SentimentCache.make_key("other-model", "v1", "Title", "Content")
+    assert base != SentimentCache.make_key("model", "v2", "Title", "Content")
+    assert base != SentimentCache.make_key("model", "v1", "Title2", "Content")
+    assert base != SentimentCache.make_key("model", "v1", "TitleC", "ontent")
+
+
+def test_get_and_put_track_hits_and_misses(session_factory):
+    """Test a miss, a store and a subsequent hit."""
+    cache = SentimentCache(session_factory=session_factory, max_entries=10, max_age_days=30, evict_every=100)
+    key = SentimentCache.make_key("model", "v1", "Title", "Content")
+
+    assert cache.get(key) is None
+    cache.put(key, "model", "v1", RESULT)
+    assert cache.get(key) == RESULT
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evict_removes_expired_then_least_recently_used(session_factory):
+    """Test age- and size-based eviction."""
+    cache = SentimentCache(session_factory=session_factory, max_entries=2, max_age_days=30, evict_every=100)
+    now = datetime.now()
+
+    db = session_factory()
+    db.add_all([
+        SentimentCacheEntry(cache_key="expired", model_id="m", prompt_version="v1", result=RESULT,
+                            created_at=now - timedelta(days=60), last_accessed_at=now),
+        SentimentCacheEntry(cache_key="old", model_id="m", prompt_version="v1", result=RESULT,
+                            created_at=now, last_accessed_at=now - timedelta(hours=2)),
+        SentimentCacheEntry(cache_key="recent", model_id="m", prompt_version="v1", result=RESULT,
+                            created_at=now, last_accessed_at=now - timedelta(hours=1)),
+        SentimentCacheEntry(cache_key="newest", model_id="m", prompt_version="v1", result=RESULT,
+                            created_at=now, last_accessed_at=now),
+    ])
+    db.commit()
+    db.close()
+
+    assert cache.evict() == 2
+
+    db = session_factory()
+    remaining = {entry.cache_key for entry in db.query(SentimentCacheEntry).all()}
+    db.close()
+    assert remaining == {"recent", "newest"}
@@ -0,0 +1,115 @@
+"""
+Tests for the incrementally maintained hourly sentiment rollups.
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services.sentiment_rollups import (
+    ALL_TOKENS, build_rollup_rebuild, build_rollup_upsert, build_timeseries, rollup_deltas, timeseries_query
+)
+
+HOUR = datetime(2025, 10, 1, 9)
+
+
+def aggregate(articles):
+    """Rollups computed from scratch over the current article results."""
+    return rollup_deltas(added=articles.values())
+
+
+def test_reanalysis_moves_counts_between_labels():
+    """Test that replacing a result subtracts the old one from every bucket it touched."""
+    deltas = rollup_deltas(
+        added=[(HOUR, "bearish", 0.6, ["BTC", "ETH"])],
+        removed=[(HOUR, "bullish", 0.9, ["BTC", "ETH"])]
+    )
+
+    assert set(deltas) == {(ALL_TOKENS, HOUR), ("BTC", HOUR), ("ETH", HOUR)}
+    for delta in deltas.values():
+        assert (delta["bullish"], delta["bearish"], delta["articles"]) == (-1, 1, 0)
+        assert delta["confidence_sum"] == pytest.approx(-0.3)
+
+
+def test_unchanged_and_unrolled_results_produce_no_delta():
+    """Test that identical re-analysis, missing sentiment and missing timestamps are no-ops."""
+    row = (HOUR, "neutral", 0.5, ["SOL", "SOL"])
+
+    assert rollup_deltas(added=[row], removed=[row]) == {}
+    assert rollup_deltas(added=[(HOUR, None, None, ["BTC"]), (None, "bullish", 0.9, ["BTC"])]) == {}
+    assert rollup_deltas(added=[row])[("SOL", HOUR)]["articles"] == 1  # a token listed twice counts once
+
+
+def test_incremental_deltas_match_a_rebuild():
+    """Test that applying every write's delta ends where aggregating the final state does."""
+    rng = random.Random(7)
+    articles = {}
+    rollups = {}
+
+    for _ in range(500):
+        article_id = rng.randrange(60)
+        old = articles.get(article_id)
+        new = (
+            datetime(2025, 10, 1, rng.randrange(6)),
+            rng.choice(["bullish", "bearish", "neutral", "mixed", None]),
+            rng.choice([None, round(rng.random(), 3)]),
+            rng.sample(["BTC", "ETH", "SOL", "XRP"], rng.randrange(3))
+        )
+        if old is not None:
+            new = (old[0],) + new[1:]  # an article keeps its hour
+        articles[article_id] = new
+
+        for key, delta in rollup_deltas(added=[new], removed=[old] if old else []).items():
+            total = rollups.setdefault(key, dict.fromkeys(delta, 0))
+            for name, value in delta.items():
+                total[name] += value
+
+    expected = aggregate(articles)
+    live = {key: total for key, total in rollups.items() if total["articles"]}
+    assert set(live) == set(expected)
+    for key, total in live.items():
+        assert {name: value for name, value in total.items() if name != "confidence_sum"} == \
+            {name: value for name, value in expected[key].items() if name != "confidence_sum"}
+        assert total["confidence_sum"] == pytest.approx(expected[key]["confidence_sum"])
+
+
+def test_upsert_adds_deltas_in_one_statement():
+    """Test that a batch of deltas is one INSERT ... ON CONFLICT DO UPDATE adding to each bucket."""
+    deltas = rollup_deltas(added=[(HOUR, "bullish", 0.9, ["BTC"])], removed=[(HOUR, "neutral", 0.4, ["ETH"])])
+    sql = str(build_rollup_upsert(deltas).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO sentiment_rollups") == 1
+    assert "ON CONFLICT (token, bucket) DO UPDATE" in sql
+    assert "bullish = (sentiment_rollups.bullish + excluded.bullish)" in sql
+
+
+def test_rebuild_is_one_insert_select():
+    """Test that rebuilding aggregates news_articles inside the database."""
+    sql = str(build_rollup_rebuild().compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO sentiment_rollups") == 1
+    assert "unnest(array_append(news_articles.tokens_mentioned" in sql
+    assert "count(*) FILTER (WHERE mentions.sentiment" in sql
+    assert "GROUP BY mentions.token, mentions.bucket" in sql
+
+
+def test_timeseries_reads_only_rollups_in_range():
+    """Test the time series query and response shape."""
+    sql = str(timeseries_query("btc", HOUR, datetime(2025, 10, 8), "day").compile(dialect=postgresql.dialect()))
+
+    assert "FROM sentiment_rollups" in sql and "news_articles" not in sql
+    assert "date_trunc('day', sentiment_rollups.bucket) AS period" in sql
+    assert "GROUP BY period" in sql
+    with pytest.raises(ValueError):
+        timeseries_query(None, HOUR, HOUR, "minute")
+
+    response = build_timeseries([(HOUR, 2, 1, 0, 4, 2.2)], "btc", HOUR, datetime(2025, 10, 2), "hour")
+    assert response["token"] == "BTC"
+    assert response["points"] == [{
+        "period": "2025-10-01T09:00:00",
+        "sentiment_distribution": {"bullish": 2, "bearish": 1, "neutral": 0},
+        "total_articles": 4,
+        "average_confidence": 0.55
+    }]
@@ -0,0 +1,84 @@
+"""
+Tests for the SQL sentiment aggregates behind /api/sentiment/.
+"""
+
+from collections import Counter
+
+from sqlalchemy.dialects import postgresql
+
+from services.sentiment_stats import build_sentiment_summary, sentiment_distribution_query, token_mentions_query
+
+ARTICLES = [
+    {"sentiment": "bullish", "confidence_score": 0.9, "tokens_mentioned": ["BTC", "ETH"]},
+    {"sentiment": "bullish", "confidence_score": 0.7, "tokens_mentioned": ["BTC"]},
+    {"sentiment": "bearish", "confidence_score": None, "tokens_mentioned": None},
+    {"sentiment": "neutral", "confidence_score": 0.5, "tokens_mentioned": ["SOL", "BTC"]},
+    {"sentiment": "mixed", "confidence_score": 0.4, "tokens_mentioned": ["ETH"]},
+]
+
+
+def python_summary(articles, token=None):
+    """The endpoint's previous in-Python aggregation, as the reference."""
+    sentiment_counts = {"bullish": 0, "bearish": 0, "neutral": 0}
+    total_confidence = 0
+    token_mentions = {}
+    for article in articles:
+        if article["sentiment"] in sentiment_counts:
+            sentiment_counts[article["sentiment"]] += 1
+        if article["confidence_score"]:
+            total_confidence += article["confidence_score"]
+        for token_mentioned in (article["tokens_mentioned"] or []):
+            token_mentions[token_mentioned] = token_mentions.get(token_mentioned, 0) + 1
+    total_articles = len(articles)
+    return {
+        "overall_sentiment": max(sentiment_counts, key=sentiment_counts.get) if total_articles > 0 else "neutral",
+        "sentiment_distribution": sentiment_counts,
+        "total_articles": total_articles,
+        "average_confidence": round(total_confidence / total_articles if total_articles > 0 else 0, 3),
+        "token_mentions": token_mentions,
+        "filtered_by_token": token
+    }
+
+
+def grouped_rows(articles):
+    """What the two GROUP BY queries return for these articles."""
+    distribution = {}
+    for article in articles:
+        count, confidence = distribution.get(article["sentiment"], (0, 0.0))
+        distribution[article["sentiment"]] = (count + 1, confidence + (article["confidence_score"] or 0.0))
+    mentions = Counter(token for article in articles for token in (article["tokens_mentioned"] or []))
+    return (
+        [(sentiment, count, confidence) for sentiment, (count, confidence) in distribution.items()],
+        mentions.most_common()
+    )
+
+
+def test_summary_matches_previous_python_aggregation():
+    """Test that the response is unchanged, including unknown labels and missing confidence."""
+    distribution_rows, token_rows = grouped_rows(ARTICLES)
+
+    assert build_sentiment_summary(distribution_rows, token_rows) == python_summary(ARTICLES)
+
+
+def test_empty_summary_is_neutral():
+    """Test the response when nothing has been analyzed."""
+    assert build_sentiment_summary([], [], "BTC") == python_summary([], "BTC")
+
+
+def test_ties_resolve_in_label_order():
+    """Test that overall_sentiment breaks ties the way max() over the dict did."""
+    articles = [{"sentiment": label, "confidence_score": 0.5, "tokens_mentioned": []} for label in ("neutral", "bearish")]
+
+    assert build_sentiment_summary(*grouped_rows(articles))["overall_sentiment"] == "bearish"
+
+
+def test_queries_group_in_the_database():
+    """Test that both aggregates are GROUP BY queries and the token filter uses @>."""
+    distribution = str(sentiment_distribution_query("btc").compile(dialect=postgresql.dialect()))
+    mentions = str(token_mentions_query().compile(dialect=postgresql.dialect()))
+
+    assert "GROUP BY news_articles.sentiment" in distribution
+    assert "news_articles.tokens_mentioned @>" in distribution
+    assert "unnest(news_articles.tokens_mentioned) AS token" in mentions
+    assert "GROUP BY token" in mentions
+    assert "news_articles.content" not in distribution + mentions
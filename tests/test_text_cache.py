@@ -0,0 +1,80 @@
+"""
+Tests for the on-disk cache of extracted PDF text.
+"""
+
+import os
+import time
+
+from services.text_cache import ENTRY_SUFFIX, TextCache
+
+
+def entry_paths(directory):
+    return [os.path.join(root, name) for root, _, files in os.walk(directory) for name in files if name.endswith(ENTRY_SUFFIX)]
+
+
+def test_make_key_depends_on_every_part():
+    """Test that the key changes with the ETag and each extraction setting."""
+    base = TextCache.make_key("etag", "pypdf2-1", 50, 20000)
+
+    assert base == TextCache.make_key("etag", "pypdf2-1", 50, 20000)
+    assert base != TextCache.make_key("etag2", "pypdf2-1", 50, 20000)
+    assert base != TextCache.make_key("etag", "pypdf2-2", 50, 20000)
+    assert base != TextCache.make_key("etag", "pypdf2-1", 5, 20000)
+    assert base != TextCache.make_key("etag", "pypdf2-1", 50, 50000)
+
+
+def test_get_and_put_round_trip_compressed(tmp_path):
+    """Test a miss, a store and a hit, with the entry compressed on disk."""
+    cache = TextCache(directory=str(tmp_path), max_bytes=10 ** 6, evict_every=100)
+    key = TextCache.make_key("etag")
+    text = "Bitcoin rallies. " * 500
+
+    assert cache.get(key) is None
+    cache.put(key, {"text": text})
+
+    assert cache.get(key) == {"text": text}
+    assert os.path.getsize(entry_paths(tmp_path)[0]) < len(text) / 10
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0, "hit_rate": 0.5}
+
+
+def test_put_leaves_no_temporary_files(tmp_path):
+    """Test that the atomic write renames its temporary file into place."""
+    cache = TextCache(directory=str(tmp_path), max_bytes=10 ** 6, evict_every=100)
+    cache.put(TextCache.make_key("a"), {"text": "one"})
+    cache.put(TextCache.make_key("a"), {"text": "two"})
+
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 1 and files[0].endswith(ENTRY_SUFFIX)
+    assert cache.get(TextCache.make_key("a")) == {"text": "two"}
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    """Test that an unreadable entry is discarded."""
+    cache = TextCache(directory=str(tmp_path), max_bytes=10 ** 6, evict_every=100)
+    key = TextCache.make_key("etag")
+    cache.put(key, {"text": "ok"})
+    with open(entry_paths(tmp_path)[0], "wb") as entry_file:
+        entry_file.write(b"not zlib")
+
+    assert cache.get(key) is None
+    assert entry_paths(tmp_path) == []
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    """Test that eviction keeps recently read entries under the size cap."""
+    cache = TextCache(directory=str(tmp_path), max_bytes=10 ** 6, evict_every=100)
+    keys = [TextCache.make_key(i) for i in range(4)]
+    for age, key in enumerate(keys):
+        cache.put(key, {"text": os.urandom(200).hex()})
+        past = time.time() - 100 + age
+        os.utime(cache._path(key), (past, past))
+    cache.get(keys[0])  # refreshes the oldest entry
+
+    entry_size = os.path.getsize(cache._path(keys[0]))
+    cache.max_bytes = entry_size * 3
+    removed = cache.evict()
+
+    assert removed == 2
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None and cache.get(keys[2]) is None
+    assert cache.get(keys[3]) is not None
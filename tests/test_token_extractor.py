@@ -0,0 +1,98 @@
+"""
+Tests for registry-backed token extraction.
+"""
+
+import asyncio
+import os
+
+import httpx
+
+from services.coingecko_service import CoinGeckoService
+from services.response_cache import ResponseCache
+from services.token_extractor import (
+    SEED_COINS,
+    TokenExtractor,
+    get_token_extractor,
+    load_registry,
+    refresh_coin_registry,
+)
+
+
+def test_matches_whole_words_only():
+    """Test that symbols inside longer words are not matches."""
+    extractor = TokenExtractor(SEED_COINS)
+
+    assert extractor.extract("UNITED states signed a DOTTED line") == []
+    assert extractor.extract("UNI and DOT rallied") == ["UNI", "DOT"]
+
+
+def test_names_aliases_and_cashtags_map_to_canonical_symbols():
+    """Test that every way of naming a coin yields its symbol once, in order of mention."""
+    extractor = TokenExtractor(SEED_COINS, aliases={"shiba": "SHIB"})
+
+    text = "Bitcoin Cash outpaced bitcoin and BTC, ether gained, $sol and Shiba moved"
+
+    assert extractor.extract(text) == ["BCH", "BTC", "ETH", "SOL", "SHIB"]
+
+
+def test_bare_symbols_need_upper_case_and_a_ranked_coin():
+    """Test that lower-case words and long-tail symbols only match as cashtags."""
+    coins = SEED_COINS + [{"id": "tail", "symbol": "tail", "name": "Tail Finance Token", "rank": None}]
+    extractor = TokenExtractor(coins, rank_limit=100)
+
+    assert extractor.extract("link the sol TAIL") == []
+    assert extractor.extract("LINK and $tail, not Tail Finance Token") == ["LINK", "TAIL"]
+    assert TokenExtractor(coins, rank_limit=0).extract("Tail Finance Token") == ["TAIL"]
+
+
+def test_ambiguous_words_are_not_symbols():
+    """Test that common acronyms do not match coins that share their symbol."""
+    coins = SEED_COINS + [{"id": "sec-coin", "symbol": "sec", "name": "SecCoin", "rank": 50}]
+    extractor = TokenExtractor(coins)
+
+    assert extractor.extract("The SEC approved a new ETF") == []
+    assert extractor.extract("$SEC listed") == ["SEC"]
+
+
+def test_digit_only_symbols_are_not_matched():
+    """Test that prices and figures do not match coins with numeric symbols."""
+    coins = SEED_COINS + [{"id": "hundred", "symbol": "100", "name": "Hundred Coin", "rank": 80}]
+    extractor = TokenExtractor(coins)
+
+    assert extractor.extract("BTC tops $100 and ETH adds 100 points") == ["BTC", "ETH"]
+    assert extractor.extract("Hundred Coin listed") == ["100"]
+
+
+def test_registry_refresh_writes_snapshot_and_reloads_extractor(monkeypatch, tmp_path):
+    """Test that a refreshed snapshot is fetched once, saved and picked up by the extractor."""
+    path = str(tmp_path / "coins.json")
+    monkeypatch.setenv("COINGECKO_COIN_REGISTRY_PATH", path)
+    monkeypatch.setenv("COINGECKO_API_KEY", "test")
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        if request.url.path.endswith("/coins/list"):
+            return httpx.Response(200, json=[
+                {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+                {"id": "pepe", "symbol": "pepe", "name": "Pepe"},
+            ])
+        return httpx.Response(200, json=[{"id": "bitcoin", "market_cap_rank": 1}, {"id": "pepe", "market_cap_rank": 30}])
+
+    async def no_wait(tokens=0):
+        pass
+
+    async def refresh_twice():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            service = CoinGeckoService(client=client)
+            service.response_cache = ResponseCache(default_ttl=0)
+            monkeypatch.setattr(service.rate_limiter, "acquire_async", no_wait)
+            return await refresh_coin_registry(service, path), await refresh_coin_registry(service, path)
+
+    assert get_token_extractor().extract("PEPE") == []  # seed coins only
+
+    assert asyncio.run(refresh_twice()) == (True, False)
+    assert requested == ["/api/v3/coins/list", "/api/v3/coins/markets"]
+    assert os.path.exists(path)
+    assert {coin["id"]: coin["rank"] for coin in load_registry(path)} == {"bitcoin": 1, "pepe": 30}
+    assert get_token_extractor().extract("Pepe and bitcoin") == ["PEPE", "BTC"]
@@ -0,0 +1,152 @@
+"""
+Tests for batched token price enrichment.
+"""
+
+import asyncio
+from datetime import timezone
+
+import httpx
+from sqlalchemy.dialects import postgresql
+
+from models import NewsArticle
+from services import coingecko_service
+from services.coingecko_service import CoinGeckoService
+from services.token_prices import PriceCache, build_snapshot_insert, parse_simple_price
+
+
+def price(value):
+    return {"price_usd": value, "change_24h_pct": None, "captured_at": None}
+
+
+def test_concurrent_batches_share_one_lookup_per_coin():
+    """Test that overlapping batches fetch each coin once and reuse it within the TTL."""
+    requested = []
+
+    async def fetch(coin_ids):
+        requested.append(sorted(coin_ids))
+        await asyncio.sleep(0.01)
+        return {coin_id: price(1.0) for coin_id in coin_ids if coin_id != "delisted"}
+
+    async def run():
+        cache = PriceCache(ttl=30)
+        first, second = await asyncio.gather(
+            cache.get_many(["bitcoin", "ethereum"], fetch),
+            cache.get_many(["ethereum", "solana", "delisted"], fetch)
+        )
+        third = await cache.get_many(["bitcoin", "solana"], fetch)
+        return cache, first, second, third
+
+    cache, first, second, third = asyncio.run(run())
+
+    assert requested == [["bitcoin", "ethereum"], ["delisted", "solana"]]
+    assert set(first) == {"bitcoin", "ethereum"}
+    assert set(second) == {"ethereum", "solana"}
+    assert set(third) == {"bitcoin", "solana"}
+    assert cache.stats()["coalesced"] == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_waiting_batch_fetches_itself_when_the_owner_is_cancelled():
+    """Test that cancelling the batch that owns a lookup does not strand batches waiting on it."""
+    requested = []
+
+    async def fetch(coin_ids):
+        requested.append(sorted(coin_ids))
+        await asyncio.sleep(0.05)
+        return {coin_id: price(1.0) for coin_id in coin_ids}
+
+    async def run():
+        cache = PriceCache(ttl=30)
+        owner = asyncio.ensure_future(cache.get_many(["bitcoin"], fetch))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.get_many(["bitcoin", "ethereum"], fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await asyncio.wait_for(waiter, timeout=1), owner.cancelled()
+
+    prices, owner_cancelled = asyncio.run(run())
+
+    assert set(prices) == {"bitcoin", "ethereum"}
+    assert owner_cancelled
+    assert requested == [["bitcoin"], ["ethereum"], ["bitcoin"]]
+
+
+def test_expired_prices_are_fetched_again():
+    """Test the short TTL."""
+    now = [0.0]
+    calls = []
+
+    async def fetch(coin_ids):
+        calls.append(coin_ids)
+        return {coin_id: price(now[0]) for coin_id in coin_ids}
+
+    async def run():
+        cache = PriceCache(ttl=30, clock=lambda: now[0])
+        await cache.get_many(["bitcoin"], fetch)
+        now[0] = 31
+        return await cache.get_many(["bitcoin"], fetch)
+
+    assert asyncio.run(run())["bitcoin"]["price_usd"] == 31
+    assert len(calls) == 2
+
+
+def test_parse_simple_price_uses_coingecko_update_time():
+    """Test normalization of a /simple/price response."""
+    prices = parse_simple_price({
+        "bitcoin": {"usd": 65000, "usd_24h_change": -1.5, "last_updated_at": 1759190400},
+        "unknown": {}
+    })
+
+    assert list(prices) == ["bitcoin"]
+    assert prices["bitcoin"]["price_usd"] == 65000.0
+    assert prices["bitcoin"]["captured_at"].tzinfo == timezone.utc
+
+
+def test_snapshot_insert_is_one_statement_skipping_known_prices():
+    """Test that a batch of prices is one INSERT ... ON CONFLICT DO NOTHING."""
+    rows = [{"coin_id": "bitcoin", "captured_at": None, "symbol": "BTC", "price_usd": 1.0, "change_24h_pct": None}] * 3
+    sql = str(build_snapshot_insert(rows).compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO token_price_snapshots") == 1
+    assert "ON CONFLICT (coin_id, captured_at) DO NOTHING" in sql
+
+
+def test_enrichment_prices_distinct_tokens_in_batched_requests(monkeypatch, tmp_path):
+    """Test that a batch of articles costs one /simple/price call per batch of coins."""
+    monkeypatch.setenv("COINGECKO_API_KEY", "test")
+    monkeypatch.setenv("COINGECKO_COIN_REGISTRY_PATH", str(tmp_path / "coins.json"))
+    saved = []
+    monkeypatch.setattr(coingecko_service, "save_price_snapshots", lambda prices, symbols: saved.append(symbols))
+    requested = []
+
+    def handler(request):
+        ids = request.url.params["ids"].split(",")
+        requested.append(ids)
+        return httpx.Response(200, json={coin_id: {"usd": 10.0 * len(coin_id), "last_updated_at": 1759190400} for coin_id in ids})
+
+    async def no_wait(tokens=0):
+        pass
+
+    articles = [
+        NewsArticle(title="a", tokens_mentioned=["BTC", "ETH"]),
+        NewsArticle(title="b", tokens_mentioned=["ETH", "SOL"]),
+        NewsArticle(title="c", tokens_mentioned=["NOTACOIN"]),
+    ]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            service = CoinGeckoService(client=client)
+            service.price_cache = PriceCache(ttl=30)
+            service.price_batch_size = 2
+            monkeypatch.setattr(service.rate_limiter, "acquire_async", no_wait)
+            return await service.enrich_with_prices(articles)
+
+    report = asyncio.run(run())
+
+    assert sorted(coin for ids in requested for coin in ids) == ["bitcoin", "ethereum", "solana"]
+    assert report["requests"] == len(requested) == 2
+    assert report["priced"] == 3 and report["unresolved"] == ["NOTACOIN"]
+    assert articles[0].token_prices == {"BTC": 70.0, "ETH": 80.0}
+    assert articles[1].token_prices == {"ETH": 80.0, "SOL": 60.0}
+    assert articles[2].token_prices is None
+    assert saved and saved[0]["bitcoin"] == "BTC"